@@ -0,0 +1,90 @@
+import { apiUrl } from "./config";
+import type { BudgetPlanWithSavings, BudgetResponse } from "./budget";
+
+export type AnalysisResponse = {
+  spending: Record<string, number>;
+  weekly_expenditure: Record<string, number>;
+  monthly_expenditure: number;
+};
+
+export type DashboardResponse = {
+  transactions: any[];
+  analysis: AnalysisResponse;
+  budget: BudgetResponse;
+  budget_plan: BudgetPlanWithSavings;
+};
+
+/** Transactions, analysis, budget and budget plan in one request. */
+export async function getDashboard(userEmail: string): Promise<DashboardResponse> {
+  const email = userEmail.trim().toLowerCase();
+  const params = new URLSearchParams({ user_email: email });
+  const res = await fetch(apiUrl(`/dashboard?${params}`));
+  if (!res.ok) throw new Error("Failed to load dashboard");
+  return res.json() as Promise<DashboardResponse>;
+}
+
+/** Per-month aggregate changes carried by a "transactions" event. */
+export type AggregateDelta = {
+  count: number;
+  income: number;
+  expenses: number;
+  categories: Record<string, number>;
+  spend: Record<string, number>;
+  weeks: Record<string, number>;
+  spend_total: number;
+  expense_count: number;
+  kg_co2e: number;
+};
+
+export type TransactionsEvent = {
+  count: number;
+  transactions?: any[];
+  truncated?: boolean;
+  deltas: Record<string, AggregateDelta>;
+};
+
+/**
+ * Subscribe to the user's change stream (GET /events). onTransactions gets new transactions and
+ * the per-month aggregate deltas; onResync means the client should refetch. Returns a function
+ * that closes the stream.
+ */
+export function subscribeToEvents(
+  userEmail: string,
+  handlers: { onTransactions?: (event: TransactionsEvent) => void; onResync?: () => void },
+): () => void {
+  const email = userEmail.trim().toLowerCase();
+  const params = new URLSearchParams({ user_email: email });
+  const source = new EventSource(apiUrl(`/events?${params}`));
+  source.addEventListener("transactions", (e) => {
+    handlers.onTransactions?.(JSON.parse((e as MessageEvent).data) as TransactionsEvent);
+  });
+  source.addEventListener("resync", () => handlers.onResync?.());
+  return () => source.close();
+}
+
+type PredictionJob = {
+  job_id: string;
+  status: "queued" | "running" | "done" | "failed";
+  result?: any;
+  error?: string;
+};
+
+/**
+ * Spending prediction via the job queue: POST /prediction/jobs, then poll the job until it is
+ * done (identical requests share one job, so repeat calls are cheap).
+ */
+export async function getPrediction(userEmail: string, pollMs = 1000): Promise<any> {
+  const email = userEmail.trim().toLowerCase();
+  const params = new URLSearchParams({ user_email: email });
+  let res = await fetch(apiUrl(`/prediction/jobs?${params}`), { method: "POST" });
+  if (!res.ok) throw new Error("Failed to start prediction");
+  let job = (await res.json()) as PredictionJob;
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, pollMs));
+    res = await fetch(apiUrl(`/prediction/jobs/${job.job_id}?${params}`));
+    if (!res.ok) throw new Error("Failed to load prediction");
+    job = (await res.json()) as PredictionJob;
+  }
+  if (job.status === "failed") throw new Error(job.error ?? "Prediction failed");
+  return job.result;
+}
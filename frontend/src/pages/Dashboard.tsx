@@ -10,7 +10,8 @@ import UserSettingsTab from "./UserSettingsTab";
 
 import MoneyRain from "../components/MoneyRain";
 import Loader from "../components/Loader";
-import { getBudget, getBudgetPlan, getStoredUserEmail } from "../api/budget";
+import { getStoredUserEmail } from "../api/budget";
+import { getDashboard, getPrediction, subscribeToEvents } from "../api/dashboard";
 import logo from "../assets/logo.png";
 
 import {
@@ -79,15 +80,9 @@ export default function Dashboard() {
             return;
         }
 
-        const fetchTransactions = axios.get(`http://localhost:8000/transactions?user_email=${email}`);
-        const fetchAnalysis = axios.get(`http://localhost:8000/analysis?user_email=${email}`);
-        const fetchBudget = getBudget(email);
-        const fetchPlan = getBudgetPlan(email);
-
-        Promise.all([fetchTransactions, fetchAnalysis, fetchBudget, fetchPlan])
-            .then(([transRes, analysisRes, budgetRes, planRes]) => {
+        const loadDashboard = () => getDashboard(email)
+            .then(({ transactions, analysis, budget: budgetRes, budget_plan: planRes }) => {
                 // 1. Transactions (Graph 2)
-                const transactions = transRes.data;
                 if (transactions && transactions.length > 0) {
                     const lastTransaction = transactions[transactions.length - 1];
                     const endDate = new Date(lastTransaction.date);
@@ -129,7 +124,7 @@ export default function Dashboard() {
                 }
 
                 // 2. Analysis (Graph 1)
-                const { spending, monthly_expenditure } = analysisRes.data;
+                const { spending, monthly_expenditure } = analysis;
                 if (monthly_expenditure !== undefined) {
                     setTotalMonthlySpend(monthly_expenditure);
                 }
@@ -155,6 +150,10 @@ export default function Dashboard() {
             .finally(() => {
                 setLoading(false);
             });
+
+        loadDashboard();
+        // Reload only when the server reports new transactions, instead of on every visit or poll
+        return subscribeToEvents(email, { onTransactions: loadDashboard, onResync: loadDashboard });
     }, []);
 
     if (loading) {
@@ -411,19 +410,21 @@ function PredictiveTab() {
         // Prevent re-fetching if we already have a prediction
         if (prediction) return;
 
-        setIsLoadingPrediction(true);
         const email = getStoredUserEmail();
-        axios.get(`http://localhost:8000/prediction?user_email=${email}`)
-            .then((response) => {
-                console.log("Prediction received:", response.data);
+        if (!email) return;
+
+        setIsLoadingPrediction(true);
+        getPrediction(email)
+            .then((data) => {
+                console.log("Prediction received:", data);
 
                 // FIX 1: Check for the object properties, NOT Array.isArray
-                if (response.data && response.data.prediction_amount !== undefined) {
+                if (data && data.prediction_amount !== undefined) {
 
                     // FIX 2: Set the PREDICTION state, not transactions
-                    setPrediction(response.data);
+                    setPrediction(data);
                 } else {
-                    console.warn("Invalid prediction format:", response.data);
+                    console.warn("Invalid prediction format:", data);
                 }
             })
             .catch((error) => {
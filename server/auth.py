@@ -1,21 +1,29 @@
 """
 Authentication utilities: password hashing and JWT creation/verification.
-Uses PBKDF2-SHA256 for passwords (no length limit, secure, standard library).
+Uses PBKDF2-SHA256 for passwords (no length limit, secure, standard library); see password_hashing.
 """
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Annotated
 
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from google.cloud.firestore import Client as FirestoreClient
+from google.cloud.firestore import AsyncClient
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
-from database import get_db
+import auth_cache
+from database import get_async_db
 from models.user import User
-from user_repo import get_user_by_email as get_user_by_email_db, get_user_by_id
+from password_hashing import (  # noqa: F401  (re-exported)
+    hash_password,
+    hash_password_async,
+    pwd_context,
+    verify_and_update_async,
+    verify_password,
+)
+from user_repo_async import get_user_by_email as get_user_by_email_db, get_user_by_id
 
 load_dotenv()
 
@@ -23,20 +31,9 @@ SECRET_KEY = os.getenv("JWT_SECRET", "change-me-in-production-use-long-random-st
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-# PBKDF2-SHA256: no password length limit, secure, built into passlib
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
 
 
-def hash_password(password: str) -> str:
-    """Hash password (any length). No limit."""
-    return pwd_context.hash(password)
-
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
-
-
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -51,13 +48,13 @@ def decode_token(token: str) -> dict | None:
         return None
 
 
-def get_user_by_email(db: FirestoreClient, email: str) -> User | None:
-    return get_user_by_email_db(db, email)
+async def get_user_by_email(db: AsyncClient, email: str) -> User | None:
+    return await get_user_by_email_db(db, email)
 
 
-def get_current_user(
+async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
-    db: Annotated[FirestoreClient, Depends(get_db)],
+    db: Annotated[AsyncClient, Depends(get_async_db)],
 ) -> User:
     if not credentials or not credentials.credentials:
         raise HTTPException(
@@ -65,7 +62,8 @@ def get_current_user(
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    payload = decode_token(credentials.credentials)
+    auth_cache.record("requests")
+    payload = _decode_token_cached(credentials.credentials)
     if not payload or "sub" not in payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,7 +71,27 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     user_id = str(payload["sub"])
-    user = get_user_by_id(db, user_id)
+    user = auth_cache.user_cache.get(user_id)
+    if user is not None:
+        auth_cache.record("user_hits")
+        return user
+    auth_cache.record("user_misses")
+    user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    auth_cache.cache_user(user)
     return user
+
+
+def _decode_token_cached(token: str) -> dict | None:
+    """decode_token with verified payloads cached by token digest until the token expires."""
+    key = auth_cache.token_digest(token)
+    payload = auth_cache.token_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        auth_cache.record("token_hits")
+        return payload
+    auth_cache.record("token_misses")
+    payload = decode_token(token)
+    if payload and "sub" in payload:
+        auth_cache.token_cache.put(key, payload, ttl_seconds=payload.get("exp", 0) - time.time())
+    return payload
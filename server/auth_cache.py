@@ -0,0 +1,104 @@
+"""
+In-process caches for authenticated requests (see auth.get_current_user):
+    token_cache  verified JWT payloads keyed by a digest of the token (skips signature checks)
+    user_cache   User objects keyed by user id (skips the Firestore user read)
+
+Entries expire after their TTL (token entries also at the token's own exp). Profile updates call
+invalidate_user, which drops the user and every cached token for that user.
+
+Config (env): AUTH_USER_CACHE_TTL_SECONDS (default 60), AUTH_TOKEN_CACHE_TTL_SECONDS (default 300),
+AUTH_CACHE_SIZE (entries per cache, default 10000).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from models.user import User
+
+
+class TTLCache:
+    """Thread-safe LRU mapping with a per-entry expiry time."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any, ttl_seconds: float | None = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate) -> int:
+        """Drop entries whose value matches predicate. Returns how many were dropped."""
+        with self._lock:
+            keys = [k for k, (_, v) in self._entries.items() if predicate(v)]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+user_cache = TTLCache(_AUTH_CACHE_SIZE, float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60")))
+token_cache = TTLCache(_AUTH_CACHE_SIZE, float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300")))
+
+_counters = {"requests": 0, "token_hits": 0, "token_misses": 0, "user_hits": 0, "user_misses": 0, "invalidations": 0}
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def record(counter: str) -> None:
+    _counters[counter] += 1
+
+
+def cache_user(user: User) -> None:
+    user_cache.put(user.id, user)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Forget a user's cached profile and tokens (call after any change to the user document)."""
+    user_cache.pop(user_id)
+    token_cache.discard_where(lambda payload: str(payload.get("sub")) == user_id)
+    _counters["invalidations"] += 1
+
+
+def auth_cache_stats() -> dict[str, Any]:
+    """Cache counters; every user hit is one Firestore read saved."""
+    requests = _counters["requests"]
+    return {
+        **_counters,
+        "firestore_reads_saved": _counters["user_hits"],
+        "firestore_reads_saved_per_request": round(_counters["user_hits"] / requests, 4) if requests else 0.0,
+        "cached_users": len(user_cache),
+        "cached_tokens": len(token_cache),
+    }
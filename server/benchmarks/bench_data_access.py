@@ -0,0 +1,157 @@
+"""
+Benchmark the blocking data-access layer (transaction_repo / user_repo on a 40-thread pool, as
+Starlette runs sync routes) against the async one (transaction_repo_async / user_repo_async with asyncio.gather)
+on the in-memory fake with a simulated per-RPC latency. Run from the server directory:
+
+    python -m benchmarks.bench_data_access
+    python -m benchmarks.bench_data_access --latency-ms 20 --concurrency 200 --json results.json
+
+Each request is a dashboard-style load: the user document (email query), the transactions and
+the monthly rollups. The snapshot cache is off unless --cache is given, so every request
+reaches the store.
+
+The async layer overlaps the three reads and is not capped by the thread pool, so it pulls
+ahead as RPC latency grows; with near-zero latency both are bound by the CPU spent copying
+(decoding) documents.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import transaction_repo
+import transaction_repo_async
+import user_repo
+import user_repo_async
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore
+from snapshot_cache import snapshot_cache
+
+SEED_FILE = Path(__file__).resolve().parent.parent / "data" / "user_2.json"
+
+# Starlette runs sync endpoints on a 40-thread limiter by default
+SYNC_WORKERS = 40
+
+
+def seed(db: FakeFirestore, users: int, transactions_per_user: int) -> list[str]:
+    """Create users whose transactions repeat the sample file's, shifted a year back per copy."""
+    sample = json.loads(SEED_FILE.read_text())["transactions"]
+    emails = []
+    for u in range(users):
+        email = f"bench{u}@example.com"
+        db.collection(user_repo.USERS_COLLECTION).document(f"user{u}").set({"email": email, "hashed_password": "", "budget_plan": {}})
+        rows = []
+        for i in range(transactions_per_user):
+            t = dict(sample[i % len(sample)])
+            shift = i // len(sample)
+            t["date"] = f"{int(t['date'][:4]) - shift:04d}{t['date'][4:]}"
+            t["transaction_id"] = f"{t['transaction_id']}-{i}"
+            rows.append(t)
+        transaction_repo.append_transactions_for_user(db, email, rows)
+        emails.append(email)
+    return emails
+
+
+def sync_request(db: FakeFirestore, email: str) -> None:
+    user_repo.get_user_by_email(db, email)
+    transaction_repo.get_transactions_for_user(db, email)
+    transaction_repo.get_rollups_for_user(db, email)
+
+
+async def async_request(db: AsyncFakeFirestore, email: str) -> None:
+    await asyncio.gather(
+        user_repo_async.get_user_by_email(db, email),
+        transaction_repo_async.get_transactions_for_user(db, email),
+        transaction_repo_async.get_rollups_for_user(db, email),
+    )
+
+
+def _summary(name: str, latencies: list[float], elapsed: float, store, reads_before: int, rpcs_before: int) -> dict[str, Any]:
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        "layer": name,
+        "requests": n,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(n / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[max(int(n * 0.95) - 1, 0)] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "reads_per_request": round((store.reads - reads_before) / n, 1),
+        "rpcs_per_request": round((store.rpcs - rpcs_before) / n, 1),
+    }
+
+
+async def run_clients(
+    name: str, handle: Callable[[str], Awaitable[None]], store, emails: list[str], requests: int, concurrency: int
+) -> dict[str, Any]:
+    """`concurrency` clients issue `requests` requests back to back; latency includes any queueing."""
+    remaining = iter(range(requests))
+    latencies: list[float] = []
+
+    async def client() -> None:
+        for i in remaining:
+            start = time.perf_counter()
+            await handle(emails[i % len(emails)])
+            latencies.append(time.perf_counter() - start)
+
+    reads, rpcs = store.reads, store.rpcs
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return _summary(name, latencies, time.perf_counter() - start, store, reads, rpcs)
+
+
+async def run_sync(db: FakeFirestore, emails: list[str], requests: int, concurrency: int) -> dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as pool:
+        return await run_clients(
+            "sync", lambda email: loop.run_in_executor(pool, sync_request, db, email),
+            db.store, emails, requests, concurrency,
+        )
+
+
+async def run_async(db: AsyncFakeFirestore, emails: list[str], requests: int, concurrency: int) -> dict[str, Any]:
+    return await run_clients(
+        "async", lambda email: async_request(db, email), db.store, emails, requests, concurrency
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync vs async Firestore data-access benchmark.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=200, help="Transactions per user")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated latency per RPC")
+    parser.add_argument("--cache", action="store_true", help="Leave the transaction snapshot cache on")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if not args.cache:
+        snapshot_cache.max_bytes = 0
+    sync_db = FakeFirestore()
+    emails = seed(sync_db, args.users, args.transactions)
+    sync_db.latency = args.latency_ms / 1000
+    async_db = AsyncFakeFirestore(store=sync_db.store, latency=sync_db.latency)
+
+    results = {
+        "config": vars(args),
+        "results": [
+            asyncio.run(run_sync(sync_db, emails, args.requests, args.concurrency)),
+            asyncio.run(run_async(async_db, emails, args.requests, args.concurrency)),
+        ],
+    }
+    for r in results["results"]:
+        print(
+            f"{r['layer']:>5}: {r['requests_per_second']:>8} req/s  p50 {r['p50_ms']:>8} ms  "
+            f"p95 {r['p95_ms']:>8} ms  {r['reads_per_request']} reads, {r['rpcs_per_request']} RPCs per request"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Login throughput and its effect on other endpoints. Runs the real app in-process (httpx ASGI
+transport) on the in-memory fake Firestore. Run from the server directory:
+
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --login-clients 16 --other-clients 8 --seconds 10 --json results.json
+
+For each hashing mode -- "thread" (PBKDF2 on the request thread pool, the old behaviour) and
+"process" (the password_hashing process pool) -- two phases run for --seconds each:
+    idle      only the other clients (GET /dashboard and GET /auth/me)
+    mixed     login clients and other clients together
+The report gives login/s and the p50/p99 latency of the other endpoints in each phase.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+import database
+import password_hashing
+import transaction_repo
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore
+
+SEED_FILE = Path(__file__).resolve().parent.parent / "data" / "user_2.json"
+PASSWORD = "bench-password"
+
+
+def load_app(sync_db: FakeFirestore):
+    """Import the app with the database module pointed at the fake (so init_db needs no credentials)."""
+    database._firestore_client = sync_db
+    database._async_firestore_client = AsyncFakeFirestore(store=sync_db.store)
+    from main import app
+    return app
+
+
+async def seed(client: httpx.AsyncClient, sync_db: FakeFirestore, prefix: str, users: int) -> list[tuple[str, str]]:
+    """Sign up users with the sample transactions; returns (email, token) pairs."""
+    sample = json.loads(SEED_FILE.read_text())["transactions"]
+    accounts = []
+    for u in range(users):
+        email = f"{prefix}{u}@example.com"
+        r = await client.post("/auth/signup", json={
+            "email": email, "password": PASSWORD, "name": f"User {u}", "phone_number": "000",
+        })
+        r.raise_for_status()
+        transaction_repo.append_transactions_for_user(sync_db, email, sample)
+        accounts.append((email, r.json()["access_token"]))
+    return accounts
+
+
+async def _login_loop(client: httpx.AsyncClient, accounts, stop: float, done: list[float]) -> None:
+    i = 0
+    while time.perf_counter() < stop:
+        email = accounts[i % len(accounts)][0]
+        t = time.perf_counter()
+        r = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        r.raise_for_status()
+        done.append(time.perf_counter() - t)
+        i += 1
+
+
+async def _other_loop(client: httpx.AsyncClient, accounts, stop: float, latencies: list[float]) -> None:
+    i = 0
+    while time.perf_counter() < stop:
+        email, token = accounts[i % len(accounts)]
+        t = time.perf_counter()
+        if i % 2:
+            r = await client.get("/auth/me", headers={"Authorization": "Bearer " + token})
+        else:
+            r = await client.get("/dashboard", params={"user_email": email})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - t)
+        i += 1
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+
+async def run_phase(client, accounts, seconds: float, login_clients: int, other_clients: int) -> dict[str, Any]:
+    logins: list[float] = []
+    others: list[float] = []
+    stop = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_login_loop(client, accounts, stop, logins) for _ in range(login_clients)),
+        *(_other_loop(client, accounts, stop, others) for _ in range(other_clients)),
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "logins_per_second": round(len(logins) / elapsed, 1),
+        "login_p50_ms": _pct(logins, 0.5),
+        "login_p99_ms": _pct(logins, 0.99),
+        "other_requests": len(others),
+        "other_p50_ms": round(statistics.median(others) * 1000, 2) if others else 0.0,
+        "other_p99_ms": _pct(others, 0.99),
+    }
+
+
+async def run_mode(app, sync_db: FakeFirestore, mode: str, args) -> dict[str, Any]:
+    password_hashing.shutdown_pool()
+    password_hashing.PASSWORD_HASH_WORKERS = 0 if mode == "thread" else args.workers
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        accounts = await seed(client, sync_db, mode, args.users)
+        idle = await run_phase(client, accounts, args.seconds, 0, args.other_clients)
+        mixed = await run_phase(client, accounts, args.seconds, args.login_clients, args.other_clients)
+    password_hashing.shutdown_pool()
+    return {"mode": mode, "idle": idle, "mixed": mixed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Login throughput vs. latency of other endpoints.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--other-clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each phase")
+    parser.add_argument("--workers", type=int, default=password_hashing.PASSWORD_HASH_WORKERS or 1,
+                        help="Process pool size for the 'process' mode")
+    parser.add_argument("--modes", default="thread,process")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    sync_db = FakeFirestore()
+    app = load_app(sync_db)
+    results = [asyncio.run(run_mode(app, sync_db, mode, args)) for mode in args.modes.split(",")]
+    print(f"{'mode':<8} {'phase':<6} {'login/s':>8} {'login p99':>10} {'other p50':>10} {'other p99':>10}")
+    for r in results:
+        for phase in ("idle", "mixed"):
+            p = r[phase]
+            print(f"{r['mode']:<8} {phase:<6} {p['logins_per_second']:>8} {p['login_p99_ms']:>10} "
+                  f"{p['other_p50_ms']:>10} {p['other_p99_ms']:>10}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Regression benchmark for the user-profile step of GET /prediction as the users collection grows.
+Run from the server directory:
+
+    python -m benchmarks.bench_prediction_profile
+    python -m benchmarks.bench_prediction_profile --sizes 1000,10000,100000 --latency-ms 5 --json results.json
+
+Compares the old lookup (read the whole users collection and scan it for the email) with
+routes.transactions.get_prediction_budget (users_by_email index + one projected document get),
+on the in-memory fake Firestore. The indexed lookup should stay flat in latency and reads.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+
+import database
+import user_repo
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore
+
+LOOKUPS = 20
+
+
+def seed(db: FakeFirestore, users: int) -> list[str]:
+    """Create users (with index entries) that each have a budget plan and savings target."""
+    users_col = db.collection(user_repo.USERS_COLLECTION)
+    index_col = db.collection(user_repo.USERS_BY_EMAIL_COLLECTION)
+    emails = []
+    for u in range(users):
+        email = f"user{u}@example.com"
+        users_col.document(f"u{u}").set({
+            "email": email,
+            "hashed_password": "",
+            "budget_plan": {"Food": 300, "Entertainment": 80},
+            "budget": {"income": 4000, "expenses": -2500},
+            "target_item": "Laptop",
+            "target_amount": 1200,
+        })
+        index_col.document(email).set({"user_id": f"u{u}"})
+        emails.append(email)
+    return emails
+
+
+async def scan_budget(db: AsyncFakeFirestore, user_email: str) -> dict:
+    """The lookup /prediction used before: every user document, filtered in Python."""
+    users = [user.to_dict() for user in await db.collection(user_repo.USERS_COLLECTION).get()]
+    for user in users:
+        if user["email"] == user_email:
+            user_budget = dict(user.get("budget_plan") or user.get("budget") or {})
+            user_budget["target_item"] = user.get("target_item")
+            user_budget["target_amount"] = user.get("target_amount")
+            return user_budget
+    return {}
+
+
+async def measure(fn, db: AsyncFakeFirestore, emails: list[str]) -> dict[str, Any]:
+    latencies = []
+    reads_before = db.store.reads
+    step = max(1, len(emails) // LOOKUPS)
+    targets = emails[::step][:LOOKUPS]
+    for email in targets:
+        user_repo.email_id_cache.pop(email)  # measure the uncached path
+        t = time.perf_counter()
+        await fn(db, email)
+        latencies.append(time.perf_counter() - t)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "reads_per_lookup": round((db.store.reads - reads_before) / len(targets), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Users-collection scan vs indexed profile lookup.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated user counts")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated per-RPC latency")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        sync_db = FakeFirestore()
+        async_db = AsyncFakeFirestore(store=sync_db.store, latency=args.latency_ms / 1000)
+        database._firestore_client = sync_db
+        database._async_firestore_client = async_db
+        from routes.transactions import get_prediction_budget
+
+        emails = seed(sync_db, size)
+        for name, fn in (("scan", scan_budget), ("indexed", get_prediction_budget)):
+            row = {"users": size, "lookup": name, **asyncio.run(measure(fn, async_db, emails))}
+            results.append(row)
+            print(f"{size:>7} users  {name:<8} p50 {row['p50_ms']:>9} ms  max {row['max_ms']:>9} ms  "
+                  f"{row['reads_per_lookup']:>9} reads/lookup")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
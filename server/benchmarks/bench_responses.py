@@ -0,0 +1,128 @@
+"""
+Payload size and CPU of the heavy JSON responses, and what conditional GET saves on repeat
+polls. Runs on synthetic users (benchmarks/synthetic.py); the endpoint phase runs the real app
+in-process (httpx ASGI transport) on the in-memory fake Firestore. Run from the server directory:
+
+    python -m benchmarks.bench_responses
+    python -m benchmarks.bench_responses --sizes 1000,10000,100000 --json results.json
+
+For each user size:
+    encode     rendering the GET /transactions body with the stdlib encoder (the old
+               JSONResponse) vs orjson (InstrumentedJSONResponse), and its size raw, gzip and
+               brotli (when the brotli package is installed) with the encoding time
+    endpoints  GET /transactions and GET /carbon/footprint?include_transactions=true: median
+               latency and bytes on the wire for a full response (identity and compressed) and
+               for a revalidation with If-None-Match (304)
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+from fastapi.responses import JSONResponse
+
+import database
+import transaction_repo
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore
+from benchmarks.synthetic import generate_transactions
+from compression import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, brotli
+from request_metrics import InstrumentedJSONResponse
+
+EMAIL = "bench@example.com"
+ENDPOINTS = (
+    ("/transactions", {}),
+    ("/carbon/footprint", {"include_transactions": "true"}),
+)
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def encode_case(transactions: list[dict[str, Any]], repeat: int) -> dict[str, Any]:
+    body = InstrumentedJSONResponse(transactions).body
+    row: dict[str, Any] = {
+        "stdlib_json_ms": _median_ms(lambda: JSONResponse(transactions), repeat),
+        "orjson_ms": _median_ms(lambda: InstrumentedJSONResponse(transactions), repeat),
+        "raw_bytes": len(body),
+        "gzip_bytes": len(zlib.compress(body, COMPRESSION_GZIP_LEVEL, wbits=31)),
+        "gzip_ms": _median_ms(lambda: zlib.compress(body, COMPRESSION_GZIP_LEVEL, wbits=31), repeat),
+        "brotli_bytes": None,
+        "brotli_ms": None,
+    }
+    if brotli is not None:
+        row["brotli_bytes"] = len(brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY))
+        row["brotli_ms"] = _median_ms(lambda: brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY), repeat)
+    return row
+
+
+async def _measure(client: httpx.AsyncClient, path: str, params: dict, headers: dict, repeat: int) -> dict[str, Any]:
+    samples, wire, status = [], 0, None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        r = await client.get(path, params={"user_email": EMAIL, **params}, headers=headers)
+        samples.append(time.perf_counter() - t)
+        wire, status = r.num_bytes_downloaded, r.status_code
+    return {"status": status, "p50_ms": round(statistics.median(samples) * 1000, 2), "wire_bytes": wire}
+
+
+async def endpoint_cases(app, repeat: int) -> list[dict[str, Any]]:
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path, params in ENDPOINTS:
+            first = await client.get(path, params={"user_email": EMAIL, **params})
+            etag = first.headers["etag"]
+            for name, headers in (
+                ("full_identity", {"Accept-Encoding": "identity"}),
+                ("full_compressed", {"Accept-Encoding": "br, gzip"}),
+                ("not_modified", {"Accept-Encoding": "br, gzip", "If-None-Match": etag}),
+            ):
+                rows.append({"endpoint": path, "request": name, **await _measure(client, path, params, headers, repeat)})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response encoding, compression and conditional GET.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated transactions per user")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median reported)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        transactions = generate_transactions(size, seed=args.seed)
+        enc = encode_case(transactions, args.repeat)
+        print(
+            f"{size:>8} txns  encode: stdlib {enc['stdlib_json_ms']:>9} ms  orjson {enc['orjson_ms']:>9} ms  "
+            f"raw {enc['raw_bytes']:>10} B  gzip {enc['gzip_bytes']:>9} B ({enc['gzip_ms']} ms)  "
+            f"br {enc['brotli_bytes']} B ({enc['brotli_ms']} ms)"
+        )
+
+        sync_db = FakeFirestore()
+        database._firestore_client = sync_db
+        database._async_firestore_client = AsyncFakeFirestore(store=sync_db.store)
+        from main import app
+        transaction_repo.append_transactions_for_user(sync_db, EMAIL, transactions)
+        rows = asyncio.run(endpoint_cases(app, args.repeat))
+        for row in rows:
+            print(f"{'':>14}{row['endpoint']:<20} {row['request']:<16} {row['status']}  "
+                  f"p50 {row['p50_ms']:>9} ms  {row['wire_bytes']:>10} B")
+        results.append({"transactions": size, "encode": enc, "endpoints": rows})
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Scaling benchmarks for the transaction hot paths on synthetic users (see benchmarks/synthetic.py).
+Run from the server directory:
+
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --sizes 1000,10000,100000,1000000 --json results.json
+    python -m benchmarks.bench_suite --json new.json --baseline results.json   # exit 1 on regression
+
+For each user size it times, on the same generated history:
+    validate_transaction        per-row classifier, on a --validate-sample of rows (time per row)
+    validate_transactions_batch the batched classifier used on ingest, on every row
+    frame_build                 TransactionFrame.from_transactions (once per cached snapshot)
+    analysis                    routes.analysis.summarize_latest_month (the /analysis aggregation)
+    generate_budget             routes.budget_planner.compute_budget (full-history budget)
+    generate_budget_rollups     build_rollups + budget_from_rollups (the stored-rollup path)
+    carbon_footprint            routes.carbon.compute_footprint (get_carbon_footprint's work)
+    last_n_by_date              TransactionFrame.last(--last-n) (the last_n= query parameter)
+The analysis, budget, carbon and last-N cases run on a frame built beforehand, as the routes do.
+
+Each case runs --repeat times; the JSON records min/median seconds and median microseconds per
+transaction, with the git commit and interpreter, so runs can be compared over time. With
+--baseline, cases whose median is more than --threshold times the baseline's are reported.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.synthetic import generate_transactions
+from rollups import build_rollups
+from routes.analysis import summarize_latest_month
+from routes.budget_planner import budget_from_rollups, compute_budget
+from routes.carbon import compute_footprint
+from transaction_frame import TransactionFrame
+from transaction_repo import month_key
+
+CASES = (
+    "validate_transaction",
+    "validate_transactions_batch",
+    "frame_build",
+    "analysis",
+    "generate_budget",
+    "generate_budget_rollups",
+    "carbon_footprint",
+    "last_n_by_date",
+)
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _model_cases(sample_size: int):
+    """(per-row case, batch case) factories, or None if the model artifacts cannot be loaded."""
+    try:
+        from models.model_registry import ModelLoadError, registry
+        from models.valid_transaction import validate_transaction, validate_transactions_batch
+    except ImportError as e:
+        print(f"skipping classifier cases: {e}", file=sys.stderr)
+        return None
+    try:
+        bundle = registry.get()
+    except ModelLoadError as e:
+        print(f"skipping classifier cases: {e}", file=sys.stderr)
+        return None
+
+    def per_row(rows):
+        sample = rows[-sample_size:]
+        return lambda: [validate_transaction(t, bundle) for t in sample], len(sample)
+
+    def batch(rows):
+        return lambda: validate_transactions_batch(rows, bundle), len(rows)
+
+    return per_row, batch
+
+
+def run_size(size: int, seed: int, repeat: int, last_n: int, cases: set[str], model_cases) -> list[dict[str, Any]]:
+    t = time.perf_counter()
+    rows = generate_transactions(size, seed)
+    print(f"{size:>9,} transactions generated in {time.perf_counter() - t:.1f}s")
+    frame = TransactionFrame.from_transactions(rows)
+
+    factories: dict[str, Callable[[list], tuple[Callable[[], Any], int]]] = {
+        "frame_build": lambda r: (lambda: TransactionFrame.from_transactions(r), len(r)),
+        "analysis": lambda r: (lambda: summarize_latest_month(frame), len(r)),
+        "generate_budget": lambda r: (lambda: compute_budget(frame), len(r)),
+        "generate_budget_rollups": lambda r: (
+            lambda: budget_from_rollups(build_rollups(r, month_key)), len(r)
+        ),
+        "carbon_footprint": lambda r: (lambda: compute_footprint(frame), len(r)),
+        "last_n_by_date": lambda r: (lambda: frame.last(last_n), len(r)),
+    }
+    if model_cases is not None:
+        factories["validate_transaction"], factories["validate_transactions_batch"] = model_cases
+
+    results = []
+    for name in CASES:
+        if name not in cases or name not in factories:
+            continue
+        fn, n = factories[name](rows)
+        samples = _time(fn, repeat)
+        median = statistics.median(samples)
+        results.append({
+            "case": name,
+            "size": size,
+            "rows_timed": n,
+            "repeat": repeat,
+            "min_s": round(min(samples), 6),
+            "median_s": round(median, 6),
+            "us_per_txn": round(median / max(n, 1) * 1e6, 3),
+        })
+        print(f"{'':>9} {name:<28} median {median * 1000:10.2f} ms  {results[-1]['us_per_txn']:8.3f} us/txn")
+    return results
+
+
+def compare(results: list[dict[str, Any]], baseline: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """Cases whose median is more than threshold x the baseline's for the same case and size."""
+    before = {(r["case"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = before.get((r["case"], r["size"]))
+        if old is None or old["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        if ratio > threshold:
+            regressions.append({"case": r["case"], "size": r["size"], "ratio": round(ratio, 2),
+                                "baseline_s": old["median_s"], "median_s": r["median_s"]})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Transaction hot paths on synthetic users of increasing size.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma-separated transaction counts")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of " + ", ".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--last-n", type=int, default=100, help="n for last_n_by_date")
+    parser.add_argument("--validate-sample", type=int, default=200, help="Rows timed for validate_transaction")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parser.add_argument("--baseline", type=Path, help="Earlier --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    cases = {c.strip() for c in args.cases.split(",") if c.strip()}
+    unknown = cases - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    wants_model = bool(cases & {"validate_transaction", "validate_transactions_batch"})
+    model_cases = _model_cases(args.validate_sample) if wants_model else None
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(run_size(size, args.seed, args.repeat, args.last_n, cases, model_cases))
+
+    report: dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['case']} @ {r['size']:,}: {r['ratio']}x ({r['baseline_s']}s -> {r['median_s']}s)")
+        exit_code = 1 if regressions else 0
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
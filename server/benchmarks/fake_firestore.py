@@ -0,0 +1,10 @@
+"""
+In-memory stand-in for Firestore used by the benchmarks: a sync client (Client-like) and an
+async client (AsyncClient-like) over one shared store. These are the storage.memory clients
+under the names the benchmarks use; pass latency= to model the network round trip of each RPC.
+"""
+from storage.memory import AsyncMemoryClient as AsyncFakeFirestore
+from storage.memory import MemoryClient as FakeFirestore
+from storage.memory import MemoryStore
+
+__all__ = ["AsyncFakeFirestore", "FakeFirestore", "MemoryStore"]
@@ -0,0 +1,66 @@
+"""
+Local stand-in for the chat completions API used by routes/LLMcall.py, for load tests without
+network access or API keys. Run from the server directory:
+
+    python -m benchmarks.llm_standin --port 8081 --delay-ms 800 --error-rate 0.05
+
+then start the backend with LLM_API_URL=http://127.0.0.1:8081/v1/chat/completions.
+Responses follow the prediction schema; --error-rate returns 503s to exercise retries.
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="LLM stand-in")
+app.state.delay = 0.0
+app.state.error_rate = 0.0
+app.state.calls = 0
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.calls += 1
+    await asyncio.sleep(app.state.delay)
+    if random.random() < app.state.error_rate:
+        return JSONResponse(status_code=503, content={"error": "stand-in overloaded"})
+    prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+    prediction = {
+        "description": "Stand-in prediction",
+        "prediction_amount": round(len(prompt) / 10, 2),
+        "percentage_change": 5.0,
+        "savings_category": "Food",
+        "savings_amount": 25.0,
+        "months_saved": 1,
+    }
+    return {
+        "model": body.get("model"),
+        "choices": [{"message": {"role": "assistant", "content": json.dumps(prediction)}}],
+        "usage": {"prompt_tokens": len(prompt) // 4},
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {"calls": app.state.calls}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local chat completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay-ms", type=float, default=500.0, help="Simulated model latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503")
+    args = parser.parse_args()
+    app.state.delay = args.delay_ms / 1000
+    app.state.error_rate = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Synthetic transaction histories modelled on the sample users in data/ (user_2.json and
+user_persona_1_transactions.json), for benchmarks and load tests. Run from the server directory:
+
+    python -m benchmarks.synthetic --transactions 100000 --out /tmp/user.json
+    python -m benchmarks.synthetic --transactions 1000000 --ndjson --out /tmp/user.ndjson  # for /transactions/bulk
+
+Every merchant of the seed files becomes a template with its category, observed amounts, times
+of day and (for bills, pay and subscriptions) its day of the month. Merchants seen about once a
+month with a steady amount recur monthly; the rest are drawn in proportion to how often they
+occur in the seeds. Histories span up to MAX_YEARS ending at the seeds' last date; bigger users
+get more transactions per day. Output is deterministic for a given seed.
+"""
+import argparse
+import json
+import random
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+SEED_FILES = ("user_2.json", "user_persona_1_transactions.json")
+MAX_YEARS = 5
+
+
+@dataclass
+class _Template:
+    place: str
+    category: str
+    amounts: list[float]
+    seconds: list[int]
+    days: list[int]
+    weight: int
+
+
+def _load_seeds() -> list[list[dict[str, Any]]]:
+    """Transactions of each seed file."""
+    seeds = []
+    for name in SEED_FILES:
+        path = DATA_DIR / name
+        if path.exists():
+            seeds.append(json.loads(path.read_text())["transactions"])
+    if not seeds:
+        raise FileNotFoundError(f"No seed files found in {DATA_DIR}")
+    return seeds
+
+
+def _seconds(time_str: str) -> int:
+    h, m, *s = (int(p) for p in time_str.split(":"))
+    return h * 3600 + m * 60 + (s[0] if s else 0)
+
+
+def _span_days(rows: list[dict[str, Any]]) -> int:
+    dates = [date.fromisoformat(t["date"]) for t in rows]
+    return (max(dates) - min(dates)).days + 1
+
+
+def _templates() -> tuple[list[_Template], list[_Template], float]:
+    """(monthly templates, variable templates, variable transactions per day in an average seed user)."""
+    seeds = _load_seeds()
+    groups: dict[tuple[str, str], list[dict[str, Any]]] = defaultdict(list)
+    per_month: dict[tuple[str, str], float] = defaultdict(float)
+    for rows in seeds:
+        months = max(1.0, _span_days(rows) / 30.4)
+        counts: dict[tuple[str, str], int] = defaultdict(int)
+        for t in rows:
+            groups[(t["place"], t["category"])].append(t)
+            counts[(t["place"], t["category"])] += 1
+        for key, n in counts.items():
+            per_month[key] = max(per_month[key], n / months)
+
+    monthly, variable = [], []
+    for key, items in groups.items():
+        amounts = [float(t["amount"]) for t in items]
+        template = _Template(
+            place=key[0],
+            category=key[1],
+            amounts=amounts,
+            seconds=[_seconds(t["time"]) for t in items],
+            days=[date.fromisoformat(t["date"]).day for t in items],
+            weight=len(items),
+        )
+        steady = statistics.pstdev(amounts) <= 0.05 * abs(statistics.mean(amounts))
+        if steady and per_month[key] <= 1.5 and key[1] != "Food":
+            monthly.append(template)
+        else:
+            variable.append(template)
+    variable_keys = {(t.place, t.category) for t in variable}
+    per_day = statistics.mean(
+        sum(1 for t in rows if (t["place"], t["category"]) in variable_keys) / _span_days(rows) for rows in seeds
+    )
+    return monthly, variable, per_day
+
+
+def _end_date() -> date:
+    return max(date.fromisoformat(t["date"]) for rows in _load_seeds() for t in rows)
+
+
+def _row(rng: random.Random, template: _Template, day: date, amount: float) -> dict[str, Any]:
+    sec = min(86399, max(0, rng.choice(template.seconds) + rng.randint(-1800, 1800)))
+    return {
+        "date": day.isoformat(),
+        "time": f"{sec // 3600}:{sec % 3600 // 60:02d}:{sec % 60:02d}",
+        "amount": round(amount, 2),
+        "place": template.place,
+        "category": template.category,
+    }
+
+
+def generate_transactions(count: int, seed: int = 0, end: date | None = None) -> list[dict[str, Any]]:
+    """`count` transactions in the seed files' schema, oldest first, with unique transaction_ids."""
+    rng = random.Random(seed)
+    monthly, variable, per_day = _templates()
+    end = end or _end_date()
+    days = int(min(max(count / max(per_day, 0.1), 31), MAX_YEARS * 365))
+    start = end - timedelta(days=days - 1)
+
+    rows: list[dict[str, Any]] = []
+    month = date(start.year, start.month, 1)
+    while month <= end:
+        next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        for template in monthly:
+            day = month + timedelta(days=min(rng.choice(template.days), (next_month - month).days) - 1)
+            if start <= day <= end:
+                rows.append(_row(rng, template, day, rng.choice(template.amounts) * rng.uniform(0.98, 1.02)))
+        month = next_month
+    rng.shuffle(rows)
+    rows = rows[:count]
+
+    weights = [t.weight for t in variable]
+    for template in rng.choices(variable, weights=weights, k=count - len(rows)):
+        day = start + timedelta(days=rng.randrange(days))
+        rows.append(_row(rng, template, day, rng.choice(template.amounts) * rng.lognormvariate(0, 0.15)))
+
+    rows.sort(key=lambda t: (t["date"], _seconds(t["time"])))
+    for i, t in enumerate(rows):
+        t["transaction_id"] = f"SYN{seed}-{i:07d}"
+    return rows
+
+
+def generate_user(count: int, seed: int = 0) -> dict[str, Any]:
+    """A user document like the files in data/: {"transactions": [...], "metadata": {...}}."""
+    transactions = generate_transactions(count, seed)
+    return {
+        "transactions": transactions,
+        "metadata": {
+            "generator": "benchmarks.synthetic",
+            "seed": seed,
+            "period": f"{transactions[0]['date']} to {transactions[-1]['date']}" if transactions else "",
+            "total_transactions": len(transactions),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic transaction history.")
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ndjson", action="store_true", help="One transaction per line (for POST /transactions/bulk)")
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+
+    if args.ndjson:
+        with args.out.open("w") as f:
+            for t in generate_transactions(args.transactions, args.seed):
+                f.write(json.dumps(t) + "\n")
+    else:
+        args.out.write_text(json.dumps(generate_user(args.transactions, args.seed)))
+    print(f"wrote {args.transactions} transactions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
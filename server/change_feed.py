@@ -0,0 +1,270 @@
+"""
+In-process fan-out of per-user change events to server-sent-event connections (GET /events).
+
+A Topic exists per user while that user has open connections. It has one change source for the
+user document -- a Firestore on_snapshot listener when the backend has one (routes.events), plus
+notify() from the append path in this worker -- and each change runs one refresh (which reads
+what changed), whose events are encoded once and queued on every connection. Changes arriving
+while a refresh runs are coalesced into the next one.
+
+Backpressure: each connection buffers at most SSE_QUEUE_EVENTS events and SSE_QUEUE_BYTES bytes.
+A connection that falls behind has its backlog dropped and replaced by a single "resync" event
+(the client refetches), so a slow reader holds no more than its budget and never delays the
+others. Connections are capped per user and per process.
+
+Config (env): SSE_MAX_CONNECTIONS (default 1000), SSE_MAX_CONNECTIONS_PER_USER (default 5),
+SSE_QUEUE_EVENTS (default 100), SSE_QUEUE_BYTES (default 1048576), SSE_HEARTBEAT_SECONDS (default 15).
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+SSE_MAX_CONNECTIONS = int(os.environ.get("SSE_MAX_CONNECTIONS", "1000"))
+SSE_MAX_CONNECTIONS_PER_USER = int(os.environ.get("SSE_MAX_CONNECTIONS_PER_USER", "5"))
+SSE_QUEUE_EVENTS = int(os.environ.get("SSE_QUEUE_EVENTS", "100"))
+SSE_QUEUE_BYTES = int(os.environ.get("SSE_QUEUE_BYTES", str(1024 * 1024)))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+
+Event = tuple[str, dict[str, Any]]
+# refresh(key, state) -> (new state, events); state is None on the first call, which sets the baseline
+Refresh = Callable[[str, Any], Awaitable[tuple[Any, list[Event]]]]
+# watch(key, notify) -> unsubscribe callable, or None when the backend cannot watch documents
+Watch = Callable[[str, Callable[[], None]], Callable[[], None] | None]
+
+HEARTBEAT_FRAME = b": keep-alive\n\n"
+
+
+def encode_event(name: str, payload: dict[str, Any], event_id: int | None = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: ".encode() + orjson.dumps(payload) + b"\n\n"
+
+
+RESYNC_FRAME = encode_event("resync", {"reason": "slow_consumer"})
+
+
+class TooManyConnections(Exception):
+    def __init__(self, per_user: bool):
+        super().__init__("Too many event stream connections" + (" for this user" if per_user else ""))
+        self.per_user = per_user
+
+
+class Subscription:
+    """One connection's bounded queue of encoded events."""
+
+    def __init__(self, topic: "_Topic", max_events: int, max_bytes: int):
+        self.topic = topic
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._frames: deque[bytes] = deque()
+        self._bytes = 0
+        self._resync_queued = False
+        self._ready = asyncio.Event()
+
+    def push(self, frame: bytes) -> None:
+        if self._resync_queued:
+            # The refetch the queued resync triggers already covers this change
+            self.dropped += 1
+            self.topic.feed.dropped += 1
+            return
+        if len(self._frames) >= self.max_events or self._bytes + len(frame) > self.max_bytes:
+            # Fell behind: the backlog is replaced by one resync event
+            self.dropped += len(self._frames) + 1
+            self.topic.feed.dropped += len(self._frames) + 1
+            self.topic.feed.resyncs += 1
+            self._frames.clear()
+            self._bytes = 0
+            self._resync_queued = True
+            frame = RESYNC_FRAME
+        self._frames.append(frame)
+        self._bytes += len(frame)
+        self._ready.set()
+
+    async def frames(self, heartbeat_seconds: float = SSE_HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """Queued events as they arrive, with a comment line after heartbeat_seconds of silence."""
+        while True:
+            if not self._frames:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+                    continue
+            frame = self._frames.popleft()
+            self._bytes -= len(frame)
+            if frame is RESYNC_FRAME:
+                self._resync_queued = False
+            yield frame
+
+
+class _Topic:
+    """Subscribers, change source and last-seen state of one user."""
+
+    def __init__(self, feed: "ChangeFeed", key: str, refresh: Refresh):
+        self.feed = feed
+        self.key = key
+        self.refresh = refresh
+        self.loop = asyncio.get_running_loop()
+        self.subscribers: set[Subscription] = set()
+        self.state: Any = None
+        # Set when start() raised; the topic then never serves subscriptions
+        self.failure: BaseException | None = None
+        self._started = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._pending = False
+        self._unwatch: Callable[[], None] | None = None
+        self._seq = 0
+
+    async def start(self, watch: Watch | None) -> None:
+        try:
+            async with self._lock:
+                self.state, _ = await self.refresh(self.key, None)
+            if watch is not None:
+                self._unwatch = watch(self.key, self.notify)
+        except BaseException as e:
+            self.failure = e
+            raise
+        finally:
+            self._started.set()
+
+    def notify(self) -> None:
+        """Schedule a refresh (safe to call from any thread, e.g. a Firestore listener)."""
+        self.loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+        else:
+            self._pending = True
+
+    async def _run(self) -> None:
+        await self._started.wait()
+        while True:
+            self._pending = False
+            try:
+                async with self._lock:
+                    self.state, events = await self.refresh(self.key, self.state)
+            except Exception:
+                logger.exception("Change feed refresh failed for %s", self.key)
+                events = [("resync", {"reason": "error"})]
+            for name, payload in events:
+                self.publish(name, payload)
+            if not self._pending:
+                return
+
+    def publish(self, name: str, payload: dict[str, Any]) -> None:
+        self._seq += 1
+        frame = encode_event(name, payload, self._seq)
+        self.feed.events += 1
+        for subscription in list(self.subscribers):
+            subscription.push(frame)
+
+    def close(self) -> None:
+        if self._unwatch is not None:
+            self._unwatch()
+        if self._task is not None:
+            self._task.cancel()
+
+
+class ChangeFeed:
+    """Per-user topics for the event stream; all methods except notify() run on the event loop."""
+
+    def __init__(
+        self,
+        max_connections: int = SSE_MAX_CONNECTIONS,
+        max_per_user: int = SSE_MAX_CONNECTIONS_PER_USER,
+        queue_events: int = SSE_QUEUE_EVENTS,
+        queue_bytes: int = SSE_QUEUE_BYTES,
+    ):
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self.queue_events = queue_events
+        self.queue_bytes = queue_bytes
+        self._topics: dict[str, _Topic] = {}
+        self.connections = 0
+        self.events = 0
+        self.dropped = 0
+        self.resyncs = 0
+
+    async def subscribe(self, key: str, refresh: Refresh, watch: Watch | None = None) -> Subscription:
+        """
+        A new connection on the user's topic (starting the topic and its change source if needed).
+        Raises TooManyConnections over the limits, or what starting the topic raised (also in
+        the callers that were waiting for it). Pair with unsubscribe().
+        """
+        topic = self._topics.get(key)
+        if self.connections >= self.max_connections:
+            raise TooManyConnections(per_user=False)
+        if topic is not None and len(topic.subscribers) >= self.max_per_user:
+            raise TooManyConnections(per_user=True)
+
+        if topic is None:
+            topic = self._topics[key] = _Topic(self, key, refresh)
+            subscription = self._add(topic)
+            try:
+                await topic.start(watch)
+            except BaseException:
+                # Later subscribers start a fresh topic; the ones waiting on this one give up
+                del self._topics[key]
+                topic.close()
+                self.unsubscribe(subscription)
+                raise
+            return subscription
+        subscription = self._add(topic)
+        try:
+            await topic._started.wait()
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        if topic.failure is None:
+            return subscription
+        self.unsubscribe(subscription)
+        if isinstance(topic.failure, Exception):
+            raise topic.failure
+        # The request starting the topic was cancelled, which says nothing about this one: retry
+        return await self.subscribe(key, refresh, watch)
+
+    def _add(self, topic: _Topic) -> Subscription:
+        subscription = Subscription(topic, self.queue_events, self.queue_bytes)
+        topic.subscribers.add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        topic = subscription.topic
+        if subscription not in topic.subscribers:
+            return
+        topic.subscribers.discard(subscription)
+        self.connections -= 1
+        if not topic.subscribers and self._topics.get(topic.key) is topic:
+            del self._topics[topic.key]
+            topic.close()
+
+    def notify(self, key: str) -> None:
+        """The user's data changed in this worker (thread-safe; a no-op without connections)."""
+        topic = self._topics.get(key)
+        if topic is not None:
+            topic.notify()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "users": len(self._topics),
+            "events_published": self.events,
+            "events_dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "max_connections": self.max_connections,
+            "max_connections_per_user": self.max_per_user,
+            "queue_events": self.queue_events,
+            "queue_bytes": self.queue_bytes,
+        }
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,133 @@
+"""
+Response compression: gzip, or brotli when the optional brotli package is installed and the
+client prefers it, negotiated from Accept-Encoding (registered in main.py, inside
+RequestMetricsMiddleware so the encoding time shows up as the "compress" stage).
+
+Bodies smaller than COMPRESSION_MIN_BYTES, responses that already have a Content-Encoding and
+event streams pass through unchanged. Streamed responses (the chunked transaction lists) are
+compressed chunk by chunk and flushed after each one, so rows still reach the client as they
+are produced.
+
+Config (env): COMPRESSION_MIN_BYTES (default 1024, 0 disables), COMPRESSION_GZIP_LEVEL (default 6),
+COMPRESSION_BROTLI_QUALITY (default 4).
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from request_metrics import timed
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+ENCODERS = {"br": _Brotli, "gzip": _Gzip} if brotli is not None else {"gzip": _Gzip}
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """The supported encoding the client accepts with the highest q (brotli on ties), or None."""
+    best, best_q = None, 0.0
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if name not in ENCODERS:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q or (q == best_q and q > 0 and name == "br"):
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies of at least minimum_size bytes."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing is worth it
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                if (
+                    "content-encoding" in headers
+                    or headers.get("content-type", "").startswith("text/event-stream")
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                with timed("compress"):
+                    data = encoder.compress(body, final=not more_body)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(data))
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            with timed("compress"):
+                data = encoder.compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
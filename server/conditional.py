@@ -0,0 +1,44 @@
+"""
+Conditional GET for the heavy read endpoints (GET /transactions, GET /transactions_valid and
+GET /carbon/footprint).
+
+Their ETag is derived from what the body is computed from, not from the body itself: the
+user's data version (transaction_repo_async.get_data_version, the user document's update_time,
+which every append bumps), the query string, and anything else the route depends on (e.g. the
+classifier version). So a request whose If-None-Match still matches gets a 304 after a single
+document read, without loading, classifying or serializing any transactions. ETags are weak:
+the same representation may be sent gzip- or brotli-encoded (see compression).
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+# Clients may keep the body but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the given version parts (str() of each)."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match lists etag (weak comparison) or is "*"."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    opaque = etag.removeprefix("W/")
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -1,22 +1,30 @@
 """
 Database configuration for the smart budgeting app.
-Uses Firebase Firestore. Credentials via FIREBASE_SERVICE_ACCOUNT_JSON only (no files in repo).
+Uses Firebase Firestore by default. Credentials via FIREBASE_SERVICE_ACCOUNT_JSON only (no files in repo).
+
+STORAGE_BACKEND selects another document store with the same client API (see storage/):
+    firestore (default), memory (process-local, for tests and benchmarks) or sqlite (local file
+    at SQLITE_PATH, default server/data/local.db).
 """
 import json
 import os
-from typing import Generator
+from typing import Any, Generator
 
 from dotenv import load_dotenv
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 
 # Load .env from server dir and project root so it's found regardless of cwd
 _server_dir = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(_server_dir, ".env"))
 load_dotenv()  # also cwd (e.g. project root)
 
-# Firestore client (set after init)
-_firestore_client: firestore.Client | None = None
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH") or os.path.join(_server_dir, "data", "local.db")
+
+# Document clients (set after init); Firestore's unless STORAGE_BACKEND says otherwise
+_firestore_client: Any = None
+_async_firestore_client: Any = None
 
 
 def _get_credential():
@@ -34,11 +42,28 @@ def _get_credential():
         raise ValueError(f"FIREBASE_SERVICE_ACCOUNT_JSON is invalid JSON: {e}") from e
 
 
+def _init_local_backend() -> None:
+    global _firestore_client, _async_firestore_client
+    from storage import AsyncMemoryClient, AsyncSQLiteClient, MemoryClient, MemoryStore, SQLiteClient, SQLiteStore
+
+    if STORAGE_BACKEND == "memory":
+        store = MemoryStore()
+        _firestore_client, _async_firestore_client = MemoryClient(store), AsyncMemoryClient(store)
+    elif STORAGE_BACKEND == "sqlite":
+        store = SQLiteStore(SQLITE_PATH)
+        _firestore_client, _async_firestore_client = SQLiteClient(store), AsyncSQLiteClient(store)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r} (use firestore, memory or sqlite)")
+
+
 def init_db() -> None:
-    """Initialize Firebase Admin and Firestore. Safe to call multiple times (no-op if already initialized)."""
+    """Initialize the storage backend (Firebase Admin and Firestore by default). Safe to call multiple times."""
     global _firestore_client
     if _firestore_client is not None:
         return
+    if STORAGE_BACKEND != "firestore":
+        _init_local_backend()
+        return
     if not firebase_admin._apps:
         cred = _get_credential()
         firebase_admin.initialize_app(cred)
@@ -46,7 +71,23 @@ def init_db() -> None:
 
 
 def get_db() -> Generator[firestore.Client, None, None]:
-    """Dependency that yields the Firestore client. Ensures init_db() has been called."""
+    """Dependency that yields the (blocking) document client. Ensures init_db() has been called."""
     init_db()
     assert _firestore_client is not None
     yield _firestore_client
+
+
+def get_async_db() -> firestore_async.AsyncClient:
+    """Dependency that returns the shared async document client (Firestore's is created on first use)."""
+    global _async_firestore_client
+    init_db()
+    if _async_firestore_client is None:
+        _async_firestore_client = firestore_async.client()
+    return _async_firestore_client
+
+
+def get_sync_db() -> firestore.Client:
+    """The blocking document client, for work handed to a thread from async code and for scripts."""
+    init_db()
+    assert _firestore_client is not None
+    return _firestore_client
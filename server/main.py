@@ -1,21 +1,32 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from compression import CompressionMiddleware
 from database import init_db
-from routes import transactions, analysis, auth, target, reflection, budget_planner, carbon
+from models.model_registry import ModelLoadError, registry
+from password_hashing import shutdown_pool
+from prediction_jobs import job_queue
+from request_metrics import InstrumentedJSONResponse, RequestMetricsMiddleware, render_metrics
+from routes import transactions, analysis, auth, target, reflection, budget_planner, carbon, ml_models, dashboard, events, LLMcall
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    registry.warm_in_background()
     yield
+    await job_queue.close()
+    await LLMcall.close_client()
+    shutdown_pool()
     target, reflection
 
 app = FastAPI(
     title="TartanHacks Error 404 API",
     lifespan=lifespan,
+    default_response_class=InstrumentedJSONResponse,
 )
 
 app.add_middleware(
@@ -24,7 +35,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
+app.add_middleware(CompressionMiddleware)
+# Outermost, so its latency covers CORS handling too
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(transactions.router)
@@ -33,8 +48,22 @@ app.include_router(carbon.router)
 app.include_router(target.router)
 app.include_router(reflection.router)
 app.include_router(budget_planner.router)
+app.include_router(dashboard.router)
+app.include_router(events.router)
+app.include_router(ml_models.router)
+
+
+@app.exception_handler(ModelLoadError)
+async def model_load_error_handler(request: Request, exc: ModelLoadError):
+    return JSONResponse(status_code=503, content={"detail": "Classifier model is unavailable"})
 
 
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (see request_metrics)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
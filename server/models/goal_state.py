@@ -1,6 +1,45 @@
-target_profile = {
+"""
+Per-user savings goal and hourly wage, read by /target and /reflection/purchase.
+
+Stored on the user document (users/{id}):
+    goal         {"name", "target_amount", "current_savings", "target_date"}
+    hourly_wage  number
+Fields a user has not set fall back to DEFAULT_GOAL / DEFAULT_HOURLY_WAGE. current_savings only
+changes through a Firestore Increment (user_repo_async.add_goal_savings), so add-savings calls
+from any number of workers all count. Reads go through user_repo.goal_state_cache.
+"""
+from dataclasses import dataclass
+from typing import Any
+
+DEFAULT_GOAL = {
     "name": "Spring Break Trip",
     "target_amount": 800,
-    "current_savings": 420,
+    "current_savings": 0,
     "target_date": "2026-03-15"
 }
+DEFAULT_HOURLY_WAGE = 15.00
+
+# User document fields holding the state (for projected reads)
+GOAL_STATE_FIELDS = ["goal", "hourly_wage"]
+
+
+@dataclass(frozen=True)
+class GoalState:
+    name: str
+    target_amount: float
+    current_savings: float
+    target_date: str
+    hourly_wage: float
+
+
+def goal_state_from_user(data: dict[str, Any]) -> GoalState:
+    """GoalState from a user document's fields (defaults for what is not stored)."""
+    goal = {**DEFAULT_GOAL, **(data.get("goal") or {})}
+    hourly_wage = data.get("hourly_wage")
+    return GoalState(
+        name=goal["name"],
+        target_amount=goal["target_amount"],
+        current_savings=goal["current_savings"],
+        target_date=goal["target_date"],
+        hourly_wage=DEFAULT_HOURLY_WAGE if hourly_wage is None else hourly_wage,
+    )
@@ -0,0 +1,168 @@
+"""
+Registry for the expenditure classifier artifacts (model, scaler, TF-IDF, feature columns).
+Artifacts are resolved relative to this package (or MODEL_ARTIFACT_DIR), loaded lazily on first
+use or warmed from the app lifespan, and can be reloaded without a restart: a new bundle is
+fully loaded first and then swapped in with a single reference assignment, so requests always
+see one consistent version.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = Path(__file__).resolve().parent / "regression_model"
+
+ARTIFACT_FILES = {
+    "model": "dynamic_expenditure_model.pkl",
+    "scaler": "dynamic_scaler.pkl",
+    "tfidf": "dynamic_tfidf.pkl",
+    "feature_columns": "dynamic_feature_columns.pkl",
+}
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when the classifier artifacts cannot be loaded."""
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """One loaded, immutable version of all classifier artifacts."""
+    model: Any
+    scaler: Any
+    tfidf: Any
+    feature_columns: list[str]
+    version: str
+    artifact_dir: str
+    loaded_at: float
+    stats: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+
+def artifact_digest(artifact_dir: Path) -> str:
+    """Short sha256 over the artifact files; changes whenever any of them is replaced."""
+    h = hashlib.sha256()
+    for name in ARTIFACT_FILES.values():
+        with open(artifact_dir / name, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def _load_artifact(path: Path) -> tuple[Any, dict[str, Any]]:
+    """Load one joblib artifact (numpy arrays memory-mapped when stored uncompressed) and measure it."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    obj = joblib.load(path, mmap_mode="r")
+    elapsed = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+    return obj, {
+        "file_bytes": path.stat().st_size,
+        "load_seconds": round(elapsed, 6),
+        "memory_bytes": max(after - before, 0),
+    }
+
+
+def load_bundle(artifact_dir: Path) -> ModelBundle:
+    """Load every artifact in artifact_dir into a new ModelBundle. Raises ModelLoadError on failure."""
+    try:
+        version = artifact_digest(artifact_dir)
+        loaded: dict[str, Any] = {}
+        stats: dict[str, dict[str, Any]] = {}
+        for key, name in ARTIFACT_FILES.items():
+            loaded[key], stats[key] = _load_artifact(artifact_dir / name)
+    except Exception as e:
+        raise ModelLoadError(f"Could not load model artifacts from {artifact_dir}: {e}") from e
+    return ModelBundle(
+        model=loaded["model"],
+        scaler=loaded["scaler"],
+        tfidf=loaded["tfidf"],
+        feature_columns=list(loaded["feature_columns"]),
+        version=version,
+        artifact_dir=str(artifact_dir),
+        loaded_at=time.time(),
+        stats=stats,
+    )
+
+
+class ModelRegistry:
+    """Holds the current ModelBundle; loads lazily and hot-swaps on reload()."""
+
+    def __init__(self, artifact_dir: Path | str | None = None):
+        self.artifact_dir = Path(artifact_dir) if artifact_dir else DEFAULT_ARTIFACT_DIR
+        self._bundle: ModelBundle | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ModelBundle:
+        """Return the current bundle, loading it on first use."""
+        bundle = self._bundle
+        if bundle is not None:
+            return bundle
+        with self._lock:
+            if self._bundle is None:
+                self._bundle = load_bundle(self.artifact_dir)
+                logger.info("Loaded model artifacts version %s from %s", self._bundle.version, self.artifact_dir)
+            return self._bundle
+
+    def warm(self) -> bool:
+        """Load the artifacts now if they are not loaded yet. Logs instead of raising so startup never fails."""
+        try:
+            self.get()
+            return True
+        except ModelLoadError as e:
+            logger.error("%s", e)
+            return False
+
+    def warm_in_background(self) -> threading.Thread:
+        """Start warm() in a daemon thread; requests arriving meanwhile wait on the load lock."""
+        thread = threading.Thread(target=self.warm, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def reload(self, artifact_dir: Path | str | None = None) -> ModelBundle:
+        """
+        Load artifacts (from artifact_dir, or the configured directory) and swap them in.
+        The current bundle keeps serving until the new one is fully loaded; if the files
+        are unchanged the current bundle is kept.
+        """
+        target = Path(artifact_dir) if artifact_dir else self.artifact_dir
+        with self._lock:
+            current = self._bundle
+            if current is not None and current.artifact_dir == str(target):
+                try:
+                    if artifact_digest(target) == current.version:
+                        return current
+                except OSError as e:
+                    raise ModelLoadError(f"Could not read model artifacts in {target}: {e}") from e
+            bundle = load_bundle(target)
+            self.artifact_dir = target
+            self._bundle = bundle
+        logger.info("Swapped model artifacts to version %s from %s", bundle.version, target)
+        return bundle
+
+    def stats(self) -> dict[str, Any]:
+        """Version, source and per-artifact load time / memory of the current bundle (None if not loaded)."""
+        bundle = self._bundle
+        if bundle is None:
+            return {"loaded": False, "artifact_dir": str(self.artifact_dir)}
+        return {
+            "loaded": True,
+            "version": bundle.version,
+            "artifact_dir": bundle.artifact_dir,
+            "loaded_at": bundle.loaded_at,
+            "artifacts": bundle.stats,
+        }
+
+
+registry = ModelRegistry(os.getenv("MODEL_ARTIFACT_DIR") or None)
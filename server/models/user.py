@@ -35,6 +35,12 @@ class UserLogin(BaseModel):
     password: str
 
 
+class UserProfileUpdate(BaseModel):
+    full_name: str | None = None
+    name: str | None = None
+    phone_number: str | None = None
+
+
 class UserResponse(BaseModel):
     id: str
     email: str
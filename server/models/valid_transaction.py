@@ -1,21 +1,39 @@
-import joblib
+import hashlib
+import json
+import re
+
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from scipy.sparse import hstack
 
+from models.model_registry import ModelBundle, registry
+from request_metrics import timed
 
-try:
-    model = joblib.load('models/regression_model/dynamic_expenditure_model.pkl')
-    scaler = joblib.load('models/regression_model/dynamic_scaler.pkl')
-    tfidf = joblib.load('models/regression_model/dynamic_tfidf.pkl')
-    feature_columns = joblib.load('models/regression_model/dynamic_feature_columns.pkl')
-    
 
-    
-except Exception as e:
-    print(f"\n❌ ERROR loading files: {e}")
-    exit(1)
+CATEGORIES = ['Housing & Bills', 'Health', 'Entertainment', 'Shopping',
+              'Transport', 'Food', 'Personal', 'Subscriptions', 'Income & Transfers']
+
+RECURRING_WORDS = ['auto-pay', 'subscription', 'monthly']
+GROCERY_WORDS = ['grocery', 'groceries', 'market']
+FUEL_WORDS = ['gas', 'fuel', 'station']
+HEALTH_WORDS = ['pharmacy', 'medical', 'doctor', 'hospital', 'clinic']
+ENTERTAINMENT_WORDS = ['movie', 'cinema', 'theater', 'concert', 'bar', 'club']
+
+
+# Strings the vectorised parsers take as is; anything else goes through the same strptime as
+# extract_dynamic_features, so both paths accept and reject the same values
+_ISO_DATE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+_CLOCK_TIME = re.compile(r'([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]')
+
+# Transaction fields read by extract_dynamic_features (and the amount sign check in validate_transaction)
+FEATURE_FIELDS = ('amount', 'category', 'place', 'date', 'time')
+
+
+def transaction_content_hash(transaction):
+    """Hash of the fields the classifier reads; equal hashes always get the same label."""
+    payload = json.dumps([transaction.get(f) for f in FEATURE_FIELDS], separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
 
 
 def extract_dynamic_features(transaction):   
@@ -40,18 +58,16 @@ def extract_dynamic_features(transaction):
     is_small_expense = 1 if amount < 10 else 0
     is_medium_expense = 1 if 10 <= amount <= 50 else 0
     
-    categories = ['Housing & Bills', 'Health', 'Entertainment', 'Shopping', 
-                  'Transport', 'Food', 'Personal', 'Subscriptions', 'Income & Transfers']
     category_features = {f'category_{i}': 1 if category == cat else 0 
-                        for i, cat in enumerate(categories)}
+                        for i, cat in enumerate(CATEGORIES)}
     
     place_lower = place.lower()
-    is_recurring = 1 if any(word in place_lower for word in ['auto-pay', 'subscription', 'monthly']) else 0
+    is_recurring = 1 if any(word in place_lower for word in RECURRING_WORDS) else 0
     contains_insurance = 1 if 'insurance' in place_lower else 0
-    suggests_grocery = 1 if any(word in place_lower for word in ['grocery', 'groceries', 'market']) else 0
-    suggests_fuel = 1 if any(word in place_lower for word in ['gas', 'fuel', 'station']) else 0
-    suggests_health = 1 if any(word in place_lower for word in ['pharmacy', 'medical', 'doctor', 'hospital', 'clinic']) else 0
-    suggests_entertainment = 1 if any(word in place_lower for word in ['movie', 'cinema', 'theater', 'concert', 'bar', 'club']) else 0
+    suggests_grocery = 1 if any(word in place_lower for word in GROCERY_WORDS) else 0
+    suggests_fuel = 1 if any(word in place_lower for word in FUEL_WORDS) else 0
+    suggests_health = 1 if any(word in place_lower for word in HEALTH_WORDS) else 0
+    suggests_entertainment = 1 if any(word in place_lower for word in ENTERTAINMENT_WORDS) else 0
     place_word_count = len(place.split())
     has_hyphen = 1 if '-' in place else 0
     
@@ -84,19 +100,21 @@ def extract_dynamic_features(transaction):
     return features, place
 
 
-def validate_transaction(transaction):
+def validate_transaction(transaction, bundle: ModelBundle | None = None):
     if transaction['amount'] < 0:
-        features, place_text = extract_dynamic_features(transaction)
-        feature_df = pd.DataFrame([features])[feature_columns]
-        
-        structured_scaled = scaler.transform(feature_df)
-            
-        tfidf_features = tfidf.transform([place_text])
-            
-        X_combined = hstack([structured_scaled, tfidf_features])
-            
-        prediction = model.predict(X_combined)[0]
-        probability = model.predict_proba(X_combined)[0]
+        bundle = bundle or registry.get()
+        with timed("inference"):
+            features, place_text = extract_dynamic_features(transaction)
+            feature_df = pd.DataFrame([features])[bundle.feature_columns]
+
+            structured_scaled = bundle.scaler.transform(feature_df)
+
+            tfidf_features = bundle.tfidf.transform([place_text])
+
+            X_combined = hstack([structured_scaled, tfidf_features])
+
+            prediction = bundle.model.predict(X_combined)[0]
+            probability = bundle.model.predict_proba(X_combined)[0]
             
         pred_label = "Important" if prediction == 1 else "Discretionary"
         confidence = max(probability)
@@ -105,4 +123,106 @@ def validate_transaction(transaction):
         return "Income & Transfers", 1.0
 
 
+def _parse_dates(date_strings):
+    """
+    Parse dates into a datetime64[D] array, accepting exactly what strptime('%Y-%m-%d') does
+    (numpy alone also takes 'NaT', '2024-01' or year 0).
+    """
+    if all(_ISO_DATE.fullmatch(d) for d in date_strings):
+        try:
+            dates = np.array(date_strings, dtype='datetime64[D]')
+        except ValueError:
+            pass
+        else:
+            if not len(dates) or dates.min() >= np.datetime64('0001-01-01'):
+                return dates
+    parsed = [datetime.strptime(d, '%Y-%m-%d').date() for d in date_strings]
+    return np.array(parsed, dtype='datetime64[D]')
+
+
+def _parse_hours(time_strings):
+    """Hour of each time, accepting exactly what strptime('%H:%M:%S') does."""
+    return np.array(
+        [int(t[:2]) if _CLOCK_TIME.fullmatch(t) else datetime.strptime(t, '%H:%M:%S').hour for t in time_strings],
+        dtype=np.int64,
+    )
 
+
+def _keyword_flags(places_lower, words):
+    return np.array([1 if any(word in p for word in words) else 0 for p in places_lower])
+
+
+def extract_dynamic_features_batch(transactions, feature_columns):
+    """
+    Column-wise version of extract_dynamic_features for a list of transactions.
+    Returns (feature DataFrame in feature_columns order, list of place strings).
+    """
+    amount = np.abs(np.array([t['amount'] for t in transactions], dtype=np.float64))
+    categories = np.array([t['category'] for t in transactions], dtype=object)
+    places = [t['place'] for t in transactions]
+    places_lower = [p.lower() for p in places]
+
+    dates = _parse_dates([t['date'] for t in transactions])
+    # 1970-01-01 was a Thursday (weekday 3)
+    day_of_week = (dates.astype(np.int64) + 3) % 7
+    day_of_month = (dates - dates.astype('datetime64[M]')).astype(np.int64) + 1
+    hour = _parse_hours([t['time'] for t in transactions])
+
+    features = {
+        'amount': amount,
+        'amount_log': np.log1p(amount),
+        'is_large_expense': (amount > 100).astype(int),
+        'is_small_expense': (amount < 10).astype(int),
+        'is_medium_expense': ((amount >= 10) & (amount <= 50)).astype(int),
+        'day_of_week': day_of_week,
+        'day_of_month': day_of_month,
+        'is_weekend': (day_of_week >= 5).astype(int),
+        'is_month_start': (day_of_month <= 5).astype(int),
+        'hour': hour,
+        'is_morning': ((hour >= 6) & (hour < 12)).astype(int),
+        'is_afternoon': ((hour >= 12) & (hour < 18)).astype(int),
+        'is_evening': ((hour >= 18) & (hour < 24)).astype(int),
+        'is_night': ((hour >= 0) & (hour < 6)).astype(int),
+        'is_recurring': _keyword_flags(places_lower, RECURRING_WORDS),
+        'contains_insurance': np.array([1 if 'insurance' in p else 0 for p in places_lower]),
+        'suggests_grocery': _keyword_flags(places_lower, GROCERY_WORDS),
+        'suggests_fuel': _keyword_flags(places_lower, FUEL_WORDS),
+        'suggests_health': _keyword_flags(places_lower, HEALTH_WORDS),
+        'suggests_entertainment': _keyword_flags(places_lower, ENTERTAINMENT_WORDS),
+        'place_word_count': np.array([len(p.split()) for p in places]),
+        'has_hyphen': np.array([1 if '-' in p else 0 for p in places]),
+    }
+    for i, cat in enumerate(CATEGORIES):
+        features[f'category_{i}'] = (categories == cat).astype(int)
+
+    return pd.DataFrame(features)[feature_columns], places
+
+
+def validate_transactions_batch(transactions, bundle: ModelBundle | None = None):
+    """
+    Classify a list of transactions in one pass: one scaler transform, one TF-IDF transform
+    and one predict_proba call for all expenses. Returns a list of (label, confidence) in
+    input order, identical to calling validate_transaction on each item.
+    """
+    results = [("Income & Transfers", 1.0)] * len(transactions)
+    expense_idx = [i for i, t in enumerate(transactions) if t['amount'] < 0]
+    if not expense_idx:
+        return results
+
+    bundle = bundle or registry.get()
+    with timed("inference"):
+        feature_df, place_texts = extract_dynamic_features_batch(
+            [transactions[i] for i in expense_idx], bundle.feature_columns
+        )
+        structured_scaled = bundle.scaler.transform(feature_df)
+        tfidf_features = bundle.tfidf.transform(place_texts)
+        X_combined = hstack([structured_scaled, tfidf_features])
+
+        probabilities = bundle.model.predict_proba(X_combined)
+    predictions = bundle.model.classes_[probabilities.argmax(axis=1)]
+    confidences = probabilities.max(axis=1)
+
+    for i, prediction, confidence in zip(expense_idx, predictions, confidences):
+        pred_label = "Important" if prediction == 1 else "Discretionary"
+        results[i] = (pred_label, confidence)
+    return results
@@ -0,0 +1,93 @@
+"""
+Password hashing (PBKDF2-SHA256 via passlib) on a dedicated, size-limited process pool.
+
+Hashing is deliberately CPU-heavy; running it on the request thread pool lets a login burst
+starve every other endpoint. hash_password_async / verify_and_update_async hand the work to
+PASSWORD_HASH_WORKERS processes instead, so at most that many hashes run at once and the rest queue.
+The workers are spawned (they import only this module), never forked from the server.
+
+Stored hashes carry their own rounds, so changing PASSWORD_HASH_ROUNDS keeps old hashes valid;
+verify_and_update_async returns a new hash when the stored one was made with other parameters,
+and login saves it (transparent rehash).
+
+Config (env):
+    PASSWORD_HASH_ROUNDS    PBKDF2 iterations, default 29000 (passlib's default)
+    PASSWORD_HASH_WORKERS   pool processes, default min(2, cpu count); 0 runs on the thread pool instead
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# min == max == default: any hash made with other rounds needs an update
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
+)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def hash_password(password: str) -> str:
+    """Hash password (any length). No limit."""
+    return pwd_context.hash(password)
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return pwd_context.verify(plain, hashed)
+
+
+def verify_and_update(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """(matches, new hash if the stored one uses outdated parameters else None)."""
+    if not hashed:
+        return False, None
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: by the first login this process has gRPC channels and threads,
+        # which forked children can inherit in a locked state
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def _run(fn, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+        shutdown_pool()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_and_update_async(plain: str, hashed: str) -> tuple[bool, str | None]:
+    return await _run(verify_and_update, plain, hashed)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (app shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,203 @@
+"""
+In-process job queue for spending predictions (POST /prediction/jobs, GET /prediction/jobs/{id}).
+
+A prediction classifies every transaction and makes a multi-second LLM call, so instead of
+holding the request, a job is queued and run by a fixed pool of PREDICTION_JOB_WORKERS worker
+tasks; clients poll the job until it is done. Each job has a digest of its inputs (user, data
+version, budget, classifier and model; see routes.transactions):
+    - a job whose digest is already queued or running is not queued again: its id is returned
+    - a successful result is cached by digest for PREDICTION_JOB_RESULT_TTL_SECONDS, so the same
+      inputs get the finished job back without running anything
+Finished jobs (done or failed) can be fetched for the same TTL. Failures are not cached, so the
+next submit runs again. Jobs are kept in this process only (like change_feed): with several
+workers, poll the one that accepted the job. The queue holds at most PREDICTION_JOB_QUEUE_SIZE
+jobs, and each user at most PREDICTION_JOBS_PER_USER queued or running ones.
+
+Config (env): PREDICTION_JOB_WORKERS (default 4), PREDICTION_JOB_QUEUE_SIZE (default 100),
+PREDICTION_JOBS_PER_USER (default 3), PREDICTION_JOB_TIMEOUT_SECONDS (default 120),
+PREDICTION_JOB_RESULT_TTL_SECONDS (default 600, 0 disables the result cache),
+PREDICTION_JOB_CACHE_SIZE (default 10000 jobs and results).
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from auth_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_JOB_WORKERS = int(os.environ.get("PREDICTION_JOB_WORKERS", "4"))
+PREDICTION_JOB_QUEUE_SIZE = int(os.environ.get("PREDICTION_JOB_QUEUE_SIZE", "100"))
+PREDICTION_JOBS_PER_USER = int(os.environ.get("PREDICTION_JOBS_PER_USER", "3"))
+PREDICTION_JOB_TIMEOUT_SECONDS = float(os.environ.get("PREDICTION_JOB_TIMEOUT_SECONDS", "120"))
+PREDICTION_JOB_RESULT_TTL_SECONDS = float(os.environ.get("PREDICTION_JOB_RESULT_TTL_SECONDS", "600"))
+PREDICTION_JOB_CACHE_SIZE = int(os.environ.get("PREDICTION_JOB_CACHE_SIZE", "10000"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# run() -> the prediction, or None when it could not be made
+Run = Callable[[], Awaitable[dict[str, Any] | None]]
+
+
+def input_digest(inputs: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class QueueFull(Exception):
+    def __init__(self, per_user: bool):
+        super().__init__("Too many prediction jobs" + (" for this user" if per_user else ""))
+        self.per_user = per_user
+
+
+@dataclass
+class Job:
+    id: str
+    user_key: str
+    digest: str
+    run: Run | None = field(default=None, repr=False)
+    status: str = QUEUED
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"job_id": self.id, "status": self.status, "created_at": self.created_at}
+        if self.started_at is not None:
+            out["started_at"] = self.started_at
+        if self.finished_at is not None:
+            out["finished_at"] = self.finished_at
+        if self.status == DONE:
+            out["result"] = self.result
+        elif self.status == FAILED:
+            out["error"] = self.error
+        return out
+
+
+class JobQueue:
+    """Bounded queue and worker pool; all methods run on the event loop."""
+
+    def __init__(
+        self,
+        workers: int = PREDICTION_JOB_WORKERS,
+        queue_size: int = PREDICTION_JOB_QUEUE_SIZE,
+        per_user: int = PREDICTION_JOBS_PER_USER,
+        timeout_seconds: float = PREDICTION_JOB_TIMEOUT_SECONDS,
+        result_ttl_seconds: float = PREDICTION_JOB_RESULT_TTL_SECONDS,
+        cache_size: int = PREDICTION_JOB_CACHE_SIZE,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.per_user = per_user
+        self.timeout_seconds = timeout_seconds
+        # Active (queued / running) jobs by id and by digest; finished ones expire from the caches
+        self._active: dict[str, Job] = {}
+        self._active_by_digest: dict[str, Job] = {}
+        self._finished = TTLCache(cache_size, result_ttl_seconds)
+        self._results = TTLCache(cache_size, result_ttl_seconds)
+        self._queue: asyncio.Queue[Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._counters = {"submitted": 0, "deduplicated": 0, "cache_hits": 0, "done": 0, "failed": 0, "rejected": 0}
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(self.queue_size)
+        # A fresh context, so the workers are not attributed to the request that started them
+        self._tasks = [loop.create_task(self._work(), context=contextvars.Context()) for _ in range(self.workers)]
+
+    def submit(self, user_key: str, digest: str, run: Run) -> tuple[Job, bool]:
+        """
+        (job, queued): the job for these inputs -- a cached result or an active job with the same
+        digest when there is one (queued False), else a new queued job. Raises QueueFull.
+        """
+        cached = self._results.get(digest)
+        if cached is not None:
+            self._counters["cache_hits"] += 1
+            return cached, False
+        active = self._active_by_digest.get(digest)
+        if active is not None:
+            self._counters["deduplicated"] += 1
+            return active, False
+
+        self._ensure_workers()
+        if sum(1 for j in self._active.values() if j.user_key == user_key) >= self.per_user:
+            self._counters["rejected"] += 1
+            raise QueueFull(per_user=True)
+        job = Job(id=uuid.uuid4().hex, user_key=user_key, digest=digest, run=run)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            raise QueueFull(per_user=False)
+        self._active[job.id] = job
+        self._active_by_digest[digest] = job
+        self._counters["submitted"] += 1
+        return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        return self._active.get(job_id) or self._finished.get(job_id)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job) -> None:
+        job.status, job.started_at = RUNNING, time.time()
+        try:
+            result = await asyncio.wait_for(job.run(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            result, job.error = None, "Prediction timed out"
+        except Exception:
+            logger.exception("Prediction job %s failed", job.id)
+            result, job.error = None, "Prediction failed"
+        else:
+            if result is None:
+                job.error = "Prediction unavailable"
+        job.status = DONE if result is not None else FAILED
+        job.result, job.finished_at, job.run = result, time.time(), None
+        self._counters["done" if result is not None else "failed"] += 1
+
+        self._active.pop(job.id, None)
+        if self._active_by_digest.get(job.digest) is job:
+            del self._active_by_digest[job.digest]
+        self._finished.put(job.id, job)
+        if result is not None:
+            self._results.put(job.digest, job)
+
+    async def close(self) -> None:
+        """Cancel the workers (app shutdown); queued jobs are dropped."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        if self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        running = sum(1 for j in self._active.values() if j.status == RUNNING)
+        return {
+            "queued": len(self._active) - running,
+            "running": running,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "cached_results": len(self._results),
+            **self._counters,
+        }
+
+
+job_queue = JobQueue()
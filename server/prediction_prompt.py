@@ -0,0 +1,228 @@
+"""
+Token-compact user message for the spending prediction (routes/LLMcall.py).
+
+Instead of the raw JSON of every discretionary transaction, the model gets aggregates whose
+size does not grow with history:
+    summary        count, total spend, first and last date
+    by_category    {category: {"spend", "count"}}, largest first
+    by_week        [{"week": "YYYY-Www", "spend", "count"}] for the most recent ISO weeks
+    top_merchants  [{"merchant", "spend", "count"}]
+    trend          spend in the last 30 days of the history vs the 30 days before, and the % change
+    recent         the latest transactions (date, amount, place, category), as many as fit
+
+Histories whose raw list already fits LLM_PROMPT_TOKEN_BUDGET (estimated tokens of the whole
+message) are sent as-is. Otherwise weeks, merchants and categories are trimmed until the
+aggregates fit, then recent transactions fill what is left. Tokens are estimated at ~4
+characters per token (no tokenizer dependency). Spend counts outflows (negative amounts) only.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any
+
+from transaction_repo import _iso_date
+
+logger = logging.getLogger(__name__)
+
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "1500"))
+
+MAX_WEEKS = 12
+MAX_MERCHANTS = 5
+TREND_DAYS = 30
+
+_totals = {"calls": 0, "transactions": 0, "tokens_raw": 0, "tokens_compact": 0, "over_budget": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def _render(user_budget: dict[str, Any], spending: str, what: str) -> str:
+    return f"""
+  Here is the user's monthly budget context:
+  {_dumps(user_budget)}
+
+  Here is {what} of the user's "discretionary/bad" transactions:
+  {spending}
+
+  Based on this data:
+  1. Predict the total spending for next month based on these bad habits continuing.
+  2. Calculate the percentage change from the current month.
+  3. Identify ONE specific category where they can save money (the "Savings Opportunity").
+  4. Calculate how much they save if they cut that category by 25%.
+  5. Estimate how many months earlier they will reach their savings goal with that extra cash.
+  6. Provide a short description of the prediction.
+  """
+
+
+_SUMMARY_NOTE = (
+    "a summary (spend is in dollars; by_week uses ISO weeks; trend compares the last 30 days of "
+    "history with the 30 days before; recent lists the latest transactions)"
+)
+
+
+def _spend(t: dict[str, Any]) -> float:
+    try:
+        return max(-float(t.get("amount") or 0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_date(t: dict[str, Any]) -> date | None:
+    try:
+        return date.fromisoformat(_iso_date(t.get("date") or t.get("transaction_date")) or "")
+    except ValueError:
+        return None
+
+
+def _ranked(groups: dict[str, list[float]], key: str, limit: int | None) -> list[dict[str, Any]]:
+    rows = sorted(groups.items(), key=lambda kv: -kv[1][0])
+    return [{key: name, "spend": round(total, 2), "count": count} for name, (total, count) in rows[:limit]]
+
+
+def compact_transactions(
+    transactions: list[dict[str, Any]],
+    weeks: int = MAX_WEEKS,
+    merchants: int = MAX_MERCHANTS,
+    categories: int | None = None,
+) -> dict[str, Any]:
+    """Aggregates of the transactions (see module docstring), without the recent list."""
+    by_category: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+    by_merchant: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+    by_week: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+    dated: list[tuple[date, float]] = []
+    total = 0.0
+    for t in transactions:
+        spend = _spend(t)
+        total += spend
+        for groups, name in ((by_category, t.get("category") or "Other"), (by_merchant, t.get("place") or "Unknown")):
+            groups[str(name)][0] += spend
+            groups[str(name)][1] += 1
+        d = _parse_date(t)
+        if d is not None:
+            year, week, _ = d.isocalendar()
+            by_week[f"{year}-W{week:02d}"][0] += spend
+            by_week[f"{year}-W{week:02d}"][1] += 1
+            dated.append((d, spend))
+
+    summary: dict[str, Any] = {"count": len(transactions), "spend": round(total, 2)}
+    trend = None
+    if dated:
+        first, last = min(d for d, _ in dated), max(d for d, _ in dated)
+        summary.update(first_date=first.isoformat(), last_date=last.isoformat())
+        recent_start = last - timedelta(days=TREND_DAYS - 1)
+        previous_start = recent_start - timedelta(days=TREND_DAYS)
+        recent = sum(s for d, s in dated if d >= recent_start)
+        previous = sum(s for d, s in dated if previous_start <= d < recent_start)
+        trend = {
+            "last_30_days": round(recent, 2),
+            "previous_30_days": round(previous, 2),
+            "change_pct": round((recent - previous) / previous * 100, 1) if previous else None,
+        }
+
+    week_rows = [
+        {"week": w, "spend": round(s, 2), "count": c}
+        for w, (s, c) in sorted(by_week.items())[-weeks:]
+    ] if weeks > 0 else []
+    return {
+        "summary": summary,
+        "by_category": {r["category"]: {"spend": r["spend"], "count": r["count"]}
+                        for r in _ranked(by_category, "category", categories)},
+        "by_week": week_rows,
+        "top_merchants": _ranked(by_merchant, "merchant", merchants),
+        "trend": trend,
+    }
+
+
+def _recent_rows(transactions: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Transactions newest first, reduced to the fields the model needs."""
+    rows = [
+        {"date": _iso_date(t.get("date") or t.get("transaction_date")), "amount": t.get("amount"),
+         "place": t.get("place"), "category": t.get("category")}
+        for t in transactions
+    ]
+    return sorted(rows, key=lambda r: r["date"] or "", reverse=True)
+
+
+def build_user_message(
+    user_budget: dict[str, Any],
+    transactions: list[dict[str, Any]],
+    token_budget: int | None = None,
+) -> tuple[str, dict[str, Any]]:
+    """
+    The prediction's user message with compacted transactions, and token stats:
+    {"transactions", "tokens_raw", "tokens_compact", "recent_included", "token_budget", "over_budget"}.
+    """
+    budget = LLM_PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    raw_text = _render(user_budget, json.dumps(transactions, default=str), "a list")
+    tokens_raw = estimate_tokens(raw_text)
+    if tokens_raw <= budget:
+        return raw_text, _record({
+            "transactions": len(transactions), "tokens_raw": tokens_raw, "tokens_compact": tokens_raw,
+            "recent_included": len(transactions), "token_budget": budget, "over_budget": False,
+        })
+
+    def message(ctx: dict[str, Any]) -> str:
+        return _render(user_budget, _dumps(ctx), _SUMMARY_NOTE)
+
+    limits = {"weeks": MAX_WEEKS, "merchants": MAX_MERCHANTS, "categories": None}
+    context = compact_transactions(transactions, **limits)
+    # Trim the aggregates, halving the longest list each round, until they fit
+    while estimate_tokens(message(context)) > budget:
+        sizes = {"weeks": len(context["by_week"]), "merchants": len(context["top_merchants"]),
+                 "categories": len(context["by_category"])}
+        name = max(sizes, key=sizes.get)
+        if sizes[name] <= 1:
+            break
+        limits[name] = sizes[name] // 2
+        context = compact_transactions(transactions, **limits)
+
+    # Largest number of recent transactions that still fits (message size grows with n)
+    rows = _recent_rows(transactions)
+    lo, hi = 0, min(len(rows), budget // 10)  # a row is well over 10 tokens
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(message({**context, "recent": rows[:mid]})) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    context["recent"] = rows[:lo]
+
+    text = message(context)
+    return text, _record({
+        "transactions": len(transactions),
+        "tokens_raw": tokens_raw,
+        "tokens_compact": estimate_tokens(text),
+        "recent_included": lo,
+        "token_budget": budget,
+        "over_budget": estimate_tokens(text) > budget,
+    })
+
+
+def _record(stats: dict[str, Any]) -> dict[str, Any]:
+    _totals["calls"] += 1
+    _totals["transactions"] += stats["transactions"]
+    _totals["tokens_raw"] += stats["tokens_raw"]
+    _totals["tokens_compact"] += stats["tokens_compact"]
+    _totals["over_budget"] += stats["over_budget"]
+    if stats["over_budget"]:
+        logger.warning("Prediction prompt is over the token budget even fully compacted: %s", stats)
+    else:
+        logger.info("Prediction prompt tokens: %s", stats)
+    return stats
+
+
+def prompt_stats() -> dict[str, Any]:
+    """Cumulative token counts before and after compaction."""
+    raw, compact = _totals["tokens_raw"], _totals["tokens_compact"]
+    return {
+        **_totals,
+        "token_budget": LLM_PROMPT_TOKEN_BUDGET,
+        "compaction_ratio": round(compact / raw, 3) if raw else None,
+    }
@@ -0,0 +1,252 @@
+"""
+Request instrumentation: where a request's time goes, per request and in aggregate.
+
+RequestMetricsMiddleware (registered in main.py) gives every HTTP request a RequestMetrics in a
+context variable, which code anywhere below the route adds to:
+    db_call(reads=, writes=)  around a Firestore RPC in the repos: times stage "db", counts documents
+    timed("inference")        around classifier calls (models.valid_transaction)
+    timed("llm")              around the LLM HTTP call (routes.LLMcall)
+    timed("serialize")        JSON rendering (InstrumentedJSONResponse, the app's default response class)
+    timed("compress")         gzip / brotli encoding of response bodies (compression.CompressionMiddleware)
+Context variables follow asyncio.gather tasks and run_in_threadpool, so concurrent reads of one
+request add up (stage durations are summed, and can exceed the wall time when calls overlap).
+
+The response gets a Server-Timing header (db;dur=12.1;desc="reads=3 writes=0", inference, llm,
+serialize, compress and total) and the Prometheus text exposition at GET /metrics holds:
+    http_request_duration_seconds   histogram by method, route template and status
+    app_stage_duration_seconds      histogram by stage
+    firestore_document_reads_total / firestore_document_writes_total   by route template
+
+Config (env): SERVER_TIMING_HEADER (default 1; 0 keeps the header off responses, /metrics still works).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from fastapi.responses import ORJSONResponse
+
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "1") != "0"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGES = ("db", "inference", "llm", "serialize", "compress")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels (Prometheus semantics)."""
+
+    def __init__(
+        self, name: str, help_text: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [count per bucket (non-cumulative, +Inf last), sum]
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple[str, ...] = ()) -> None:
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, float("inf")), counts):
+                    cumulative += n
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+    "app_stage_duration_seconds", "Time spent in Firestore calls, model inference, LLM calls, JSON rendering and compression.",
+    ("stage",),
+)
+FIRESTORE_READS = Counter("firestore_document_reads_total", "Firestore documents read.", ("route",))
+FIRESTORE_WRITES = Counter("firestore_document_writes_total", "Firestore documents written.", ("route",))
+_METRICS = (REQUEST_SECONDS, STAGE_SECONDS, FIRESTORE_READS, FIRESTORE_WRITES)
+
+
+class RequestMetrics:
+    """What one request spent: Firestore documents read / written and seconds per stage."""
+
+    __slots__ = ("reads", "writes", "stages", "_lock")
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.stages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total_seconds: float) -> str:
+        entries = []
+        for stage in STAGES:
+            if stage == "db" and (self.reads or self.writes or stage in self.stages):
+                entries.append(
+                    f'db;dur={self.stages.get(stage, 0.0) * 1000:.1f};desc="reads={self.reads} writes={self.writes}"'
+                )
+            elif stage != "db" and stage in self.stages:
+                entries.append(f"{stage};dur={self.stages[stage] * 1000:.1f}")
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+
+def current() -> RequestMetrics | None:
+    """Metrics of the request being handled (None outside a request, e.g. in scripts)."""
+    return _current.get()
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Add the block's duration to `stage` of the current request and the stage histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, (stage,))
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_time(stage, elapsed)
+
+
+def record_reads(count: int) -> None:
+    metrics = _current.get()
+    if metrics is not None and count:
+        with metrics._lock:
+            metrics.reads += count
+
+
+def record_writes(count: int) -> None:
+    metrics = _current.get()
+    if metrics is not None and count:
+        with metrics._lock:
+            metrics.writes += count
+
+
+@contextmanager
+def db_call(reads: int = 0, writes: int = 0) -> Iterator[None]:
+    """Time a Firestore call as stage "db" and count the documents it reads / writes."""
+    record_reads(reads)
+    record_writes(writes)
+    with timed("db"):
+        yield
+
+
+class InstrumentedJSONResponse(ORJSONResponse):
+    """orjson-rendered JSON response whose rendering is timed as the "serialize" stage."""
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return super().render(content)
+
+
+def _route_template(scope: dict[str, Any]) -> str:
+    """Path template of the matched route (bounded label values), or "unmatched"."""
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return "unmatched"
+    for route in getattr(app, "routes", ()):
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: per-request RequestMetrics, Server-Timing header, latency histogram."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_HEADER:
+                    header = metrics.server_timing(time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = _route_template(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, (scope["method"], route, str(status)))
+            FIRESTORE_READS.inc((route,), metrics.reads)
+            FIRESTORE_WRITES.inc((route,), metrics.writes)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,130 @@
+"""
+Per-user, per-month transaction rollups: the aggregates that /analysis, /generate_budget and
+/carbon/footprint need, maintained with Firestore increments in the same batch that appends
+transactions (see transaction_repo), so those endpoints read O(months) documents instead of
+rescanning every transaction.
+
+Rollup document (transactions/{email}/rollups/{YYYY-MM}):
+    count          all transactions in the month
+    income         sum of non-negative amounts                     (generate_budget)
+    expenses       sum of negative amounts                         (generate_budget)
+    categories     {category or "Other": sum of negative amounts}  (generate_budget)
+    spend          {category: sum of |amount| in whole cents}      (analysis)
+    weeks          {"Week N" (ISO week): sum of the same}          (analysis)
+    spend_total    sum of the same                                 (analysis)
+    expense_count  number of negative amounts
+    carbon         {category: {"spend", "count", "kg"}}            (carbon footprint)
+    amounts        {category: {cents: count}}                      (carbon impact levels)
+    days           {"DD": {category: cents of |amount|}}           (spending_index)
+
+Amounts are rounded to cents per row with to_cents, the same rounding the TransactionFrame paths
+apply with np.rint, so rollup-backed and frame-backed answers agree to the cent.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any
+
+from google.cloud.firestore import Increment
+
+from emission_factors import kg_co2e_from_spend
+
+# Bump when the rollup shape or rounding changes; users whose rollups are older are served from transactions
+ROLLUP_VERSION = 3
+
+
+def to_cents(amount: float) -> int:
+    """|amount| in cents, rounded half to even like np.rint(|amounts| * 100) (not round(|amount|, 2))."""
+    return round(abs(amount) * 100)
+
+
+def empty_rollup(month: str) -> dict[str, Any]:
+    return {
+        "month": month,
+        "count": 0,
+        "income": 0.0,
+        "expenses": 0.0,
+        "categories": defaultdict(float),
+        "spend": defaultdict(float),
+        "weeks": defaultdict(float),
+        "spend_total": 0.0,
+        "expense_count": 0,
+        "carbon": defaultdict(lambda: {"spend": 0.0, "count": 0, "kg": 0.0}),
+        "amounts": defaultdict(lambda: defaultdict(int)),
+        "days": defaultdict(lambda: defaultdict(int)),
+    }
+
+
+def add_to_rollup(rollup: dict[str, Any], t: dict[str, Any]) -> None:
+    """Fold one transaction into a rollup built by empty_rollup (same rules as the endpoints)."""
+    rollup["count"] += 1
+    amount = t.get("amount") or 0
+    if not isinstance(amount, (int, float)):
+        return
+    if amount >= 0:
+        rollup["income"] += amount
+        return
+
+    rollup["expenses"] += amount
+    rollup["categories"][t.get("category") or "Other"] += amount
+
+    date_str = t.get("date", "")
+    try:
+        day = datetime.strptime(date_str, "%Y-%m-%d") if date_str else None
+    except ValueError:
+        day = None
+    if day is not None:
+        cents = to_cents(amount)
+        rollup["spend"][t.get("category", "Uncategorized")] += cents / 100
+        rollup["weeks"][f"Week {day.isocalendar()[1]}"] += cents / 100
+        rollup["spend_total"] += cents / 100
+        if rollup["month"] == f"{day.year:04d}-{day.month:02d}":
+            rollup["days"][f"{day.day:02d}"][t.get("category", "Uncategorized")] += cents
+
+    category = t.get("category", "Other")
+    spend = abs(amount)
+    rollup["expense_count"] += 1
+    carbon = rollup["carbon"][category]
+    carbon["spend"] += spend
+    carbon["count"] += 1
+    carbon["kg"] += kg_co2e_from_spend(spend, category)
+    rollup["amounts"][category][str(to_cents(spend))] += 1
+
+
+def build_rollups(transactions: list[dict[str, Any]], month_of) -> dict[str, dict[str, Any]]:
+    """Rollups keyed by month for a list of transactions; month_of maps a transaction to its bucket id."""
+    rollups: dict[str, dict[str, Any]] = {}
+    for t in transactions:
+        month = month_of(t)
+        if month not in rollups:
+            rollups[month] = empty_rollup(month)
+        add_to_rollup(rollups[month], t)
+    return rollups
+
+
+def _plain(value):
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def rollup_document(rollup: dict[str, Any]) -> dict[str, Any]:
+    """Plain-dict form of a rollup, for overwriting the stored document."""
+    return _plain(rollup)
+
+
+def rollup_increments(rollup: dict[str, Any]) -> dict[str, Any]:
+    """
+    The rollup as nested Firestore Increments, to merge into the stored document.
+    Empty maps are left out: merging an empty map would replace the stored one.
+    """
+    def wrap(value):
+        if isinstance(value, dict):
+            return {k: wrap(v) for k, v in value.items()}
+        if isinstance(value, (int, float)):
+            return Increment(value)
+        return value
+
+    return {
+        "month": rollup["month"],
+        **{k: wrap(v) for k, v in rollup.items() if k != "month" and not (isinstance(v, dict) and not v)},
+    }
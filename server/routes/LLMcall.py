@@ -1,13 +1,57 @@
-import requests
+"""
+Spending prediction via an OpenAI-compatible chat completions API (OpenRouter by default).
+
+One pooled httpx.AsyncClient is shared by all requests, with timeouts and retries (exponential
+backoff with jitter) on transport errors, 429 and 5xx. Parsed predictions are cached by a digest
+of the model and prompt inputs, and concurrent identical calls share one upstream request.
+Transactions are sent as compact aggregates within a token budget (see prediction_prompt).
+
+Config (env):
+    OPENROUTER_API_KEY       bearer token (optional for a local stand-in)
+    LLM_API_URL              chat completions URL; point at benchmarks/llm_standin.py to run offline
+    LLM_MODEL                default openai/gpt-3.5-turbo
+    LLM_TIMEOUT_SECONDS      per attempt, default 30
+    LLM_MAX_RETRIES          default 2
+    LLM_MAX_CONNECTIONS      default 20
+    LLM_CACHE_TTL_SECONDS    default 3600 (0 disables the cache)
+    LLM_CACHE_SIZE           default 256 entries
+    LLM_PROMPT_TOKEN_BUDGET  estimated tokens for the user message, default 1500
+"""
+import asyncio
+import hashlib
 import json
+import logging
 import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any
+
+import httpx
 from dotenv import load_dotenv
 
+from prediction_prompt import build_user_message
+from request_metrics import timed
+
 load_dotenv()
 
-def get_prediction(user_budget, bad_transactions):
-    
-  system_prompt = """
+logger = logging.getLogger(__name__)
+
+LLM_API_URL = os.getenv("LLM_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-3.5-turbo")  # Or "google/gemini-2.0-flash-001" which is often cheaper/faster
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+
+# Base delay of the exponential backoff between attempts
+RETRY_BACKOFF_SECONDS = 0.5
+# Longest Retry-After honoured, so a provider cannot park the request for long
+MAX_RETRY_AFTER_SECONDS = min(LLM_TIMEOUT_SECONDS, 10.0)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+SYSTEM_PROMPT = """
   You are a smart financial advisor AI for a budget app.
   Your goal is to analyze the user's discretionary spending and predict future trends.
 
@@ -24,56 +68,133 @@ def get_prediction(user_budget, bad_transactions):
   }
   """
 
-  user_message = f"""
-  Here is the user's monthly budget context:
-  {json.dumps(user_budget)}
+_client: httpx.AsyncClient | None = None
+_cache: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+_inflight: dict[str, asyncio.Future] = {}
 
-  Here is a list of "discretionary/bad" transactions from the last 30 days:
-  {json.dumps(bad_transactions)}
 
-  Based on this data:
-  1. Predict the total spending for next month based on these bad habits continuing.
-  2. Calculate the percentage change from the current month.
-  3. Identify ONE specific category where they can save money (the "Savings Opportunity").
-  4. Calculate how much they save if they cut that category by 25%.
-  5. Estimate how many months earlier they will reach their savings goal with that extra cash.
-  6. Provide a short description of the prediction.
-  """
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=min(LLM_TIMEOUT_SECONDS, 10.0)),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the pooled connections (app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _digest(payload: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> dict[str, Any] | None:
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    stored_at, value = entry
+    if time.monotonic() - stored_at > LLM_CACHE_TTL_SECONDS:
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return value
+
+
+def _cache_put(key: str, value: dict[str, Any]) -> None:
+    if LLM_CACHE_TTL_SECONDS <= 0:
+        return
+    _cache[key] = (time.monotonic(), value)
+    _cache.move_to_end(key)
+    while len(_cache) > LLM_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    """The server's Retry-After (capped at MAX_RETRY_AFTER_SECONDS), else exponential backoff."""
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = -1.0
+        if 0 <= delay < float("inf"):
+            return min(delay, MAX_RETRY_AFTER_SECONDS)
+    return RETRY_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random())
+
+
+async def _post(payload: dict[str, Any]) -> httpx.Response | None:
+    """POST with retries; returns the last response, or None if every attempt failed in transport."""
+    headers = {}
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if api_key:
+        headers["Authorization"] = "Bearer " + api_key
+    response = None
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = await _get_client().post(LLM_API_URL, headers=headers, json=payload)
+            if response.status_code not in RETRYABLE_STATUS:
+                return response
+            logger.warning("LLM call returned %s (attempt %d)", response.status_code, attempt + 1)
+        except httpx.TransportError as e:
+            response = None
+            logger.warning("LLM call failed: %r (attempt %d)", e, attempt + 1)
+        if attempt < LLM_MAX_RETRIES:
+            await asyncio.sleep(_retry_delay(attempt, response))
+    return response
+
+
+def _parse(response: httpx.Response | None) -> dict[str, Any] | None:
+    if response is None:
+        return None
+    try:
+        result = response.json()
+        content = result['choices'][0]['message']['content']
+
+        # Clean up if the model accidentally adds markdown
+        if "```json" in content:
+            content = content.replace("```json", "").replace("```", "")
+
+        return json.loads(content)
+    except Exception:
+        logger.warning("Unparseable LLM response (status %s)", response.status_code)
+        return None
+
+
+async def _request_prediction(payload: dict[str, Any], key: str) -> dict[str, Any] | None:
+    with timed("llm"):
+        response = await _post(payload)
+    parsed = _parse(response)
+    if parsed is not None:
+        _cache_put(key, parsed)
+    return parsed
+
+
+async def get_prediction(user_budget, bad_transactions):
+    """Parsed prediction JSON for the budget and discretionary transactions, or None if the call failed."""
+    user_message, _ = build_user_message(user_budget, bad_transactions)
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message},
+        ],
+    }
+    key = _digest(payload)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
 
-  # --- 3. MAKE THE CALL ---
-  response = requests.post(
-    url="https://openrouter.ai/api/v1/chat/completions",
-    headers={
-      "Authorization": "Bearer " + os.getenv("OPENROUTER_API_KEY"),
-    },
-    data=json.dumps({
-      "model": "openai/gpt-3.5-turbo", # Or "google/gemini-2.0-flash-001" which is often cheaper/faster
-      "messages": [
-        {
-          "role": "system",
-          "content": system_prompt
-        },
-        {
-          "role": "user",
-          "content": user_message
-        }
-      ]
-    })
-  )
-
-  # --- 4. PARSE OUTPUT ---
-  try:
-      result = response.json()
-      content = result['choices'][0]['message']['content']
-      
-      # Clean up if the model accidentally adds markdown
-      if "```json" in content:
-          content = content.replace("```json", "").replace("```", "")
-          
-      parsed_data = json.loads(content)
-
-
-      return parsed_data
-      
-  except Exception as e:
-      return None
\ No newline at end of file
+    # Identical concurrent calls wait on the first one's request
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_request_prediction(payload, key))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(future)
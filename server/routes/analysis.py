@@ -1,88 +1,189 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from calendar import monthrange
 from collections import defaultdict
-from firebase_admin import firestore
-from datetime import datetime
-import calendar
+from datetime import date, timedelta
+from google.cloud.firestore import AsyncClient
+import re
+import numpy as np
+
+from database import get_async_db
+from spending_index import SpendingIndex
+from transaction_frame import MISSING, TransactionFrame, to_date
+from transaction_repo_async import get_rollups_for_user, get_spending_index, get_transaction_frame
 
 router = APIRouter()
 
 
+EMPTY_ANALYSIS = {
+    "spending": {},
+    "weekly_expenditure": {},
+    "monthly_expenditure": 0.0
+}
+
+
+# Longest rolling window (e.g. period=3650d) or explicit start / end range
+MAX_PERIOD_DAYS = 3660
+_ROLLING = re.compile(r"(\d+)d")
+
 
 @router.get("/analysis")
-def get_analysis(user_email: str):
-    db = firestore.client()
-    
+async def get_analysis(
+    user_email: str,
+    period: str | None = Query(
+        None, description='month, quarter, year or a rolling window like "30d", ending at `end`'
+    ),
+    start: date | None = Query(None, description="Start of an explicit range (inclusive)"),
+    end: date | None = Query(None, description="End of the range, or a day in the period (default: latest day with spending)"),
+    compare: bool = Query(False, description="Also summarize the preceding period of the same kind"),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """
+    Without parameters: the month of the latest transaction (spending, "Week N" totals and
+    monthly_expenditure). With period, start, end or compare: any calendar period, rolling
+    window or date range, answered from the user's daily spending index.
+    """
     email = user_email
     if not email:
         return {"error": "No user found"}
-        
-    doc_ref = db.collection("transactions").document(email)
-    doc = doc_ref.get()
-    
-    if not doc.exists:
-        return {
-            "spending": {}, 
-            "weekly_expenditure": {}, 
-            "monthly_expenditure": 0.0
-        }
-
-    transactions = doc.to_dict().get("transactions", [])
-    
-    if not transactions:
-        return {
-            "spending": {}, 
-            "weekly_expenditure": {}, 
-            "monthly_expenditure": 0.0
-        }
-
-    # 1. Find the most recent date in the dataset
-    # We use this to determine which "Month" to summarize
-    dates = [t.get("date", "") for t in transactions if t.get("date")]
-    if not dates:
+
+    if period is not None or start is not None or end is not None or compare:
+        index = await get_spending_index(db, email)
+        try:
+            range_start, range_end = resolve_period(period, start, end, index.last_date or date.today())
+            result = summarize_period(index, range_start, range_end)
+            if compare:
+                kind = None if start is not None else period or "month"
+                previous = summarize_period(index, *previous_period(kind, range_start, range_end))
+                result["previous"] = previous
+                result["change"] = compare_periods(result, previous)
+        except (ValueError, OverflowError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return result
+
+    # Fast path: the latest month's rollup already holds these aggregates
+    rollups = await get_rollups_for_user(db, email, latest=True)
+    if rollups is not None:
+        if not rollups:
+            return dict(EMPTY_ANALYSIS)
+        return summarize_rollup(next(iter(rollups.values())))
+
+    return summarize_latest_month(await get_transaction_frame(db, email))
+
+
+def summarize_rollup(rollup: dict) -> dict:
+    """Analysis response for one month from its stored rollup (see rollups.py)."""
+    return {
+        "spending": {k: round(v, 2) for k, v in (rollup.get("spend") or {}).items()},
+        "weekly_expenditure": {k: round(v, 2) for k, v in (rollup.get("weeks") or {}).items()},
+        "monthly_expenditure": round(rollup.get("spend_total") or 0.0, 2)
+    }
+
+
+def summarize_latest_month(frame: TransactionFrame) -> dict:
+    """Spending by category, ISO-week totals and total spend for the month of the latest transaction."""
+    if not len(frame):
+        return dict(EMPTY_ANALYSIS)
+
+    # 1. The most recent date decides which month to summarize
+    latest = frame.latest_date()
+    if latest is None:
         return {"error": "No valid dates found in transactions"}
-        
-    latest_date_str = max(dates)
-    latest_date = datetime.strptime(latest_date_str, "%Y-%m-%d")
-    
-    target_year = latest_date.year
-    target_month = latest_date.month
-
-    # 2. Initialize Aggregators
-    spending_by_category = defaultdict(float)
-    weekly_expenditure = defaultdict(float)
-    total_monthly_expenditure = 0.0
-
-    # 3. Iterate and Filter
-    for t in transactions:
-        date_str = t.get("date", "")
-        if not date_str:
-            continue
-            
-        t_date = datetime.strptime(date_str, "%Y-%m-%d")
-        
-        # Filter: Only process transactions from the Target Month
-        if t_date.year == target_year and t_date.month == target_month:
-            amount = t.get("amount", 0)
-            
-            # Only count Expenses (negative amounts)
-            if amount < 0:
-                abs_amount = round(abs(amount), 2)
-                category = t.get("category", "Uncategorized")
-                
-                # A. Spending by Category
-                spending_by_category[category] += abs_amount
-                
-                # B. Weekly Expenditure
-                # Using ISO week number (or you can calculate 'Week 1', 'Week 2' based on day)
-                week_num = t_date.isocalendar()[1]
-                week_key = f"Week {week_num}"
-                weekly_expenditure[week_key] += abs_amount
-                
-                # C. Total Monthly Expenditure
-                total_monthly_expenditure += abs_amount
+    month = frame.between(latest.replace(day=1), latest)
+
+    # 2. Only expenses (negative amounts) count, each rounded to cents
+    spent = month.amounts < 0
+    cents = np.rint(-month.amounts[spent] * 100)
+    names, codes = month.grouped_categories(lambda c: "Uncategorized" if c is MISSING else c)
+
+    # A. Spending by category
+    by_category = np.bincount(codes[spent], weights=cents, minlength=len(names))
+    spending = {names[i]: round(by_category[i] / 100, 2) for i in np.flatnonzero(np.bincount(codes[spent]))}
+
+    # B. Weekly expenditure by ISO week number (computed once per distinct day)
+    days, day_index = np.unique(month.days[spent], return_inverse=True)
+    by_day = np.bincount(day_index, weights=cents, minlength=len(days))
+    weekly_cents = defaultdict(float)
+    for day, total in zip(days.tolist(), by_day.tolist()):
+        weekly_cents[f"Week {to_date(day).isocalendar()[1]}"] += total
+
+    # C. Total monthly expenditure
+    return {
+        "spending": spending,
+        "weekly_expenditure": {k: round(v / 100, 2) for k, v in weekly_cents.items()},
+        "monthly_expenditure": round(float(cents.sum()) / 100, 2)
+    }
+
+
+def resolve_period(period: str | None, start: date | None, end: date | None, latest: date) -> tuple[date, date]:
+    """
+    [start, end] of the requested range. An explicit start gives [start, end or latest], at most
+    MAX_PERIOD_DAYS long; otherwise period (default month) is the calendar month / quarter /
+    year containing end (default latest), or the N days ending there. Raises ValueError for
+    bad input.
+    """
+    if start is not None:
+        if period is not None:
+            raise ValueError("Pass either period or start, not both")
+        end = end or latest
+        if start > end:
+            raise ValueError("start must not be after end")
+        if (end - start).days >= MAX_PERIOD_DAYS:
+            raise ValueError(f"Date ranges must be at most {MAX_PERIOD_DAYS} days")
+        return start, end
+
+    anchor = end or latest
+    period = period or "month"
+    if period == "month":
+        return anchor.replace(day=1), anchor.replace(day=monthrange(anchor.year, anchor.month)[1])
+    if period == "quarter":
+        first = 3 * ((anchor.month - 1) // 3) + 1
+        return date(anchor.year, first, 1), date(anchor.year, first + 2, monthrange(anchor.year, first + 2)[1])
+    if period == "year":
+        return date(anchor.year, 1, 1), date(anchor.year, 12, 31)
+    match = _ROLLING.fullmatch(period)
+    if match is None:
+        raise ValueError('period must be month, quarter, year or a number of days like "30d"')
+    days = int(match.group(1))
+    if not 1 <= days <= MAX_PERIOD_DAYS:
+        raise ValueError(f"Rolling periods must be 1 to {MAX_PERIOD_DAYS} days")
+    return anchor - timedelta(days=days - 1), anchor
+
+
+def previous_period(period: str | None, start: date, end: date) -> tuple[date, date]:
+    """
+    The period before [start, end]: the previous calendar month / quarter / year, or for
+    rolling windows and explicit ranges (period None) the same number of days before start.
+    """
+    if period in ("month", "quarter", "year"):
+        return resolve_period(period, None, start - timedelta(days=1), start)
+    return start - (end - start) - timedelta(days=1), start - timedelta(days=1)
+
+
+def _dollars(cents: int) -> float:
+    return round(cents / 100, 2)
+
+
+def summarize_period(index: SpendingIndex, start: date, end: date) -> dict:
+    """Spending by category, ISO-week totals, total and daily average spend within [start, end]."""
+    total = index.total(start, end)
+    days = (end - start).days + 1
+    return {
+        "period": {"start": start.isoformat(), "end": end.isoformat(), "days": days},
+        "spending": {k: _dollars(v) for k, v in index.by_category(start, end).items()},
+        "weekly_expenditure": {k: _dollars(v) for k, v in index.weekly(start, end).items()},
+        "total_expenditure": _dollars(total),
+        "daily_average": _dollars(round(total / days)),
+    }
+
 
+def compare_periods(current: dict, previous: dict) -> dict:
+    """Differences between two summarize_period results (current minus previous)."""
+    before, now = previous["total_expenditure"], current["total_expenditure"]
+    categories = {**previous["spending"], **current["spending"]}
     return {
-        "spending": spending_by_category,
-        "weekly_expenditure": weekly_expenditure,
-        "monthly_expenditure": round(total_monthly_expenditure, 2)
-    }
\ No newline at end of file
+        "total_expenditure": round(now - before, 2),
+        "total_percent": round((now - before) / before * 100, 1) if before else None,
+        "spending": {
+            c: round(current["spending"].get(c, 0.0) - previous["spending"].get(c, 0.0), 2) for c in categories
+        },
+    }
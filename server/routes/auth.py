@@ -2,17 +2,20 @@
 Authentication routes: signup and login.
 """
 from fastapi import APIRouter, Body, Depends, HTTPException, status
-from google.cloud.firestore import Client as FirestoreClient
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore import AsyncClient
 
-from database import get_db
-from models.user import UserSignup, UserLogin, UserResponse, TokenResponse
+from auth_cache import auth_cache_stats
+from database import get_async_db
+from models.user import User, UserSignup, UserLogin, UserProfileUpdate, UserResponse, TokenResponse
 from auth import (
-    hash_password,
-    verify_password,
     create_access_token,
+    get_current_user,
     get_user_by_email,
+    hash_password_async,
+    verify_and_update_async,
 )
-from user_repo import create_user as create_user_in_db
+from user_repo_async import create_user as create_user_in_db, update_user_password, update_user_profile
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -36,21 +39,30 @@ def _user_response(user):
 
 
 @router.post("/signup", response_model=TokenResponse)
-def signup(body: UserSignup = Body(...), db: FirestoreClient = Depends(get_db)):
+async def signup(body: UserSignup = Body(...), db: AsyncClient = Depends(get_async_db)):
     """Register a new user. Requires email, password, name, phone_number. Returns JWT and user info."""
-    if get_user_by_email(db, body.email):
+    if await get_user_by_email(db, body.email):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="An account with this email already exists",
+        )
+    # Password hashing is deliberately slow; it runs on the hashing process pool
+    hashed_password = await hash_password_async(body.password)
+    try:
+        user = await create_user_in_db(
+            db,
+            email=body.email,
+            hashed_password=hashed_password,
+            full_name=body.full_name,
+            name=body.name,
+            phone_number=body.phone_number,
+        )
+    except AlreadyExists:
+        # Concurrent signup with the same email won the users_by_email create
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="An account with this email already exists",
         )
-    user = create_user_in_db(
-        db,
-        email=body.email,
-        hashed_password=hash_password(body.password),
-        full_name=body.full_name,
-        name=body.name,
-        phone_number=body.phone_number,
-    )
     access_token = create_access_token(data={"sub": user.id})
     return TokenResponse(
         access_token=access_token,
@@ -59,17 +71,51 @@ def signup(body: UserSignup = Body(...), db: FirestoreClient = Depends(get_db)):
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(raw: dict = Body(...), db: FirestoreClient = Depends(get_db)):
+async def login(raw: dict = Body(...), db: AsyncClient = Depends(get_async_db)):
     """Authenticate user and return JWT and user info."""
     body = _parse_login(raw)
-    user = get_user_by_email(db, body.email)
-    if not user or not verify_password(body.password, user.hashed_password):
+    user = await get_user_by_email(db, body.email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+        )
+    ok, new_hash = await verify_and_update_async(body.password, user.hashed_password)
+    if not ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
+    if new_hash:
+        # Stored hash predates the current cost settings; upgrade it now that we have the password
+        await update_user_password(db, user.id, new_hash)
     access_token = create_access_token(data={"sub": user.id})
     return TokenResponse(
         access_token=access_token,
         user=_user_response(user),
     )
+
+
+@router.get("/me", response_model=UserResponse)
+async def me(user: User = Depends(get_current_user)):
+    """Profile of the user the bearer token belongs to."""
+    return _user_response(user)
+
+
+@router.patch("/me", response_model=UserResponse)
+async def update_me(
+    body: UserProfileUpdate = Body(...),
+    user: User = Depends(get_current_user),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """Update full_name, name and/or phone_number of the current user."""
+    updated = await update_user_profile(db, user.id, body.model_dump(exclude_unset=True))
+    if updated is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return _user_response(updated)
+
+
+@router.get("/cache/stats")
+async def get_auth_cache_stats():
+    """Token / user cache hit counters and the Firestore reads they saved."""
+    return auth_cache_stats()
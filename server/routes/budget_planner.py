@@ -1,115 +1,116 @@
+import asyncio
+
 from fastapi import APIRouter, Body, Depends, Query
-from google.cloud.firestore import Client as FirestoreClient
+from google.cloud.firestore import AsyncClient
 from collections import defaultdict
+import numpy as np
 
-from database import get_db
+from database import get_async_db
+from transaction_frame import TransactionFrame
+from transaction_repo_async import get_rollups_for_user, get_transaction_frame
+from user_repo_async import get_user_doc_by_email, update_user_fields
 
 router = APIRouter()
 
 
-def _date_key(t: dict) -> str:
-    """Sort key for transaction date (date or transaction_date, first 10 chars)."""
-    td = t.get("date") or t.get("transaction_date") or ""
-    return (td[:10] if isinstance(td, str) else str(td)[:10]) if td else ""
-
-
-def _take_last_n_by_date(transactions: list, n: int) -> list:
-    """Return the last N transactions when sorted by date (ascending)."""
-    if n <= 0 or not transactions:
-        return transactions
-    sorted_tx = sorted(transactions, key=_date_key)
-    return sorted_tx[-n:] if len(sorted_tx) > n else sorted_tx
-
-
-def _get_user_doc_id(db: FirestoreClient, user_email: str) -> str | None:
-    """Return the Firestore document ID for the user with this email, or None."""
-    user_email = user_email.strip().lower()
-    query = db.collection("users").where("email", "==", user_email).limit(1)
-    docs = list(query.stream())
-    if not docs:
-        return None
-    return docs[0].id
-
-
 @router.get("/generate_budget")
-def generate_budget(
+async def generate_budget(
     user_email: str = Query(..., description="User email to generate budget for"),
-    db: FirestoreClient = Depends(get_db),
+    db: AsyncClient = Depends(get_async_db),
     last_n: int | None = Query(None, description="Use only the last N transactions by date (default: all)"),
 ):
     """Get or compute budget (income, expenses, savings, categories). Optionally use only the last N transactions by date."""
-    user_doc_id = _get_user_doc_id(db, user_email)
-    if not user_doc_id:
-        return {"income": 0, "expenses": 0, "savings": 0, "categories": {}}
-
-    user_ref = db.collection("users").document(user_doc_id)
-    user_doc = user_ref.get()
-    if not user_doc.exists:
-        return {"income": 0, "expenses": 0, "savings": 0, "categories": {}}
-
     use_last_n = last_n is not None and last_n > 0
 
-    user_data = user_doc.to_dict()
-    if user_data.get("budget") and not use_last_n:
-        return user_data["budget"]
+    # The user document and the budget's data source are independent reads
+    rollups = None
+    if use_last_n:
+        user_doc, frame = await asyncio.gather(
+            get_user_doc_by_email(db, user_email), get_transaction_frame(db, user_email)
+        )
+    else:
+        user_doc, rollups = await asyncio.gather(
+            get_user_doc_by_email(db, user_email), get_rollups_for_user(db, user_email)
+        )
+    if user_doc is None:
+        return {"income": 0, "expenses": 0, "savings": 0, "categories": {}}
 
-    tx_ref = db.collection("transactions").document(user_email.strip().lower())
-    tx_doc = tx_ref.get()
-    if not tx_doc.exists:
+    user_ref = user_doc.reference
+    user_data = user_doc.to_dict() or {}
+    if not use_last_n:
+        # Rollups make the full-history budget O(months), so it is recomputed instead of served stale
+        if rollups is not None:
+            budget = budget_from_rollups(rollups)
+            if user_data.get("budget") != budget:
+                await update_user_fields(user_ref, {"budget": budget})
+            return budget
+        if user_data.get("budget"):
+            return user_data["budget"]
+        frame = await get_transaction_frame(db, user_email)
+
+    if not len(frame):
         budget = {"income": 0, "expenses": 0, "savings": 0, "categories": {}}
         if not use_last_n:
-            user_ref.update({"budget": budget})
+            await update_user_fields(user_ref, {"budget": budget})
         return budget
 
-    transactions = tx_doc.to_dict().get("transactions") or []
     if use_last_n:
-        transactions = _take_last_n_by_date(transactions, last_n)
+        frame = frame.last(last_n)
+
+    budget = compute_budget(frame)
+    if not use_last_n:
+        await update_user_fields(user_ref, {"budget": budget})
+    return budget
+
+
+def _budget_summary(income: float, expenses: float, categories: dict) -> dict:
+    savings = income
+    return {
+        "income": round(income, 2),
+        "expenses": round(expenses, 2),
+        "savings": round(savings, 2),
+        "categories": {k: round(v, 2) for k, v in categories.items()},
+    }
+
+
+def compute_budget(frame: TransactionFrame) -> dict:
+    """Income, expenses, savings and per-category expenses of the transactions in frame."""
+    amounts = frame.amounts
+    spent = amounts < 0
+    names, codes = frame.grouped_categories(lambda c: c or "Other")
+    by_category = np.bincount(codes[spent], weights=amounts[spent], minlength=len(names))
+    categories = {names[i]: float(by_category[i]) for i in np.flatnonzero(np.bincount(codes[spent]))}
+    return _budget_summary(float(amounts[amounts >= 0].sum()), float(amounts[spent].sum()), categories)
 
+
+def budget_from_rollups(rollups: dict) -> dict:
+    """Same summary as compute_budget, from monthly rollups (see rollups.py)."""
     income = 0.0
     expenses = 0.0
     categories = defaultdict(float)
-    for t in transactions:
-        amount = t.get("amount") or 0
-        if isinstance(amount, (int, float)):
-            if amount < 0:
-                expenses += amount
-
-                cat = t.get("category") or "Other"
-                categories[cat] += amount
-            else:
-                income += amount
-    savings = income 
-    print(income, expenses, savings)
-    categories = {k: round(v, 2) for k, v in categories.items()}
-    income = round(income, 2)
-    expenses = round(expenses, 2)
-    savings = round(savings, 2)
- 
-
-    budget = {
-        "income": income,
-        "expenses": expenses,
-        "savings": savings,
-        "categories": categories,
-    }
-    if not use_last_n:
-        user_ref.update({"budget": budget})
-    return budget
+    for month in sorted(rollups):
+        rollup = rollups[month]
+        income += rollup.get("income") or 0
+        expenses += rollup.get("expenses") or 0
+        for cat, amount in (rollup.get("categories") or {}).items():
+            categories[cat] += amount
+    return _budget_summary(income, expenses, categories)
 
 
 @router.get("/budget_plan")
-def get_budget_plan(
+async def get_budget_plan(
     user_email: str = Query(..., description="User email"),
-    db: FirestoreClient = Depends(get_db),
+    db: AsyncClient = Depends(get_async_db),
 ):
     """Get the user's budget plan (category limits) and savings goal/reason."""
-    user_doc_id = _get_user_doc_id(db, user_email)
-    if not user_doc_id:
+    user_doc = await get_user_doc_by_email(db, user_email)
+    if user_doc is None:
         return {"plan": {}, "savings_goal": "", "savings_reason": ""}
-    user_doc = db.collection("users").document(user_doc_id).get()
-    if not user_doc.exists:
-        return {"plan": {}, "savings_goal": "", "savings_reason": ""}
-    data = user_doc.to_dict() or {}
+    return budget_plan_from_user(user_doc.to_dict() or {})
+
+
+def budget_plan_from_user(data: dict) -> dict:
+    """The /budget_plan response from a user document's fields."""
     return {
         "plan": data.get("budget_plan") or {},
         "savings_goal": data.get("savings_goal") or "",
@@ -118,17 +119,17 @@ def get_budget_plan(
 
 
 @router.post("/update_budget")
-def update_budget(
+async def update_budget(
     user_email: str = Query(..., description="User email to update budget plan for"),
     body: dict = Body(..., description="Budget plan (category limits) and optional savings_goal, savings_reason"),
-    db: FirestoreClient = Depends(get_db),
+    db: AsyncClient = Depends(get_async_db),
 ):
     """Update the user's budget plan and optional savings goal/reason."""
-    user_doc_id = _get_user_doc_id(db, user_email)
-    if not user_doc_id:
+    user_doc = await get_user_doc_by_email(db, user_email)
+    if user_doc is None:
         return {"message": "User not found", "ok": False}
 
-    user_ref = db.collection("users").document(user_doc_id)
+    user_ref = user_doc.reference
 
     # Category limits only (numeric)
     plan = {
@@ -140,5 +141,5 @@ def update_budget(
     savings_reason = str(body.get("savings_reason") or "").strip()
 
     update_data = {"budget_plan": plan, "savings_goal": savings_goal, "savings_reason": savings_reason}
-    user_ref.update(update_data)
+    await update_user_fields(user_ref, update_data)
     return {"message": "Budget plan updated successfully", "ok": True}
@@ -5,12 +5,15 @@ User email is passed in the request (query param); no auth header required.
 """
 from collections import defaultdict
 
-from fastapi import APIRouter, Depends, Query
-from google.cloud.firestore import Client as FirestoreClient
+import numpy as np
+from fastapi import APIRouter, Depends, Query, Request, Response
+from google.cloud.firestore import AsyncClient
 
-from database import get_db
-from transaction_repo import get_transactions_for_user
-from emission_factors import EMISSION_FACTORS, DEFAULT_EMISSION_FACTOR, get_emission_factor, kg_co2e_from_spend
+from conditional import etag_headers, etag_matches, make_etag, not_modified
+from database import get_async_db
+from transaction_frame import TransactionFrame
+from transaction_repo_async import get_data_version, get_rollups_for_user, get_transaction_frame
+from emission_factors import EMISSION_FACTORS, DEFAULT_EMISSION_FACTOR, get_emission_factor
 
 router = APIRouter(prefix="/carbon", tags=["carbon"])
 
@@ -29,7 +32,7 @@ def _impact_level(ratio: float) -> str:
 
 
 @router.get("/factors")
-def get_emission_factors():
+async def get_emission_factors():
     """Return emission factors (kg CO2e per $) used for spend-based footprint. EPA/industry-based."""
     return {
         "factors_kg_co2e_per_usd": dict(EMISSION_FACTORS),
@@ -37,24 +40,12 @@ def get_emission_factors():
     }
 
 
-def _date_key(t: dict) -> str:
-    """Sort key for transaction date (date or transaction_date, first 10 chars)."""
-    td = t.get("date") or t.get("transaction_date") or ""
-    return (td[:10] if isinstance(td, str) else str(td)[:10]) if td else ""
-
-
-def _take_last_n_by_date(transactions: list, n: int) -> list:
-    """Return the last N transactions when sorted by date (ascending)."""
-    if n <= 0 or not transactions:
-        return transactions
-    sorted_tx = sorted(transactions, key=_date_key)
-    return sorted_tx[-n:] if len(sorted_tx) > n else sorted_tx
-
-
 @router.get("/footprint")
-def get_carbon_footprint(
+async def get_carbon_footprint(
+    request: Request,
+    response: Response,
     user_email: str = Query(..., description="User email (e.g. current user) to compute footprint for"),
-    db: FirestoreClient = Depends(get_db),
+    db: AsyncClient = Depends(get_async_db),
     last_n: int | None = Query(None, description="Use only the last N transactions by date (default: all)"),
     include_transactions: bool = Query(False, description="Include per-transaction impact classification"),
 ):
@@ -67,29 +58,28 @@ def get_carbon_footprint(
     - **Low**: transaction amount < 70% of category average
     - **Medium**: between 70% and 130% of category average
     - **High**: transaction amount > 130% of category average
+
+    Conditional: If-None-Match with the ETag of an earlier response gets a 304 until the user's
+    transactions change.
     """
-    transactions = get_transactions_for_user(db, user_email)
+    etag = make_etag("carbon_footprint", request.url.query, await get_data_version(db, user_email))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(etag_headers(etag))
+
+    if (last_n is None or last_n <= 0) and not include_transactions:
+        rollups = await get_rollups_for_user(db, user_email)
+        if rollups is not None:
+            return footprint_from_rollups(rollups)
+
+    frame = await get_transaction_frame(db, user_email)
     if last_n is not None and last_n > 0:
-        transactions = _take_last_n_by_date(transactions, last_n)
-    spending = [t for t in transactions if (t.get("amount") or 0) < 0]
+        frame = frame.last(last_n)
+    return compute_footprint(frame, include_transactions)
 
-    # 1) Baseline per category: average $ per transaction in that category
-    cat_sum: dict[str, float] = defaultdict(float)
-    cat_count: dict[str, int] = defaultdict(int)
-    for t in spending:
-        cat = t.get("category", "Other")
-        amt = t.get("amount", 0)
-        if isinstance(amt, (int, float)):
-            cat_sum[cat] += abs(amt)
-            cat_count[cat] += 1
-    baseline_avg_usd: dict[str, float] = {
-        cat: (cat_sum[cat] / cat_count[cat] if cat_count[cat] else 0.0)
-        for cat in cat_sum
-    }
 
-    # 2) Totals and per-transaction impact
-    total_kg_co2e = 0.0
-    by_category: dict[str, dict] = defaultdict(lambda: {
+def _new_category_totals() -> dict:
+    return {
         "amount_spent_usd": 0.0,
         "kg_co2e": 0.0,
         "emission_factor": 0.0,
@@ -97,43 +87,106 @@ def get_carbon_footprint(
         "impact_low_count": 0,
         "impact_medium_count": 0,
         "impact_high_count": 0,
-    })
-    transactions_with_impact: list[dict] = []
-
-    for t in spending:
-        amount = t.get("amount", 0)
-        category = t.get("category", "Other")
-        spend = abs(amount) if isinstance(amount, (int, float)) else 0.0
-        ef = get_emission_factor(category)
-        kg = kg_co2e_from_spend(spend, category)
-        total_kg_co2e += kg
-
-        baseline = baseline_avg_usd.get(category) or (spend or 1.0)
-        ratio = spend / baseline if baseline else 0.0
-        impact = _impact_level(ratio)
-
-        by_category[category]["amount_spent_usd"] += spend
-        by_category[category]["kg_co2e"] += kg
-        by_category[category]["emission_factor"] = ef
-        by_category[category]["baseline_avg_usd_per_txn"] = round(baseline, 2)
-        if impact == "Low":
-            by_category[category]["impact_low_count"] += 1
-        elif impact == "Medium":
-            by_category[category]["impact_medium_count"] += 1
-        else:
-            by_category[category]["impact_high_count"] += 1
-
-        if include_transactions:
-            transactions_with_impact.append({
+    }
+
+
+def _count_impact(totals: dict, impact: str, n: int = 1) -> None:
+    if impact == "Low":
+        totals["impact_low_count"] += n
+    elif impact == "Medium":
+        totals["impact_medium_count"] += n
+    else:
+        totals["impact_high_count"] += n
+
+
+def compute_footprint(frame: TransactionFrame, include_transactions: bool = False) -> dict:
+    """Footprint response (see get_carbon_footprint) computed from the transactions in frame."""
+    spent = frame.amounts < 0
+    spend = -frame.amounts[spent]
+    names, all_codes = frame.grouped_categories(lambda c: c if isinstance(c, str) else "Other")
+    codes = all_codes[spent]
+
+    # 1) Baseline per category: average $ per transaction in that category
+    cat_count = np.bincount(codes, minlength=len(names))
+    cat_sum = np.bincount(codes, weights=spend, minlength=len(names))
+    baseline_avg_usd = np.divide(cat_sum, cat_count, out=np.zeros(len(names)), where=cat_count > 0)
+
+    # 2) Totals and per-transaction impact
+    factors = np.array([get_emission_factor(name) for name in names], dtype=np.float64)
+    kg = np.round(spend * factors[codes], 4)
+    ratio = spend / baseline_avg_usd[codes]
+    impact = np.where(ratio < IMPACT_LOW_THRESHOLD, 0, np.where(ratio <= IMPACT_HIGH_THRESHOLD, 1, 2))
+
+    cat_kg = np.bincount(codes, weights=kg, minlength=len(names))
+    impact_counts = np.bincount(codes * 3 + impact, minlength=len(names) * 3).reshape(len(names), 3)
+    by_category: dict[str, dict] = defaultdict(_new_category_totals)
+    for i in np.flatnonzero(cat_count):
+        totals = by_category[names[i]]
+        totals["amount_spent_usd"] = float(cat_sum[i])
+        totals["kg_co2e"] = float(cat_kg[i])
+        totals["emission_factor"] = float(factors[i])
+        totals["baseline_avg_usd_per_txn"] = round(float(baseline_avg_usd[i]), 2)
+        for level, n in zip(("Low", "Medium", "High"), impact_counts[i].tolist()):
+            _count_impact(totals, level, n)
+
+    out = _footprint_response(float(kg.sum()), by_category, int(spent.sum()))
+    if include_transactions:
+        levels = ("Low", "Medium", "High")
+        out["transactions_with_impact"] = [
+            {
                 "transaction_id": t.get("transaction_id"),
                 "place": t.get("place"),
-                "amount_usd": round(spend, 2),
-                "category": category,
-                "kg_co2e": round(kg, 4),
-                "ratio_to_baseline": round(ratio, 4),
-                "impact_level": impact,
-            })
+                "amount_usd": round(s, 2),
+                "category": names[c],
+                "kg_co2e": round(k, 4),
+                "ratio_to_baseline": round(r, 4),
+                "impact_level": levels[lv],
+            }
+            for t, s, c, k, r, lv in zip(
+                frame.rows(spent), spend.tolist(), codes.tolist(), kg.tolist(), ratio.tolist(), impact.tolist()
+            )
+        ]
+    return out
 
+
+def footprint_from_rollups(rollups: dict) -> dict:
+    """
+    Footprint response from monthly rollups (see rollups.py). Impact levels come from the
+    per-category amount histograms, so no transaction is read.
+    """
+    cat_sum: dict[str, float] = defaultdict(float)
+    cat_count: dict[str, int] = defaultdict(int)
+    cat_kg: dict[str, float] = defaultdict(float)
+    cat_amounts: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    expense_count = 0
+    for month in sorted(rollups):
+        rollup = rollups[month]
+        expense_count += rollup.get("expense_count") or 0
+        for cat, totals in (rollup.get("carbon") or {}).items():
+            cat_sum[cat] += totals.get("spend") or 0.0
+            cat_count[cat] += totals.get("count") or 0
+            cat_kg[cat] += totals.get("kg") or 0.0
+        for cat, histogram in (rollup.get("amounts") or {}).items():
+            for cents, n in histogram.items():
+                cat_amounts[cat][int(cents)] += n
+
+    by_category: dict[str, dict] = defaultdict(_new_category_totals)
+    for cat in cat_sum:
+        avg = cat_sum[cat] / cat_count[cat] if cat_count[cat] else 0.0
+        totals = by_category[cat]
+        totals["amount_spent_usd"] = cat_sum[cat]
+        totals["kg_co2e"] = cat_kg[cat]
+        totals["emission_factor"] = get_emission_factor(cat)
+        for cents, n in cat_amounts[cat].items():
+            spend = cents / 100
+            baseline = avg or (spend or 1.0)
+            totals["baseline_avg_usd_per_txn"] = round(baseline, 2)
+            _count_impact(totals, _impact_level(spend / baseline if baseline else 0.0), n)
+
+    return _footprint_response(sum(cat_kg.values()), by_category, expense_count)
+
+
+def _footprint_response(total_kg_co2e: float, by_category: dict, transaction_count: int) -> dict:
     by_category_serializable = {}
     for cat, data in sorted(by_category.items()):
         by_category_serializable[cat] = {
@@ -148,10 +201,10 @@ def get_carbon_footprint(
             },
         }
 
-    out = {
+    return {
         "total_kg_co2e": round(total_kg_co2e, 4),
         "by_category": by_category_serializable,
-        "transaction_count_used": len(spending),
+        "transaction_count_used": transaction_count,
         "classification_logic": {
             "baseline": "average $ per transaction in that category (this dataset)",
             "low": f"transaction < {IMPACT_LOW_THRESHOLD * 100:.0f}% of baseline",
@@ -159,6 +212,3 @@ def get_carbon_footprint(
             "high": f"transaction > {IMPACT_HIGH_THRESHOLD * 100:.0f}% of baseline",
         },
     }
-    if include_transactions:
-        out["transactions_with_impact"] = transactions_with_impact
-    return out
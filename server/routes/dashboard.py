@@ -0,0 +1,56 @@
+"""
+Combined dashboard data: transactions, /analysis, /generate_budget and /budget_plan in one request.
+"""
+import asyncio
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from google.cloud.firestore import AsyncClient
+
+from database import get_async_db
+from rollups import build_rollups
+from routes.analysis import EMPTY_ANALYSIS, summarize_rollup
+from routes.budget_planner import budget_from_rollups, budget_plan_from_user
+from transaction_repo import UNDATED_BUCKET, month_key
+from transaction_repo_async import get_transactions_for_user
+from user_repo_async import get_user_doc_by_email, update_user_fields
+
+router = APIRouter()
+
+EMPTY_BUDGET = {"income": 0, "expenses": 0, "savings": 0, "categories": {}}
+
+
+@router.get("/dashboard")
+async def get_dashboard(
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """
+    Everything the dashboard's first load needs, from one read of the user document and one of
+    the transactions. The transactions are folded into monthly rollups in a single pass and the
+    analysis and budget are summarized from those with the same code as the rollup-backed
+    endpoints, so the numbers match /analysis and /generate_budget.
+    """
+    user_doc, transactions = await asyncio.gather(
+        get_user_doc_by_email(db, user_email), get_transactions_for_user(db, user_email)
+    )
+    user_data = (user_doc.to_dict() or {}) if user_doc is not None else {}
+
+    rollups = await run_in_threadpool(build_rollups, transactions, month_key)
+    dated = sorted(m for m in rollups if m != UNDATED_BUCKET)
+    analysis = summarize_rollup(rollups[dated[-1]]) if dated else dict(EMPTY_ANALYSIS)
+
+    if user_doc is None:
+        budget = dict(EMPTY_BUDGET)
+    else:
+        budget = budget_from_rollups(rollups) if transactions else dict(EMPTY_BUDGET)
+        # Keep the stored budget in sync, as /generate_budget does
+        if user_data.get("budget") != budget:
+            await update_user_fields(user_doc.reference, {"budget": budget})
+
+    return {
+        "transactions": transactions,
+        "analysis": analysis,
+        "budget": budget,
+        "budget_plan": budget_plan_from_user(user_data),
+    }
@@ -0,0 +1,109 @@
+"""
+Server-sent events for the dashboard: GET /events?user_email=... streams the user's new
+transactions as they are appended, with what they add to the monthly aggregates, so clients
+update in place instead of re-fetching everything. Fan-out, backpressure and connection limits
+are in change_feed; changes are picked up from a Firestore listener on the user document (one
+per user, whatever the number of connections) and from appends in this worker.
+
+Events (data is JSON):
+    ready         {"count"}                            once, when the stream is subscribed
+    transactions  {"count", "transactions", "deltas"}  after each append; deltas are keyed by
+                  month (see DELTA_FIELDS). With more than SSE_MAX_EVENT_TRANSACTIONS rows the
+                  list is left out and "truncated" is true (refetch it; the deltas are complete)
+    resync        {"reason"}                           the change is not an append, or this
+                  connection fell behind: refetch
+While idle, a comment line is sent every SSE_HEARTBEAT_SECONDS.
+
+Config (env): SSE_MAX_EVENT_TRANSACTIONS (default 500), plus change_feed's.
+"""
+import os
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from change_feed import TooManyConnections, change_feed, encode_event
+from database import get_async_db, get_sync_db
+from rollups import build_rollups, rollup_document
+from transaction_repo import _user_key, _user_ref, month_key
+from transaction_repo_async import get_appended_since
+
+router = APIRouter(tags=["events"])
+
+SSE_MAX_EVENT_TRANSACTIONS = int(os.environ.get("SSE_MAX_EVENT_TRANSACTIONS", "500"))
+
+# Rollup fields sent as per-month deltas (see rollups.py), plus kg_co2e
+DELTA_FIELDS = ("count", "income", "expenses", "categories", "spend", "weeks", "spend_total", "expense_count")
+
+
+def _rounded(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    return value
+
+
+def aggregate_deltas(added: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """What the transactions add to each month's aggregates (the rollup of just those rows)."""
+    deltas = {}
+    for month, rollup in build_rollups(added, month_key).items():
+        doc = rollup_document(rollup)
+        delta = _rounded({f: doc[f] for f in DELTA_FIELDS})
+        delta["kg_co2e"] = round(sum(c["kg"] for c in doc["carbon"].values()), 4)
+        deltas[month] = delta
+    return deltas
+
+
+async def _refresh(key: str, state: dict[str, Any] | None) -> tuple[dict[str, Any], list]:
+    version, added = await get_appended_since(get_async_db(), key, state)
+    if state is None or added == []:
+        return version, []
+    if added is None:
+        return version, [("resync", {"reason": "changed", "count": version["count"]})]
+    payload: dict[str, Any] = {"count": version["count"], "deltas": aggregate_deltas(added)}
+    if len(added) <= SSE_MAX_EVENT_TRANSACTIONS:
+        payload["transactions"] = jsonable_encoder(added)
+    else:
+        payload["truncated"] = True
+    return version, [("transactions", payload)]
+
+
+def _watch_user_document(key: str, notify):
+    """Firestore listener on the user document (None on backends without on_snapshot)."""
+    ref = _user_ref(get_sync_db(), key)
+    if not hasattr(ref, "on_snapshot"):
+        return None
+    watch = ref.on_snapshot(lambda docs, changes, read_time: notify())
+    return watch.unsubscribe
+
+
+@router.get("/events")
+async def stream_events(user_email: str = Query(..., description="User email")):
+    """Event stream of the user's new transactions and aggregate deltas (text/event-stream)."""
+    try:
+        subscription = await change_feed.subscribe(_user_key(user_email), _refresh, _watch_user_document)
+    except TooManyConnections as e:
+        code = status.HTTP_429_TOO_MANY_REQUESTS if e.per_user else status.HTTP_503_SERVICE_UNAVAILABLE
+        raise HTTPException(status_code=code, detail=str(e))
+
+    async def stream():
+        try:
+            yield encode_event("ready", {"count": subscription.topic.state["count"]})
+            async for frame in subscription.frames():
+                yield frame
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events/stats")
+async def get_event_stats():
+    """Open event streams, users watched, and events published / dropped by backpressure."""
+    return change_feed.stats()
@@ -0,0 +1,40 @@
+"""
+Model registry routes: inspect the loaded classifier artifacts and hot-reload them.
+"""
+from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi.concurrency import run_in_threadpool
+from google.cloud.firestore import AsyncClient
+
+from database import get_async_db
+from models.model_registry import registry
+from transaction_labels import rescore_all_users, rescore_status
+
+router = APIRouter(prefix="/models", tags=["models"])
+
+
+@router.get("/status")
+async def get_model_status():
+    """Loaded artifact version, source directory, per-artifact load time / memory, and label rescore progress."""
+    return {**registry.stats(), "label_rescore": rescore_status()}
+
+
+@router.post("/reload")
+async def reload_models(background_tasks: BackgroundTasks, db: AsyncClient = Depends(get_async_db)):
+    """
+    Re-read the configured artifact directory and atomically swap in the new version.
+    Requests in flight finish on the previous version. On a swap, stored labels from other
+    versions are no longer served and every user's labels are rescored in the background
+    (progress in GET /models/status).
+    """
+    previous = registry.stats().get("version")
+    bundle = await run_in_threadpool(registry.reload)
+    swapped = previous != bundle.version
+    if swapped:
+        background_tasks.add_task(rescore_all_users, db, bundle.version)
+    return {
+        "previous_version": previous,
+        "version": bundle.version,
+        "swapped": swapped,
+        "label_rescore": "queued" if swapped else None,
+        "artifacts": bundle.stats,
+    }
@@ -1,28 +1,53 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
+from google.cloud.firestore import AsyncClient
 from pydantic import BaseModel
 
+from database import get_async_db
 from routes.target import compute_goal_status
+from user_repo_async import get_goal_state, set_hourly_wage
 
 
-
-user_profile = {
-    "hourly_wage": 15.00
-}
-
 router = APIRouter()
 
 class PurchaseInput(BaseModel):
     amount: float
     merchant: str   
 
+
+class WageInput(BaseModel):
+    hourly_wage: float
+
+
+@router.put("/reflection/hourly-wage")
+async def update_hourly_wage(
+    data: WageInput,
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """Set the hourly wage used to express purchases in hours worked."""
+    if data.hourly_wage <= 0:
+        return {"error": "Hourly wage must be positive"}
+    state = await set_hourly_wage(db, user_email, data.hourly_wage)
+    if state is None:
+        return {"error": "User not found"}
+    return {"hourly_wage": state.hourly_wage}
+
+
 @router.post("/reflection/purchase")
-def reflect_purchase(data: PurchaseInput):
+async def reflect_purchase(
+    data: PurchaseInput,
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
     if data.amount <= 0:
         data.amount = -1 * data.amount
 
-    goal_status = compute_goal_status()
+    state = await get_goal_state(db, user_email)
+    if state is None:
+        return {"error": "User not found"}
+    goal_status = compute_goal_status(state)
     daily_savings_required = goal_status["daily_savings_required"]
-    hourly_wage = user_profile["hourly_wage"]
+    hourly_wage = state.hourly_wage
     if hourly_wage <= 0:
         return {"error": "Hourly wage must be positive"}
 
@@ -1,21 +1,24 @@
 # backend/app/routes/target.py
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
+from google.cloud.firestore import AsyncClient
 from pydantic import BaseModel
 import datetime
 
-from models.goal_state import target_profile
+from database import get_async_db
+from models.goal_state import GoalState
+from user_repo_async import add_goal_savings, get_goal_state, set_goal
 
 router = APIRouter()
 
-def compute_goal_status():
+def compute_goal_status(state: GoalState):
     today = datetime.date.today()
-    target_date = datetime.date.fromisoformat(target_profile["target_date"])
+    target_date = datetime.date.fromisoformat(state.target_date)
 
     days_left = max((target_date - today).days, 0)
 
     remaining_amount = max(
-        target_profile["target_amount"] - target_profile["current_savings"], 0
+        state.target_amount - state.current_savings, 0
     )
 
     if days_left > 0:
@@ -24,18 +27,51 @@ def compute_goal_status():
         daily_savings_required = 0
 
     return {
-        "goal_name": target_profile["name"],
-        "target_date": target_profile["target_date"],
+        "goal_name": state.name,
+        "target_date": state.target_date,
         "days_left": days_left,
-        "current_savings": target_profile["current_savings"],
+        "current_savings": state.current_savings,
         "remaining_amount": remaining_amount,
         "daily_savings_required": daily_savings_required
     }
 
 
 @router.get("/target")
-def get_target():
-    return compute_goal_status()
+async def get_target(
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
+    state = await get_goal_state(db, user_email)
+    if state is None:
+        return {"error": "User not found"}
+    return compute_goal_status(state)
+
+
+class GoalInput(BaseModel):
+    name: str | None = None
+    target_amount: float | None = None
+    target_date: datetime.date | None = None
+    current_savings: float | None = None
+
+
+@router.put("/target")
+async def update_target(
+    data: GoalInput,
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """Set the user's savings goal (only the fields given change)."""
+    goal = data.model_dump(exclude_none=True)
+    if goal.get("target_amount", 1) <= 0:
+        return {"error": "Target amount must be positive"}
+    if goal.get("current_savings", 0) < 0:
+        return {"error": "Current savings cannot be negative"}
+    if "target_date" in goal:
+        goal["target_date"] = goal["target_date"].isoformat()
+    state = await set_goal(db, user_email, goal) if goal else await get_goal_state(db, user_email)
+    if state is None:
+        return {"error": "User not found"}
+    return compute_goal_status(state)
 
 
 class SavingsInput(BaseModel):
@@ -43,19 +79,25 @@ class SavingsInput(BaseModel):
 
 
 @router.post("/target/add-savings")
-def add_savings(data: SavingsInput):
+async def add_savings(
+    data: SavingsInput,
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
     if data.amount <= 0:
         return {"error": "Savings amount must be positive"}
 
-    target_profile["current_savings"] += data.amount
+    state = await add_goal_savings(db, user_email, data.amount)
+    if state is None:
+        return {"error": "User not found"}
 
-    if target_profile["current_savings"] >= target_profile["target_amount"]:
+    if state.current_savings >= state.target_amount:
         return {
             "message": "Congratulations! You have reached your savings goal!",
-            "updated_goal": compute_goal_status()
+            "updated_goal": compute_goal_status(state)
         }
 
     return {
         "message": f"Added ${data.amount} to savings",
-        "updated_goal": compute_goal_status()
+        "updated_goal": compute_goal_status(state)
     }
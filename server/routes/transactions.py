@@ -1,13 +1,50 @@
-from fastapi import APIRouter, Body, Depends, Query
-from firebase_admin import firestore
-from pydantic import BaseModel
+import asyncio
+import codecs
+import csv
+import json
+from collections import deque
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Literal
+from urllib.parse import quote
 
-from database import init_db, get_db
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from google.cloud.firestore import AsyncClient
+from pydantic import BaseModel, ValidationError, field_validator
+
+from conditional import etag_headers, etag_matches, make_etag, not_modified
+from database import init_db, get_async_db
 from dotenv import load_dotenv
-from models.valid_transaction import validate_transaction
-from routes.LLMcall import get_prediction
-from transaction_repo import add_transaction_for_user
+from models.model_registry import registry
+from prediction_jobs import QueueFull, input_digest, job_queue
+from prediction_prompt import LLM_PROMPT_TOKEN_BUDGET, prompt_stats
+from request_metrics import InstrumentedJSONResponse
+from routes.LLMcall import LLM_MODEL, get_prediction
+from transaction_labels import classify_transactions
+from transaction_repo import MAX_APPEND_ROWS, _user_key
+from transaction_repo_async import (
+    add_transaction_for_user,
+    append_transactions_for_user,
+    get_data_version,
+    get_transactions_and_labels,
+    get_transactions_for_user,
+)
 from routes.reflection import reflect_purchase
+from snapshot_cache import snapshot_cache
+from transaction_query import (
+    MAX_PAGE_SIZE,
+    STREAM_MIN_ROWS,
+    TransactionQuery,
+    filter_transactions,
+    iter_json_array,
+    iter_ndjson,
+    order_transactions,
+    paginate,
+    project,
+)
+from user_repo_async import get_user_doc_by_email
 
 load_dotenv()
 
@@ -15,6 +52,13 @@ init_db()
 
 router = APIRouter()
 
+# Bulk ingestion limits
+MAX_BULK_LINE_CHARS = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+# User document fields the prediction prompt needs
+PREDICTION_PROFILE_FIELDS = ["budget_plan", "budget", "target_item", "target_amount"]
+
 
 class DummyTransactionPayload(BaseModel):
     amount: int | float
@@ -24,16 +68,37 @@ class DummyTransactionPayload(BaseModel):
     time: str
     transaction_id: str
 
+    @field_validator("date")
+    @classmethod
+    def _iso_date(cls, value: str) -> str:
+        return _parsed_as(value, "%Y-%m-%d", lambda d: d.date().isoformat(), "a date as YYYY-MM-DD")
+
+    @field_validator("time")
+    @classmethod
+    def _clock_time(cls, value: str) -> str:
+        return _parsed_as(value, "%H:%M:%S", lambda d: d.time().isoformat(), "a time as HH:MM:SS")
+
+
+def _parsed_as(value: str, fmt: str, canonical, what: str) -> str:
+    """value if it parses with fmt and is written in canonical form (zero-padded), else ValueError."""
+    try:
+        if canonical(datetime.strptime(value, fmt)) == value:
+            return value
+    except ValueError:
+        pass
+    raise ValueError(f"must be {what}")
+
+
 class PurchaseInput(BaseModel):
     amount: float
     merchant: str 
 
 
 @router.post("/transactions/dummy")
-def add_dummy_transaction(
+async def add_dummy_transaction(
     user_email: str = Query(..., description="User email (document ID for transactions)"),
     body: DummyTransactionPayload = Body(..., description="Transaction record to add"),
-    db: firestore.Client = Depends(get_db),
+    db: AsyncClient = Depends(get_async_db),
 ):
     """
     Add a single transaction to the given user's transactions in Firestore.
@@ -45,8 +110,8 @@ def add_dummy_transaction(
 
     reflect = PurchaseInput(amount=transaction["amount"], merchant=transaction["place"])
 
-    output = reflect_purchase(reflect)
-    count = add_transaction_for_user(db, user_email, transaction)
+    output = await reflect_purchase(reflect, user_email, db)
+    count = await add_transaction_for_user(db, user_email, transaction)
     return {
         "message": "Transaction added",
         "user_email": user_email.strip().lower(),
@@ -57,49 +122,395 @@ def add_dummy_transaction(
     }
 
 
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    """Yield decoded lines from the streamed request body without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > MAX_BULK_LINE_CHARS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line longer than {MAX_BULK_LINE_CHARS} characters",
+            )
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+class _LineFeed:
+    """Lines pushed by the caller, as the (sync) source of a csv.reader over a streamed body."""
+
+    def __init__(self):
+        self._lines: deque[str] = deque()
+
+    def push(self, line: str) -> None:
+        self._lines.append(line)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        return self._lines.popleft()
+
+
+def _ends_in_quotes(line: str, quoted: bool) -> bool:
+    """Whether a CSV record is inside a quoted field after line (quoted: it was before), as csv.reader parses it."""
+    if '"' not in line:
+        return quoted
+    state = "quoted" if quoted else "start"
+    for ch in line:
+        if state == "quoted":
+            if ch == '"':
+                state = "closed"
+        elif state == "closed":
+            # "" is an escaped quote; anything else ends the quoted part
+            state = "quoted" if ch == '"' else "start" if ch == "," else "field"
+        elif ch == ",":
+            state = "start"
+        else:
+            state = "quoted" if state == "start" and ch == '"' else "field"
+    return state == "quoted"
+
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, list[str]]]:
+    """
+    (first line number, fields) of each CSV record. Quoted fields may span lines, so complete
+    records are fed to one csv.reader, whose line_num counts the physical lines.
+    """
+    source = _LineFeed()
+    reader = csv.reader(source)
+    quoted, size = False, 0
+    async for line in lines:
+        source.push(line + "\n")
+        quoted = _ends_in_quotes(line, quoted)
+        size += len(line) + 1
+        if quoted:
+            if size > MAX_BULK_LINE_CHARS:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"CSV record longer than {MAX_BULK_LINE_CHARS} characters",
+                )
+            continue
+        first = reader.line_num + 1
+        yield first, next(reader)
+        size = 0
+    if quoted:
+        # Unterminated quote: the rest of the body is one last record
+        first = reader.line_num + 1
+        yield first, next(reader)
+
+
+async def _iter_numbered(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, str]]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        yield line_no, line
+
+
+def _is_blank(record: str | list[str]) -> bool:
+    """A blank NDJSON line, or a CSV record with no fields or a single empty one."""
+    if isinstance(record, str):
+        return not record.strip()
+    return len(record) <= 1 and not "".join(record).strip()
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+@router.post("/transactions/bulk")
+async def add_transactions_bulk(
+    request: Request,
+    user_email: str = Query(..., description="User email (document ID for transactions)"),
+    format: Literal["ndjson", "csv"] | None = Query(
+        None, description="Body format; defaults from Content-Type (text/csv -> csv, else ndjson)"
+    ),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """
+    Stream transactions as NDJSON (one JSON object per line) or CSV (header row with
+    amount, category, date, place, time, transaction_id; quoted fields may contain newlines).
+    Rows are validated one by one, written in batched commits, and rows whose transaction_id
+    already exists are skipped. Returns counts plus per-row errors (row = 1-based line number
+    where the row starts).
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "").lower() else "ndjson")
+    header: list[str] | None = None
+    pending: list[dict] = []
+    errors: list[dict] = []
+    summary = {"rows": 0, "added": 0, "duplicates": 0, "invalid": 0}
+    duplicate_ids: list[str] = []
+
+    def reject(row: int, message: str) -> None:
+        summary["invalid"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row, "error": message})
+
+    async def flush() -> None:
+        added, duplicates = await append_transactions_for_user(db, user_email, pending)
+        summary["added"] += len(added)
+        summary["duplicates"] += len(duplicates)
+        duplicate_ids.extend(str(t["transaction_id"]) for t in duplicates[:MAX_REPORTED_ERRORS - len(duplicate_ids)])
+        pending.clear()
+
+    lines = _iter_lines(request)
+    records = _iter_csv_records(lines) if fmt == "csv" else _iter_numbered(lines)
+    async for line_no, record in records:
+        if _is_blank(record):
+            continue
+        if fmt == "csv" and header is None:
+            header = [h.strip().lower() for h in record]
+            continue
+        summary["rows"] += 1
+        try:
+            if fmt == "csv":
+                if len(record) != len(header):
+                    reject(line_no, f"expected {len(header)} columns, got {len(record)}")
+                    continue
+                raw = dict(zip(header, record))
+            else:
+                raw = json.loads(record)
+                if not isinstance(raw, dict):
+                    reject(line_no, "expected a JSON object")
+                    continue
+            pending.append(DummyTransactionPayload.model_validate(raw).model_dump())
+        except json.JSONDecodeError as e:
+            reject(line_no, f"invalid JSON: {e.msg}")
+            continue
+        except ValidationError as e:
+            reject(line_no, _validation_message(e))
+            continue
+        if len(pending) >= MAX_APPEND_ROWS:
+            await flush()
+    if pending:
+        await flush()
+
+    return {
+        "user_email": user_email.strip().lower(),
+        **summary,
+        "duplicate_transaction_ids": duplicate_ids,
+        "errors": errors,
+        "errors_truncated": summary["invalid"] > len(errors),
+    }
+
+
+@router.get("/transactions/cache/stats")
+async def get_transaction_cache_stats():
+    """Hit / miss / eviction counters and memory use of the per-user transaction snapshot cache."""
+    return snapshot_cache.stats()
+
+
+def transaction_query(
+    since: date | None = Query(None, description="Only transactions on or after this date (YYYY-MM-DD)"),
+    until: date | None = Query(None, description="Only transactions on or before this date (YYYY-MM-DD)"),
+    category: str | None = Query(None, description="Only this category (as returned by the endpoint)"),
+    min_amount: float | None = Query(None, description="Minimum signed amount (expenses are negative)"),
+    max_amount: float | None = Query(None, description="Maximum signed amount"),
+    fields: str | None = Query(None, description="Comma-separated fields to return, e.g. date,amount,place"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables pagination"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    order: Literal["asc", "desc"] | None = Query(None, description="Order by date and time (pages default to asc)"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one transaction per line"),
+) -> TransactionQuery:
+    return TransactionQuery(
+        since=since,
+        until=until,
+        category=category,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        limit=limit,
+        cursor=cursor,
+        order=order,
+        format=format,
+    )
+
+
+def _select(txns: list[dict[str, Any]], q: TransactionQuery) -> tuple[list[dict[str, Any]], str | None]:
+    """Apply q's ordering and pagination: (rows, next_cursor)."""
+    if q.paginated:
+        try:
+            return paginate(txns, q.limit, q.cursor, descending=q.order == "desc")
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if q.order is not None:
+        txns = order_transactions(txns, descending=q.order == "desc")
+    return txns, None
+
+
+def _list_response(
+    txns: list[dict[str, Any]], next_cursor: str | None, q: TransactionQuery, headers: dict[str, str] | None = None
+):
+    """
+    Pages are {"transactions": [...], "next_cursor": ...}; otherwise a bare array as before.
+    NDJSON (next cursor in the X-Next-Cursor header) and large arrays are streamed.
+    """
+    txns = project(txns, q.fields)
+    if q.format == "ndjson":
+        if next_cursor:
+            headers = {**(headers or {}), "X-Next-Cursor": next_cursor}
+        return StreamingResponse(iter_ndjson(txns), media_type="application/x-ndjson", headers=headers)
+    if q.paginated:
+        content: Any = {"transactions": txns, "next_cursor": next_cursor}
+    elif len(txns) > STREAM_MIN_ROWS:
+        return StreamingResponse(iter_json_array(txns), media_type="application/json", headers=headers)
+    else:
+        content = txns
+    return InstrumentedJSONResponse(jsonable_encoder(content), headers=headers)
+
+
 @router.get("/transactions")
-def get_transactions(user_email: str):
-    db = firestore.client()
-    transactions = db.collection("transactions").document(user_email).get()
-    if not transactions.exists:
-        return []
-    return transactions.to_dict().get("transactions", [])
+async def get_transactions(
+    request: Request,
+    user_email: str,
+    q: TransactionQuery = Depends(transaction_query),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """
+    The user's transactions, optionally filtered, ordered, paginated, projected or as NDJSON.
+    Conditional: If-None-Match with the ETag of an earlier response gets a 304 until the user's
+    transactions change.
+    """
+    etag = make_etag("transactions", request.url.query, await get_data_version(db, user_email))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    txns = await get_transactions_for_user(db, user_email, q.since, q.until)
+    txns = filter_transactions(txns, q.category, q.min_amount, q.max_amount)
+    return _list_response(*_select(txns, q), q, etag_headers(etag))
+
 
 @router.get("/transactions_valid")
-def get_transactions_valid(user_email: str):
-    db = firestore.client()
-    transactions = db.collection("transactions").document(user_email).get()
-    txns = transactions.to_dict().get("transactions", [])
-    for txn in txns:
-        txn["category"] = validate_transaction(txn)
-    return txns
-        
+async def get_transactions_valid(
+    request: Request,
+    user_email: str,
+    q: TransactionQuery = Depends(transaction_query),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """
+    Like GET /transactions with category replaced by [label, confidence] (label is Important,
+    Discretionary or Income & Transfers). The category filter matches the label; without it only
+    the requested page is classified. Conditional like GET /transactions; the ETag also covers
+    the classifier version.
+    """
+    bundle = await run_in_threadpool(registry.get)
+    etag = make_etag("transactions_valid", request.url.query, await get_data_version(db, user_email), bundle.version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    txns, labels = await get_transactions_and_labels(db, user_email, q.since, q.until)
+    txns = filter_transactions(txns, min_amount=q.min_amount, max_amount=q.max_amount)
+    next_cursor = None
+    if q.category is None:
+        txns, next_cursor = _select(txns, q)
+    results = await classify_transactions(db, user_email, txns, labels, prune=not q.partial)
+    # New rows: the loaded ones may be shared with the snapshot cache
+    txns = [{**txn, "category": result} for txn, result in zip(txns, results)]
+    if q.category is not None:
+        txns, next_cursor = _select([t for t in txns if t["category"][0] == q.category], q)
+    return _list_response(txns, next_cursor, q, etag_headers(etag))
+
+
+
+async def run_prediction(
+    db: AsyncClient,
+    user_email: str,
+    user_budget: dict | None = None,
+) -> dict | None:
+    """
+    Classify the user's transactions and predict from the discretionary ones (None if the LLM
+    call failed). user_budget is read from the user document unless given.
+    """
+    if user_budget is None:
+        (txns, labels), user_budget = await asyncio.gather(
+            get_transactions_and_labels(db, user_email),
+            get_prediction_budget(db, user_email),
+        )
+    else:
+        txns, labels = await get_transactions_and_labels(db, user_email)
+    results = await classify_transactions(db, user_email, txns, labels)
+    # Keep the spending category on each transaction; the prompt aggregates by it
+    bad_transactions = [txn for txn, (label, _) in zip(txns, results) if label == "Discretionary"]
+
+    return await get_prediction(user_budget, bad_transactions)
 
 
 @router.get("/prediction")
-def reflect_transaction(user_email: str):
-    db = firestore.client()
-    transactions = db.collection("transactions").document(user_email).get()
-    txns = transactions.to_dict().get("transactions", [])
-    for txn in txns:
-        txn["category"] = validate_transaction(txn)
-    bad_transactions = [txn for txn in txns if txn["category"] == "Discretionary"]
-
-    users = db.collection("users").get()
-    users = [user.to_dict() for user in users]
-
-    user_budget = {}    
-
-    for user in users:
-        if user["email"] == user_email:
-            if user["budget_plan"]:
-                user_budget = user["budget_plan"]
-            elif user["budget"]:
-                user_budget = user["budget"]
-            
-            user_budget["target_item"] = user["target_item"]
-            user_budget["target_amount"] = user["target_amount"]
-      
-            break
-    return get_prediction(bad_transactions, user_budget)
+async def reflect_transaction(
+    user_email: str,
+    db: AsyncClient = Depends(get_async_db),
+):
+    return await run_prediction(db, user_email)
+
+
+@router.post("/prediction/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_prediction_job(
+    response: Response,
+    user_email: str = Query(..., description="User email"),
+    db: AsyncClient = Depends(get_async_db),
+):
+    """
+    Queue a prediction (see prediction_jobs) and return the job; poll GET /prediction/jobs/{job_id}.
+    The same inputs get the queued, running or recently finished job back instead of a new one.
+    """
+    (version, user_budget), bundle = await asyncio.gather(
+        asyncio.gather(get_data_version(db, user_email), get_prediction_budget(db, user_email)),
+        run_in_threadpool(registry.get),
+    )
+    digest = input_digest({
+        "user": _user_key(user_email),
+        "data_version": version,
+        "budget": user_budget,
+        "classifier": bundle.version,
+        "model": LLM_MODEL,
+        "prompt_budget": LLM_PROMPT_TOKEN_BUDGET,
+    })
+
+    async def run() -> dict | None:
+        return await run_prediction(db, user_email, user_budget)
+
+    try:
+        job, _ = job_queue.submit(_user_key(user_email), digest, run)
+    except QueueFull as e:
+        code = status.HTTP_429_TOO_MANY_REQUESTS if e.per_user else status.HTTP_503_SERVICE_UNAVAILABLE
+        raise HTTPException(status_code=code, detail=str(e))
+    response.headers["Location"] = f"/prediction/jobs/{job.id}?user_email={quote(user_email)}"
+    return job.to_dict()
+
+
+@router.get("/prediction/jobs/stats")
+async def get_prediction_job_stats():
+    """Queued and running prediction jobs, workers, and how many submits were deduplicated or cached."""
+    return job_queue.stats()
+
+
+@router.get("/prediction/jobs/{job_id}")
+async def get_prediction_job(job_id: str, user_email: str = Query(..., description="User email")):
+    """The job's status, with the prediction once done (404 for unknown or expired jobs)."""
+    job = job_queue.get(job_id)
+    if job is None or job.user_key != _user_key(user_email):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prediction job not found")
+    return job.to_dict()
+
+
+@router.get("/prediction/prompt_stats")
+async def get_prediction_prompt_stats():
+    """Estimated prompt tokens before and after compaction, summed over predictions so far."""
+    return prompt_stats()
+
+
+async def get_prediction_budget(db: AsyncClient, user_email: str) -> dict:
+    """Budget context for the prediction: the user's budget plan (or budget) plus their savings target."""
+    user_doc = await get_user_doc_by_email(db, user_email, field_paths=PREDICTION_PROFILE_FIELDS)
+    if user_doc is None:
+        return {}
+    user = user_doc.to_dict() or {}
+    user_budget = dict(user.get("budget_plan") or user.get("budget") or {})
+    user_budget["target_item"] = user.get("target_item")
+    user_budget["target_amount"] = user.get("target_amount")
+    return user_budget
     
@@ -0,0 +1,200 @@
+"""
+In-process LRU cache of per-user transaction snapshots (transactions + stored labels), used by
+transaction_repo so the routes a dashboard load fans out to don't each re-read every month bucket.
+An entry can also carry the snapshot's TransactionFrame (see transaction_frame), built on first use.
+
+Entries are tagged with the user document's update_time. Every append bumps that document, so a
+read that sees a different update_time (a write from this or another worker) misses. Local
+writes also invalidate directly. Memory is bounded by an estimated byte budget (least recently
+used entries are evicted first); entries older than the TTL expire.
+
+Config (env): TRANSACTION_CACHE_MAX_MB (default 64, 0 disables), TRANSACTION_CACHE_TTL_SECONDS (default 300).
+"""
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+# Transactions sampled per entry to estimate its size
+_SIZE_SAMPLE = 20
+
+
+def _deep_size(obj: Any) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(v) for v in obj)
+    return size
+
+
+def _estimate_size(transactions: list[dict[str, Any]], labels: dict[str, dict[str, Any]]) -> int:
+    size = sys.getsizeof(transactions) + sys.getsizeof(labels)
+    if transactions:
+        sample = transactions[:_SIZE_SAMPLE]
+        size += len(transactions) * sum(_deep_size(t) for t in sample) // len(sample)
+    if labels:
+        h, entry = next(iter(labels.items()))
+        size += len(labels) * (_deep_size(h) + _deep_size(entry))
+    return size
+
+
+@dataclass
+class _Entry:
+    version: Any
+    transactions: list[dict[str, Any]]
+    labels: dict[str, dict[str, Any]]
+    size: int
+    stored_at: float
+    frame: Any = None
+
+
+class TransactionSnapshotCache:
+    """Thread-safe LRU keyed by user key, bounded by estimated bytes, with a TTL per entry."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Dropped once no load holds or waits on them
+        self._key_locks: weakref.WeakValueDictionary[str, threading.Lock] = weakref.WeakValueDictionary()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "stale": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(
+        self, key: str, version: Any, record: bool = True
+    ) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]] | None:
+        """
+        Return (transactions, labels) if cached for this version, else None. The lists and label
+        dict are fresh, but the transaction rows are shared with the cache: treat them as read-only.
+        record=False skips the hit/miss counters (re-checks after waiting on a load).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            reason = None
+            if entry is None:
+                reason = "miss"
+            elif entry.version != version:
+                reason = "stale"
+            elif time.monotonic() - entry.stored_at > self.ttl_seconds:
+                reason = "expirations"
+            if reason is not None:
+                if entry is not None:
+                    self._remove(key)
+                if record:
+                    self._counters["misses"] += 1
+                    if reason != "miss":
+                        self._counters[reason] += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self._counters["hits"] += 1
+            transactions, labels = entry.transactions, entry.labels
+        return list(transactions), dict(labels)
+
+    def put(
+        self, key: str, version: Any, transactions: list[dict[str, Any]], labels: dict[str, dict[str, Any]]
+    ) -> None:
+        if not self.enabled:
+            return
+        entry = _Entry(
+            version=version,
+            transactions=list(transactions),
+            labels=dict(labels),
+            size=_estimate_size(transactions, labels),
+            stored_at=time.monotonic(),
+        )
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def get_frame(self, key: str, version: Any) -> Any | None:
+        """The TransactionFrame attached to the entry for this version, if any (shared; it is read-only)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or entry.frame is None:
+                return None
+            if time.monotonic() - entry.stored_at > self.ttl_seconds:
+                return None
+            self._entries.move_to_end(key)
+            return entry.frame
+
+    def put_frame(self, key: str, version: Any, frame: Any) -> None:
+        """Attach a frame built from the entry's transactions (no-op if the entry changed meanwhile)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or entry.frame is not None:
+                return
+            entry.frame = frame
+            entry.size += frame.nbytes
+            self._bytes += frame.nbytes
+            self._evict()
+
+    def merge_labels(self, key: str, labels: dict[str, dict[str, Any]]) -> None:
+        """Add newly stored labels to a cached entry (label writes don't change the user document)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.labels.update(labels)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._counters["invalidations"] += 1
+
+    @contextmanager
+    def loading(self, key: str) -> Iterator[None]:
+        """Serialize loads of the same key so concurrent misses read Firestore once."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            yield
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the byte budget holds (caller holds the lock)."""
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+snapshot_cache = TransactionSnapshotCache(
+    max_bytes=int(float(os.getenv("TRANSACTION_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    ttl_seconds=float(os.getenv("TRANSACTION_CACHE_TTL_SECONDS", "300")),
+)
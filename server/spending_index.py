@@ -0,0 +1,161 @@
+"""
+Per-user daily spending index for /analysis over arbitrary periods (month, quarter, year,
+rolling N days or an explicit date range).
+
+The index is sparse: it holds only the days with spending, so its size follows the number of
+(day, category) entries, not the span between the first and last date:
+    days[i]          day offsets (from start) with spend, ascending; totals[i + 1] is the
+                     cumulative spend in cents up to and including days[i] (totals[0] = 0)
+    keys[j]          category * span + day offset, ascending; cumulative[j + 1] likewise
+so the spend of any [start, end] range is two binary searches (one pair per category for
+by_category), and a weekly series is two per week, whatever the number of transactions.
+
+It is built from the per-day totals in the monthly rollups (rollups.py "days", incremented in
+the same batch that appends transactions), so a rebuild after an ingest reads O(months)
+documents; users whose rollups are not current get it from their TransactionFrame instead.
+Indexes are cached per user and tagged with the user document's update_time, like the
+transaction snapshots.
+
+Config (env): SPENDING_INDEX_CACHE_SIZE (users, default 256, 0 disables),
+SPENDING_INDEX_CACHE_TTL_SECONDS (default 300).
+"""
+import os
+from datetime import date
+from typing import Any
+
+import numpy as np
+
+from auth_cache import TTLCache
+from transaction_frame import MISSING, UNDATED, TransactionFrame, day_number, to_date
+from transaction_repo import UNDATED_BUCKET
+
+SPENDING_INDEX_CACHE_SIZE = int(os.environ.get("SPENDING_INDEX_CACHE_SIZE", "256"))
+SPENDING_INDEX_CACHE_TTL_SECONDS = float(os.environ.get("SPENDING_INDEX_CACHE_TTL_SECONDS", "300"))
+
+# user key -> (user document update_time, SpendingIndex)
+index_cache = TTLCache(SPENDING_INDEX_CACHE_SIZE, SPENDING_INDEX_CACHE_TTL_SECONDS)
+
+
+def _running_sums(keys: np.ndarray, cents: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(unique keys ascending, cumulative cents with a leading 0) of the entries."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.rint(np.bincount(inverse, weights=cents, minlength=len(unique))).astype(np.int64)
+    cumulative = np.zeros(len(unique) + 1, dtype=np.int64)
+    np.cumsum(sums, out=cumulative[1:])
+    return unique, cumulative
+
+
+class SpendingIndex:
+    __slots__ = ("start", "span", "categories", "days", "totals", "keys", "cumulative")
+
+    def __init__(self, start: int, categories: list[str], days: np.ndarray, codes: np.ndarray, cents: np.ndarray):
+        """days / codes / cents: one entry per (day, category) spend; days are offsets from start."""
+        self.start = start
+        self.span = int(days.max()) + 1 if len(days) else 1
+        self.categories = categories
+        self.days, self.totals = _running_sums(days, cents)
+        self.keys, self.cumulative = _running_sums(codes * self.span + days, cents)
+
+    @classmethod
+    def _from_entries(cls, days: np.ndarray, codes: np.ndarray, cents: np.ndarray, categories: list[str]):
+        start = int(days.min()) if len(days) else 0
+        return cls(start, categories, days - start, codes, np.rint(cents))
+
+    @classmethod
+    def from_rollups(cls, rollups: dict[str, dict[str, Any]]) -> "SpendingIndex":
+        """From monthly rollup documents keyed by "YYYY-MM" (their "days" maps)."""
+        categories: list[str] = []
+        index: dict[str, int] = {}
+        days, codes, cents = [], [], []
+        for month, rollup in rollups.items():
+            if month == UNDATED_BUCKET:
+                continue
+            year, mon = int(month[:4]), int(month[5:7])
+            for dd, by_category in (rollup.get("days") or {}).items():
+                day = day_number(date(year, mon, int(dd)))
+                for category, amount in by_category.items():
+                    if category not in index:
+                        index[category] = len(categories)
+                        categories.append(category)
+                    days.append(day)
+                    codes.append(index[category])
+                    cents.append(amount)
+        return cls._from_entries(
+            np.array(days, dtype=np.int64), np.array(codes, dtype=np.int64), np.array(cents, dtype=np.float64),
+            categories,
+        )
+
+    @classmethod
+    def from_frame(cls, frame: TransactionFrame) -> "SpendingIndex":
+        """From a TransactionFrame (same rules as the rollups: dated expenses, each rounded to cents)."""
+        spent = (frame.amounts < 0) & (frame.days != UNDATED)
+        names, codes = frame.grouped_categories(lambda c: "Uncategorized" if c is MISSING else c)
+        return cls._from_entries(
+            frame.days[spent].astype(np.int64), codes[spent].astype(np.int64),
+            np.rint(-frame.amounts[spent] * 100), names,
+        )
+
+    @property
+    def first_date(self) -> date | None:
+        return to_date(self.start + int(self.days[0])) if len(self.days) else None
+
+    @property
+    def last_date(self) -> date | None:
+        return to_date(self.start + int(self.days[-1])) if len(self.days) else None
+
+    def _offsets(self, start: date, end: date) -> tuple[int, int]:
+        return day_number(start) - self.start, day_number(end) - self.start
+
+    def total(self, start: date, end: date) -> int:
+        """Cents spent within [start, end]."""
+        lo, hi = self._offsets(start, end)
+        return self._total(lo, hi)
+
+    def _total(self, lo: int, hi: int) -> int:
+        i, j = np.searchsorted(self.days, lo, "left"), np.searchsorted(self.days, hi, "right")
+        return int(self.totals[j] - self.totals[i]) if j > i else 0
+
+    def by_category(self, start: date, end: date) -> dict[str, int]:
+        """Cents spent per category within [start, end] (categories with no spend are left out)."""
+        lo, hi = self._offsets(start, end)
+        # Clipped to the span so a category's range never reaches into the next one's keys
+        lo, hi = max(lo, 0), min(hi, self.span - 1)
+        if lo > hi:
+            return {}
+        base = np.arange(len(self.categories), dtype=np.int64) * self.span
+        i = np.searchsorted(self.keys, base + lo, "left")
+        j = np.maximum(np.searchsorted(self.keys, base + hi, "right"), i)
+        spent = self.cumulative[j] - self.cumulative[i]
+        return {self.categories[c]: int(spent[c]) for c in np.flatnonzero(spent)}
+
+    def weekly(self, start: date, end: date) -> dict[str, int]:
+        """
+        Cents spent per ISO week ("YYYY-Www") within [start, end] and the span of the index;
+        the first and last week are clipped.
+        """
+        if not len(self.days):
+            return {}
+        lo = max(day_number(start), self.start + int(self.days[0]))
+        hi = min(day_number(end), self.start + int(self.days[-1]))
+        if lo > hi:
+            return {}
+        # Week boundaries as day numbers (day 0, 1970-01-01, was a Thursday), so weeks ending
+        # after date.max do not overflow
+        mondays = np.arange(lo + 7 - (lo + 3) % 7, hi + 1, 7, dtype=np.int64)
+        starts = np.concatenate(([lo], mondays))
+        ends = np.concatenate((mondays - 1, [hi]))
+        i = np.searchsorted(self.days, starts - self.start, "left")
+        j = np.searchsorted(self.days, ends - self.start, "right")
+        spent = self.totals[j] - self.totals[i]
+        # An ISO week belongs to the year of its Thursday
+        thursdays = (starts - (starts + 3) % 7 + 3).astype("datetime64[D]")
+        years = thursdays.astype("datetime64[Y]")
+        weeks = (thursdays - years).astype(np.int64) // 7 + 1
+        return {
+            f"{y}-W{w:02d}": c
+            for y, w, c in zip((years.astype(np.int64) + 1970).tolist(), weeks.tolist(), spent.tolist())
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.totals.nbytes + self.keys.nbytes + self.cumulative.nbytes
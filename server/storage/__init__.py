@@ -0,0 +1,25 @@
+"""
+Document storage backends behind the repos (transaction_repo, user_repo and their async twins).
+
+The repos use a subset of the Firestore client API: collections and documents; get (with
+field_paths), set (merge), create, update (dotted paths) and delete; get_all; equality where
+queries with limit; write batches; and Increment, ArrayUnion and DELETE_FIELD values. Any client
+offering that subset can stand in for Firestore. database.py picks one with STORAGE_BACKEND:
+    firestore   google-cloud-firestore Client / AsyncClient (default)
+    memory      storage.memory: dicts in this process, lost on exit
+    sqlite      storage.sqlite: one SQLite file (SQLITE_PATH) with an indexed transactions table
+
+Clients may also offer query_transactions(user, start, end, category) -> (transactions, labels);
+the transaction repos use it for date-range reads when present (the SQLite backend does).
+"""
+from storage.memory import AsyncMemoryClient, MemoryClient, MemoryStore
+from storage.sqlite import AsyncSQLiteClient, SQLiteClient, SQLiteStore
+
+__all__ = [
+    "AsyncMemoryClient",
+    "AsyncSQLiteClient",
+    "MemoryClient",
+    "MemoryStore",
+    "SQLiteClient",
+    "SQLiteStore",
+]
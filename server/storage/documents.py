@@ -0,0 +1,350 @@
+"""
+Firestore-compatible document clients over a pluggable store (storage.memory, storage.sqlite).
+
+The clients, references, queries and batches here implement the Firestore API subset the repos
+use; everything below them goes through the store's small interface:
+    read(path, field_paths)            -> (data or None, update_time)
+    query(collection, filters, limit)  -> [(path, data, update_time)]   (equality filters)
+    children(collection)               -> [document path]
+    commit(ops)                        all-or-nothing; ops are (kind, path, data, merge, last_update_time)
+                                       with kind set / create / update / delete; an update with a
+                                       last_update_time raises FailedPrecondition unless the document
+                                       has that update_time. Returns each write's update_time
+    new_id()                           id for collection.document() without an argument
+and keeps reads / writes / rpcs counters. Writes may hold Increment, ArrayUnion and DELETE_FIELD
+values; apply_set / apply_update resolve them against the current document.
+
+Every RPC of a client waits `latency` seconds (time.sleep or asyncio.sleep) to model the network
+round trip; 0 (the default) outside benchmarks. Async clients make store calls through _call,
+inline by default; a blocking store (storage.sqlite) runs them off the event loop.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any
+
+from google.cloud.firestore_v1 import transforms
+
+
+def _copy(value: Any) -> Any:
+    """Copy of a stored value (maps, arrays and scalars only, so cheaper than deepcopy)."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _apply(existing: Any, value: Any) -> Any:
+    if isinstance(value, transforms.Increment):
+        return (existing or 0) + value.value
+    if isinstance(value, transforms.ArrayUnion):
+        current = list(existing or [])
+        current.extend(_copy(v) for v in value.values if v not in current)
+        return current
+    return _copy(value)
+
+
+def _merge(target: dict[str, Any], data: dict[str, Any]) -> None:
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and value:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = _apply(target.get(key), value)
+
+
+def _set_path(target: dict[str, Any], parts: list[str], value: Any) -> None:
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    if value is transforms.DELETE_FIELD:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = _apply(target.get(parts[-1]), value)
+
+
+def apply_set(existing: dict[str, Any] | None, data: dict[str, Any], merge: bool) -> dict[str, Any]:
+    """New document content for set(data, merge=merge) over existing (mutated when merging)."""
+    target = existing if merge and existing is not None else {}
+    _merge(target, data)
+    return target
+
+
+def apply_update(existing: dict[str, Any], data: dict[str, Any]) -> dict[str, Any]:
+    """New document content for update(data); keys may be dotted field paths."""
+    for field, value in data.items():
+        _set_path(existing, field.split("."), value)
+    return existing
+
+
+def project(data: dict[str, Any], field_paths) -> dict[str, Any]:
+    if field_paths is None:
+        return data
+    wanted = set(field_paths)
+    return {k: v for k, v in data.items() if k in wanted}
+
+
+def parent_path(path: str) -> str:
+    return path.rsplit("/", 1)[0]
+
+
+class LastUpdateOption:
+    """Write precondition from client.write_option(last_update_time=...) (update only)."""
+
+    def __init__(self, last_update_time: datetime):
+        self.last_update_time = last_update_time
+
+
+class WriteResult:
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+
+def _precondition(option: LastUpdateOption | None) -> datetime | None:
+    return option.last_update_time if option is not None else None
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data: dict[str, Any] | None, update_time: datetime | None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self) -> dict[str, Any] | None:
+        # The snapshot already holds its own copy of the stored data
+        return self._data
+
+    def get(self, field: str) -> Any:
+        value = self._data
+        for part in field.split("."):
+            value = value[part]
+        return _copy(value)
+
+
+class _Client:
+    """Shared client plumbing; subclasses choose sync or async reference types."""
+
+    def __init__(self, store, latency: float = 0.0):
+        self.store = store
+        self.latency = latency
+
+    def collection(self, name: str):
+        return self._collection_type(self, name)
+
+    def document(self, path: str):
+        return self._document_type(self, path)
+
+    def batch(self):
+        return self._batch_type(self)
+
+    @staticmethod
+    def write_option(last_update_time: datetime) -> LastUpdateOption:
+        return LastUpdateOption(last_update_time)
+
+    def _snapshot(self, ref, field_paths=None) -> DocumentSnapshot:
+        data, update_time = self.store.read(ref.path, field_paths)
+        return DocumentSnapshot(ref, data, update_time)
+
+    def _snapshots(self, references, field_paths=None) -> list[DocumentSnapshot]:
+        return [self._snapshot(ref, field_paths) for ref in references]
+
+    def _query(self, path: str, filters, limit) -> list[DocumentSnapshot]:
+        return [
+            DocumentSnapshot(self._document_type(self, p), data, update_time)
+            for p, data, update_time in self.store.query(path, filters, limit)
+        ]
+
+
+class DocumentReference:
+    def __init__(self, client: _Client, path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str):
+        return self._client._collection_type(self._client, f"{self.path}/{name}")
+
+    @property
+    def parent(self):
+        return self._client._collection_type(self._client, parent_path(self.path))
+
+    def get(self, field_paths=None, **_):
+        self._client._wait()
+        return self._client._snapshot(self, field_paths)
+
+    def set(self, data: dict[str, Any], merge: bool = False) -> None:
+        self._client._wait()
+        self._client.store.commit([("set", self.path, data, merge, None)])
+
+    def create(self, data: dict[str, Any]) -> None:
+        self._client._wait()
+        self._client.store.commit([("create", self.path, data, False, None)])
+
+    def update(self, data: dict[str, Any], option: LastUpdateOption | None = None) -> None:
+        self._client._wait()
+        self._client.store.commit([("update", self.path, data, False, _precondition(option))])
+
+    def delete(self) -> None:
+        self._client._wait()
+        self._client.store.commit([("delete", self.path, None, False, None)])
+
+
+class Query:
+    def __init__(self, client: _Client, path: str, filters=(), limit: int | None = None):
+        self._client = client
+        self.path = path
+        self._filters = tuple(filters)
+        self._limit = limit
+
+    def where(self, field: str, op: str, value: Any):
+        if op != "==":
+            raise NotImplementedError(f"Unsupported operator {op!r}")
+        return self._client._query_type(self._client, self.path, self._filters + ((field, value),), self._limit)
+
+    def limit(self, count: int):
+        return self._client._query_type(self._client, self.path, self._filters, count)
+
+    def stream(self, **_):
+        self._client._wait()
+        yield from self._client._query(self.path, self._filters, self._limit)
+
+    def get(self, **_) -> list[DocumentSnapshot]:
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client: _Client, path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: str | None = None):
+        if doc_id is None:
+            doc_id = self._client.store.new_id()
+        return self._client._document_type(self._client, f"{self.path}/{doc_id}")
+
+    def list_documents(self):
+        return [self._client._document_type(self._client, p) for p in self._client.store.children(self.path)]
+
+
+class WriteBatch:
+    def __init__(self, client: _Client):
+        self._client = client
+        self._ops: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def set(self, ref, data: dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(("set", ref.path, data, merge, None))
+
+    def create(self, ref, data: dict[str, Any]) -> None:
+        self._ops.append(("create", ref.path, data, False, None))
+
+    def update(self, ref, data: dict[str, Any], option: LastUpdateOption | None = None) -> None:
+        self._ops.append(("update", ref.path, data, False, _precondition(option)))
+
+    def delete(self, ref) -> None:
+        self._ops.append(("delete", ref.path, None, False, None))
+
+    def _apply(self) -> list[WriteResult]:
+        if len(self._ops) > 500:
+            raise ValueError("A write batch holds at most 500 writes")
+        ops, self._ops = self._ops, []
+        return [WriteResult(t) for t in self._client.store.commit(ops)]
+
+    def commit(self) -> list[WriteResult]:
+        self._client._wait()
+        return self._apply()
+
+
+class DocumentClient(_Client):
+    """Blocking client (like google.cloud.firestore.Client)."""
+
+    _document_type = DocumentReference
+    _collection_type = CollectionReference
+    _query_type = Query
+    _batch_type = WriteBatch
+
+    def _wait(self) -> None:
+        self.store.rpcs += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_all(self, references, field_paths=None, **_):
+        self._wait()
+        for ref in references:
+            yield self._snapshot(ref, field_paths)
+
+
+class AsyncDocumentReference(DocumentReference):
+    async def get(self, field_paths=None, **_):
+        await self._client._wait()
+        return await self._client._call(self._client._snapshot, self, field_paths)
+
+    async def set(self, data: dict[str, Any], merge: bool = False) -> None:
+        await self._client._wait()
+        await self._client._call(self._client.store.commit, [("set", self.path, data, merge, None)])
+
+    async def create(self, data: dict[str, Any]) -> None:
+        await self._client._wait()
+        await self._client._call(self._client.store.commit, [("create", self.path, data, False, None)])
+
+    async def update(self, data: dict[str, Any], option: LastUpdateOption | None = None) -> None:
+        await self._client._wait()
+        await self._client._call(
+            self._client.store.commit, [("update", self.path, data, False, _precondition(option))]
+        )
+
+    async def delete(self) -> None:
+        await self._client._wait()
+        await self._client._call(self._client.store.commit, [("delete", self.path, None, False, None)])
+
+
+class AsyncQuery(Query):
+    async def stream(self, **_):
+        await self._client._wait()
+        for snap in await self._client._call(self._client._query, self.path, self._filters, self._limit):
+            yield snap
+
+    async def get(self, **_) -> list[DocumentSnapshot]:
+        return [snap async for snap in self.stream()]
+
+
+class AsyncCollectionReference(AsyncQuery, CollectionReference):
+    pass
+
+
+class AsyncWriteBatch(WriteBatch):
+    async def commit(self) -> list[WriteResult]:
+        await self._client._wait()
+        return await self._client._call(self._apply)
+
+
+class AsyncDocumentClient(_Client):
+    """Async client (like google.cloud.firestore.AsyncClient); share a store with a DocumentClient to share data."""
+
+    _document_type = AsyncDocumentReference
+    _collection_type = AsyncCollectionReference
+    _query_type = AsyncQuery
+    _batch_type = AsyncWriteBatch
+
+    async def _wait(self) -> None:
+        self.store.rpcs += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _call(self, fn, *args):
+        """Run a store call; inline here, overridden by clients over blocking stores."""
+        return fn(*args)
+
+    async def get_all(self, references, field_paths=None, **_):
+        await self._wait()
+        for snap in await self._call(self._snapshots, list(references), field_paths):
+            yield snap
@@ -0,0 +1,21 @@
+"""
+Where transactions live in the document store, shared by the transaction repos and the storage
+backends that index them (storage.sqlite). See transaction_repo for the full layout.
+"""
+from datetime import date, datetime
+
+TRANSACTIONS_COLLECTION = "transactions"
+MONTHS_SUBCOLLECTION = "months"
+# Bucket of transactions without a parseable date
+UNDATED_BUCKET = "undated"
+
+DateLike = str | date | datetime | None
+
+
+def iso_date(value: DateLike) -> str | None:
+    """Normalize a date-like value to 'YYYY-MM-DD' (first 10 chars for strings)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
@@ -0,0 +1,102 @@
+"""
+In-memory document store: dicts in this process, lost on exit. Used by STORAGE_BACKEND=memory
+and by the benchmarks (which add a simulated per-RPC latency). Reads and writes are counted per
+document, as Firestore bills them.
+"""
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+
+from storage.documents import (
+    AsyncDocumentClient,
+    DocumentClient,
+    _copy,
+    apply_set,
+    apply_update,
+    parent_path,
+    project,
+)
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class MemoryStore:
+    def __init__(self):
+        self.docs: dict[str, dict[str, Any]] = {}
+        self._collections: dict[str, set[str]] = {}
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+        self._clock = itertools.count(1)
+        self._ids = itertools.count(1)
+
+    def _tick(self) -> datetime:
+        return _EPOCH + timedelta(microseconds=next(self._clock))
+
+    def new_id(self) -> str:
+        return f"doc{next(self._ids):08d}"
+
+    def read(self, path: str, field_paths=None) -> tuple[dict[str, Any] | None, datetime | None]:
+        self.reads += 1
+        rec = self.docs.get(path)
+        if rec is None:
+            return None, None
+        return _copy(project(rec["data"], field_paths)), rec["update_time"]
+
+    def query(self, collection_path: str, filters, limit: int | None) -> list[tuple]:
+        matches = []
+        for path in self.children(collection_path):
+            rec = self.docs[path]
+            if all(rec["data"].get(field) == value for field, value in filters):
+                self.reads += 1
+                matches.append((path, _copy(rec["data"]), rec["update_time"]))
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    def children(self, collection_path: str) -> list[str]:
+        return sorted(self._collections.get(collection_path, ()))
+
+    def commit(self, ops: list[tuple]) -> list[datetime]:
+        # All or nothing: check every precondition before applying any write
+        for kind, path, _, _, last_update_time in ops:
+            if kind == "create" and path in self.docs:
+                raise AlreadyExists(f"Document already exists: {path}")
+            if kind == "update" and path not in self.docs:
+                raise NotFound(f"No document to update: {path}")
+            if last_update_time is not None and self.docs[path]["update_time"] != last_update_time:
+                raise FailedPrecondition(f"Document changed since {last_update_time}: {path}")
+        update_times = []
+        for kind, path, data, merge, _ in ops:
+            self.writes += 1
+            update_times.append(self._tick())
+            if kind == "delete":
+                self.docs.pop(path, None)
+                self._collections.get(parent_path(path), set()).discard(path)
+                continue
+            rec = self.docs.get(path)
+            if kind == "update":
+                apply_update(rec["data"], data)
+            elif rec is not None and kind == "set" and merge:
+                apply_set(rec["data"], data, merge=True)
+            else:
+                rec = self.docs[path] = {"data": apply_set(None, data, merge=False)}
+                self._collections.setdefault(parent_path(path), set()).add(path)
+            rec["update_time"] = update_times[-1]
+        return update_times
+
+
+class MemoryClient(DocumentClient):
+    """Blocking client over a MemoryStore (a new one unless store= is given)."""
+
+    def __init__(self, store: MemoryStore | None = None, latency: float = 0.0):
+        super().__init__(store if store is not None else MemoryStore(), latency)
+
+
+class AsyncMemoryClient(AsyncDocumentClient):
+    """Async client over a MemoryStore; pass store= to share data with a MemoryClient."""
+
+    def __init__(self, store: MemoryStore | None = None, latency: float = 0.0):
+        super().__init__(store if store is not None else MemoryStore(), latency)
@@ -0,0 +1,272 @@
+"""
+SQLite document store: one local file, for running the API without a cloud project.
+
+Documents live in one table (path, parent collection, JSON data, update time); equality queries
+use json_extract, with an expression index on users' email. Write batches are one SQLite
+transaction, so they are atomic like Firestore's.
+
+Month bucket documents (transactions/{email}/months/{YYYY-MM}, see transaction_repo) are also
+exploded into a `transactions` table indexed by (user, date) and (user, category, date), kept in
+the same transaction as the bucket write. query_transactions serves date-range and category
+reads from it directly instead of reading and filtering whole buckets.
+
+The async client runs store calls on one dedicated thread, so SQLite I/O stays off the event
+loop; they still run one at a time, as the store's single connection requires.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+
+from storage.documents import AsyncDocumentClient, DocumentClient, apply_set, apply_update, parent_path, project
+from storage.layout import MONTHS_SUBCOLLECTION, TRANSACTIONS_COLLECTION, UNDATED_BUCKET, iso_date
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    data TEXT NOT NULL,
+    update_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_parent ON documents (parent, path);
+CREATE INDEX IF NOT EXISTS documents_email ON documents (parent, json_extract(data, '$."email"'));
+CREATE TABLE IF NOT EXISTS transactions (
+    user TEXT NOT NULL,
+    month TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    date TEXT,
+    category TEXT,
+    amount REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user, month, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (user, date);
+CREATE INDEX IF NOT EXISTS transactions_category ON transactions (user, category, date);
+"""
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _decode(obj: dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def _dumps(data: dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode, separators=(",", ":"))
+
+
+def _loads(text: str) -> Any:
+    return json.loads(text, object_hook=_decode)
+
+
+def _json_path(field: str) -> str:
+    return '$."' + field.replace('"', '""') + '"'
+
+
+def _bucket_of(path: str) -> tuple[str, str] | None:
+    """(user key, month) if path is a transaction month bucket document."""
+    parts = path.split("/")
+    if len(parts) == 4 and parts[0] == TRANSACTIONS_COLLECTION and parts[2] == MONTHS_SUBCOLLECTION:
+        return parts[1], parts[3]
+    return None
+
+
+def _amount(t: dict[str, Any]) -> float | None:
+    try:
+        return float(t.get("amount"))
+    except (TypeError, ValueError):
+        return None
+
+
+class SQLiteStore:
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._last_tick = datetime.min.replace(tzinfo=timezone.utc)
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+
+    def _tick(self) -> datetime:
+        now = datetime.now(timezone.utc)
+        self._last_tick = now if now > self._last_tick else self._last_tick + timedelta(microseconds=1)
+        return self._last_tick
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex[:20]
+
+    def read(self, path: str, field_paths=None) -> tuple[dict[str, Any] | None, datetime | None]:
+        with self._lock:
+            row = self._conn.execute("SELECT data, update_time FROM documents WHERE path = ?", (path,)).fetchone()
+            self.reads += 1
+        if row is None:
+            return None, None
+        return project(_loads(row[0]), field_paths), datetime.fromisoformat(row[1])
+
+    def query(self, collection_path: str, filters, limit: int | None) -> list[tuple]:
+        sql = "SELECT path, data, update_time FROM documents WHERE parent = ?"
+        params: list[Any] = [collection_path]
+        for field, value in filters:
+            sql += f" AND json_extract(data, '{_json_path(field)}') = ?"
+            params.append(value)
+        sql += " ORDER BY path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self.reads += len(rows)
+        return [(p, _loads(d), datetime.fromisoformat(u)) for p, d, u in rows]
+
+    def children(self, collection_path: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM documents WHERE parent = ? ORDER BY path", (collection_path,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def commit(self, ops: list[tuple]) -> list[datetime]:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._tick()
+                update_time = now.isoformat()
+                for kind, path, data, merge, last_update_time in ops:
+                    if kind == "delete":
+                        conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+                        self._index_bucket(path, None)
+                        continue
+                    row = conn.execute("SELECT data, update_time FROM documents WHERE path = ?", (path,)).fetchone()
+                    existing = _loads(row[0]) if row else None
+                    if last_update_time is not None and row and datetime.fromisoformat(row[1]) != last_update_time:
+                        raise FailedPrecondition(f"Document changed since {last_update_time}: {path}")
+                    if kind == "create" and existing is not None:
+                        raise AlreadyExists(f"Document already exists: {path}")
+                    if kind == "update":
+                        if existing is None:
+                            raise NotFound(f"No document to update: {path}")
+                        new = apply_update(existing, data)
+                    else:
+                        new = apply_set(existing, data, merge)
+                    conn.execute(
+                        "INSERT INTO documents (path, parent, data, update_time) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (path) DO UPDATE SET data = excluded.data, update_time = excluded.update_time",
+                        (path, parent_path(path), _dumps(new), update_time),
+                    )
+                    self._index_bucket(path, new)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.writes += len(ops)
+        return [now] * len(ops)
+
+    def _index_bucket(self, path: str, data: dict[str, Any] | None) -> None:
+        """Rewrite the transactions rows of a month bucket (no-op for other documents)."""
+        bucket = _bucket_of(path)
+        if bucket is None:
+            return
+        user, month = bucket
+        self._conn.execute("DELETE FROM transactions WHERE user = ? AND month = ?", (user, month))
+        if not data:
+            return
+        self._conn.executemany(
+            "INSERT INTO transactions (user, month, pos, date, category, amount, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (user, month, pos, iso_date(t.get("date") or t.get("transaction_date")),
+                 t.get("category"), _amount(t), _dumps(t))
+                for pos, t in enumerate(data.get("transactions") or [])
+                if isinstance(t, dict)
+            ],
+        )
+
+    def query_transactions(
+        self, user: str, start: str | None = None, end: str | None = None, category: str | None = None
+    ) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+        """
+        Transactions of a user (bucketed layout) dated within [start, end] ('YYYY-MM-DD', inclusive)
+        and/or in one category, oldest month first, plus the labels of the buckets involved.
+        """
+        # Without statistics the planner prefers the primary key (it matches ORDER BY); the
+        # filtered set is small, so read it through the date or category index and sort that
+        index = "transactions_category" if category is not None else (
+            "transactions_date" if start is not None or end is not None else None
+        )
+        sql = "SELECT data FROM transactions" + (f" INDEXED BY {index}" if index else "") + " WHERE user = ?"
+        params: list[Any] = [user]
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND date <= ?"
+            params.append(end)
+        if category is not None:
+            sql += " AND category = ?"
+            params.append(category)
+        sql += " ORDER BY month, pos"
+        bounded = start is not None or end is not None
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            label_rows = self._conn.execute(
+                "SELECT path, json_extract(data, '$.labels') FROM documents WHERE parent = ?",
+                (f"{TRANSACTIONS_COLLECTION}/{user}/{MONTHS_SUBCOLLECTION}",),
+            ).fetchall()
+        labels: dict[str, dict[str, Any]] = {}
+        for path, text in label_rows:
+            month = path.rsplit("/", 1)[-1]
+            if not text or (bounded and (
+                month == UNDATED_BUCKET
+                or (start is not None and month < start[:7])
+                or (end is not None and month > end[:7])
+            )):
+                continue
+            labels.update(_loads(text))
+            self.reads += 1
+        self.reads += 1
+        return [_loads(r[0]) for r in rows], labels
+
+
+class SQLiteClient(DocumentClient):
+    """Blocking client over a SQLiteStore."""
+
+    def __init__(self, store: SQLiteStore, latency: float = 0.0):
+        super().__init__(store, latency)
+
+    def query_transactions(self, user: str, start=None, end=None, category=None):
+        self._wait()
+        return self.store.query_transactions(user, start, end, category)
+
+
+class AsyncSQLiteClient(AsyncDocumentClient):
+    """Async client over a SQLiteStore; share the store with a SQLiteClient."""
+
+    def __init__(self, store: SQLiteStore, latency: float = 0.0):
+        super().__init__(store, latency)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def query_transactions(self, user: str, start=None, end=None, category=None):
+        await self._wait()
+        return await self._call(self.store.query_transactions, user, start, end, category)
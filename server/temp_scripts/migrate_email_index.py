@@ -0,0 +1,21 @@
+"""
+Backfill the users_by_email index (see user_repo) for users created before it existed.
+Run from the server directory:
+
+    python -m temp_scripts.migrate_email_index
+
+Users that already have an entry are skipped, so the command is safe to re-run. Once it has run,
+USER_EMAIL_INDEX_FALLBACK=0 turns off the email query for unknown emails.
+"""
+from database import get_sync_db
+from user_repo import backfill_email_index
+
+
+def main() -> None:
+    db = get_sync_db()
+    indexed, existing = backfill_email_index(db)
+    print(f"{indexed} users indexed, {existing} already indexed")
+
+
+if __name__ == "__main__":
+    main()
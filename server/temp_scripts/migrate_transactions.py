@@ -0,0 +1,52 @@
+"""
+Convert single-document transaction histories to the monthly bucket layout (see transaction_repo).
+Run from the server directory:
+
+    python -m temp_scripts.migrate_transactions                 # every user
+    python -m temp_scripts.migrate_transactions --email a@b.com # one user
+    python -m temp_scripts.migrate_transactions --dry-run       # only list legacy users
+    python -m temp_scripts.migrate_transactions --reindex       # rebuild transaction_id index
+
+Already-migrated users are skipped, so the command is safe to re-run. Use --reindex for users
+migrated before the transaction_id index existed (needed for duplicate detection on ingest).
+"""
+import argparse
+
+from database import get_sync_db
+from models.valid_transaction import transaction_content_hash
+from transaction_repo import TRANSACTIONS_COLLECTION, migrate_user_to_buckets, rebuild_transaction_id_index
+
+
+def _user_ids(db, legacy_only: bool) -> list[str]:
+    """Document ids of users with transactions (only those still on the single-document layout if legacy_only)."""
+    ids = []
+    for ref in db.collection(TRANSACTIONS_COLLECTION).list_documents():
+        doc = ref.get(field_paths=["layout"])
+        if doc.exists and (not legacy_only or (doc.to_dict() or {}).get("layout") != "monthly"):
+            ids.append(ref.id)
+    return ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate transactions to monthly bucket documents.")
+    parser.add_argument("--email", action="append", help="Migrate only this user (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="List users that would be migrated")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild the transaction_id index of migrated users")
+    args = parser.parse_args()
+
+    db = get_sync_db()
+    emails = [e.strip().lower() for e in args.email] if args.email else _user_ids(db, legacy_only=not args.reindex)
+
+    for email in emails:
+        if args.dry_run:
+            print(f"would {'reindex' if args.reindex else 'migrate'} {email}")
+            continue
+        if args.reindex:
+            print(f"{email}: {rebuild_transaction_id_index(db, email)} transaction ids indexed")
+            continue
+        count = migrate_user_to_buckets(db, email, label_key=transaction_content_hash)
+        print(f"{email}: {count} transactions migrated" if count else f"{email}: nothing to migrate")
+
+
+if __name__ == "__main__":
+    main()
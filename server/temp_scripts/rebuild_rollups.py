@@ -0,0 +1,35 @@
+"""
+Backfill the monthly rollups used by /analysis, /generate_budget and /carbon/footprint
+(see rollups.py) from the stored transactions. Run from the server directory:
+
+    python -m temp_scripts.rebuild_rollups                  # every user
+    python -m temp_scripts.rebuild_rollups --email a@b.com  # one user
+
+Legacy single-document users are migrated to the monthly layout, which builds their rollups.
+Until a user's rollups are rebuilt, the endpoints keep computing from transactions. The rebuild
+also writes the user's per-month transaction counts, which GET /events needs to send appends
+as deltas (without them it sends "resync").
+"""
+import argparse
+
+from database import get_sync_db
+from transaction_repo import TRANSACTIONS_COLLECTION, rebuild_rollups_for_user
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild monthly transaction rollups.")
+    parser.add_argument("--email", action="append", help="Rebuild only this user (repeatable)")
+    args = parser.parse_args()
+
+    db = get_sync_db()
+    if args.email:
+        emails = [e.strip().lower() for e in args.email]
+    else:
+        emails = [ref.id for ref in db.collection(TRANSACTIONS_COLLECTION).list_documents()]
+
+    for email in emails:
+        print(f"{email}: {rebuild_rollups_for_user(db, email)} monthly rollups written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Shared fixtures: the app on the in-memory storage backend (storage.memory), fresh per test.
+Run from the server directory: python -m pytest tests
+"""
+import os
+import sys
+import uuid
+
+os.environ["STORAGE_BACKEND"] = "memory"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+from storage import AsyncMemoryClient, AsyncSQLiteClient, MemoryClient, MemoryStore, SQLiteClient, SQLiteStore
+
+
+@pytest.fixture
+def store():
+    """A fresh memory store behind both document clients."""
+    store = MemoryStore()
+    database._firestore_client = MemoryClient(store)
+    database._async_firestore_client = AsyncMemoryClient(store)
+    return store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request, tmp_path):
+    """A sync client on each local backend (the async twin shares its store)."""
+    store = MemoryStore() if request.param == "memory" else SQLiteStore(str(tmp_path / "local.db"))
+    sync_client, async_client = (
+        (MemoryClient(store), AsyncMemoryClient(store))
+        if request.param == "memory"
+        else (SQLiteClient(store), AsyncSQLiteClient(store))
+    )
+    database._firestore_client, database._async_firestore_client = sync_client, async_client
+    return sync_client
+
+
+@pytest.fixture
+def sync_db(store):
+    return database._firestore_client
+
+
+@pytest.fixture
+def client(store):
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def email():
+    """A user email no other test has used (the in-process caches are keyed by user)."""
+    return f"user-{uuid.uuid4().hex[:12]}@example.com"
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from spending_index import SpendingIndex
+from transaction_repo import append_transactions_for_user
+
+
+def _bulk(client, email, rows):
+    body = "\n".join(json.dumps(r) for r in rows)
+    return client.post("/transactions/bulk", params={"user_email": email}, content=body)
+
+
+def _row(i, d, category="Food", amount=-10.0):
+    return {"amount": amount, "category": category, "date": d, "place": "Shop", "time": "12:00:00", "transaction_id": f"t{i}"}
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"period": "month"},
+        {"period": "30d"},
+        {"period": "year"},
+        {"period": "year", "compare": "true"},
+        {"period": "month", "end": "0001-01-15", "compare": "true"},
+        {"start": "9990-01-01", "end": "9999-12-31"},
+    ],
+)
+def test_extreme_dates_never_fail_with_500(client, email, params):
+    rows = [_row(0, "0001-01-01"), _row(1, "9999-12-31"), _row(2, "2026-03-04")]
+    assert _bulk(client, email, rows).json()["added"] == 3
+
+    response = client.get("/analysis", params={"user_email": email, **params})
+    assert response.status_code in (200, 400)
+
+
+def test_explicit_ranges_are_bounded(client, email):
+    _bulk(client, email, [_row(0, "2026-03-04")])
+    response = client.get("/analysis", params={"user_email": email, "start": "0001-01-01", "end": "9999-12-31"})
+    assert response.status_code == 400
+
+
+def test_latest_week_of_year_9999_is_summarized(client, email):
+    _bulk(client, email, [_row(0, "9999-12-31", amount=-7.5)])
+    body = client.get("/analysis", params={"user_email": email, "period": "month"}).json()
+    assert body["total_expenditure"] == 7.5
+    assert sum(body["weekly_expenditure"].values()) == 7.5
+
+
+def test_index_size_follows_entries_not_date_span(sync_db, email):
+    rows = [_row(0, "0001-01-01"), _row(1, "2999-12-31")]
+    rows += [_row(i + 2, "2026-01-01", category=f"c{i}") for i in range(50)]
+    append_transactions_for_user(sync_db, email, rows)
+    from transaction_repo import get_rollups_for_user
+
+    index = SpendingIndex.from_rollups(get_rollups_for_user(sync_db, email))
+    assert index.nbytes < 10_000
+    assert index.total(index.first_date, index.last_date) == 52 * 1000
+    assert index.by_category(index.last_date, index.last_date) == {"Food": 1000}
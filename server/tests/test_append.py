@@ -0,0 +1,42 @@
+from transaction_repo import _user_key, _user_ref, append_transactions_for_user, get_transactions_for_user
+
+ROW = {"amount": -5, "category": "Food", "date": "2026-10-02", "place": "Cafe", "time": "10:00:00", "transaction_id": "t1"}
+
+
+def _user_doc(db, email):
+    return _user_ref(db, _user_key(email)).get().to_dict()
+
+
+def test_repeated_dummy_transaction_is_counted_once(client, sync_db, email):
+    counts = [
+        client.post("/transactions/dummy", params={"user_email": email}, json=ROW).json()["total_transactions"]
+        for _ in range(2)
+    ]
+    assert counts == [1, 1]
+    assert len(get_transactions_for_user(sync_db, email)) == 1
+    assert _user_doc(sync_db, email)["month_counts"] == {"2026-10": 1}
+
+
+def test_rows_without_id_skip_exact_copies(sync_db, email):
+    row = {"amount": -1, "date": "2026-01-01", "category": "Food"}
+    added, duplicates = append_transactions_for_user(sync_db, email, [row, dict(row), dict(row)])
+    assert (len(added), len(duplicates)) == (1, 2)
+
+    added, duplicates = append_transactions_for_user(sync_db, email, [dict(row), {**row, "amount": -2}])
+    assert (len(added), len(duplicates)) == (1, 1)
+    assert _user_doc(sync_db, email)["count"] == 2
+    assert len(get_transactions_for_user(sync_db, email)) == 2
+
+
+def test_same_id_with_other_content_is_kept_without_id_skipping(sync_db, email):
+    append_transactions_for_user(sync_db, email, [ROW], skip_existing_ids=False)
+    added, _ = append_transactions_for_user(sync_db, email, [{**ROW, "amount": -6}], skip_existing_ids=False)
+    assert len(added) == 1
+    assert _user_doc(sync_db, email)["count"] == 2
+
+
+def test_existing_ids_are_skipped(sync_db, email):
+    append_transactions_for_user(sync_db, email, [ROW])
+    added, duplicates = append_transactions_for_user(sync_db, email, [{**ROW, "amount": -6}])
+    assert (added, len(duplicates)) == ([], 1)
+    assert _user_doc(sync_db, email)["count"] == 1
@@ -0,0 +1,53 @@
+import json
+
+from transaction_repo import get_transactions_for_user
+
+ROW = {"amount": -5, "category": "Food", "date": "2026-10-02", "place": "Cafe", "time": "10:00:00", "transaction_id": "t1"}
+
+
+def _bulk(client, email, rows):
+    body = "\n".join(json.dumps(r) for r in rows)
+    return client.post(
+        "/transactions/bulk", params={"user_email": email}, content=body,
+        headers={"content-type": "application/x-ndjson"},
+    ).json()
+
+
+def test_bad_dates_and_times_are_row_errors(client, sync_db, email):
+    result = _bulk(client, email, [
+        ROW,
+        {**ROW, "transaction_id": "t2", "date": "2024-13-45"},
+        {**ROW, "transaction_id": "t3", "time": "25:61:00"},
+        {**ROW, "transaction_id": "t4", "date": "2024-1-5"},
+        {**ROW, "transaction_id": "t5", "date": "0001-01-01", "time": "23:59:59"},
+    ])
+    assert (result["rows"], result["added"], result["invalid"]) == (5, 2, 3)
+    errors = {e["row"]: e["error"] for e in result["errors"]}
+    assert sorted(errors) == [2, 3, 4]
+    assert "date" in errors[2] and "time" in errors[3] and "date" in errors[4]
+
+    assert sorted(t["transaction_id"] for t in get_transactions_for_user(sync_db, email)) == ["t1", "t5"]
+    assert client.get("/transactions_valid", params={"user_email": email}).status_code == 200
+
+
+def test_dummy_rejects_bad_date(client, email):
+    response = client.post("/transactions/dummy", params={"user_email": email}, json={**ROW, "date": "02/10/2026"})
+    assert response.status_code == 422
+
+
+def test_csv_quoted_fields_may_span_lines(client, sync_db, email):
+    body = (
+        "amount,category,date,place,time,transaction_id\n"
+        '-5,Food,2026-10-02,"Cafe\nCorner, 2nd floor",10:00:00,c1\n'
+        "\n"
+        "-6,Food,2026-13-01,Bakery,10:00:00,c2\n"
+        '-7,Fun,2026-10-03,"Say ""hi""",11:00:00,c3\n'
+    )
+    result = client.post(
+        "/transactions/bulk", params={"user_email": email}, content=body, headers={"content-type": "text/csv"}
+    ).json()
+    assert (result["rows"], result["added"], result["invalid"]) == (3, 2, 1)
+    assert [e["row"] for e in result["errors"]] == [5]
+
+    places = {t["transaction_id"]: t["place"] for t in get_transactions_for_user(sync_db, email)}
+    assert places == {"c1": "Cafe\nCorner, 2nd floor", "c3": 'Say "hi"'}
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from change_feed import ChangeFeed
+
+
+def test_failed_start_is_raised_to_every_waiter():
+    async def scenario():
+        feed = ChangeFeed()
+        release = asyncio.Event()
+
+        async def failing_refresh(key, state):
+            await release.wait()
+            raise RuntimeError("store unavailable")
+
+        async def refresh(key, state):
+            return {"count": 0}, []
+
+        first = asyncio.create_task(feed.subscribe("u", failing_refresh))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(feed.subscribe("u", failing_refresh)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, *waiters, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert feed.stats()["connections"] == 0 and feed.stats()["users"] == 0
+
+        # The next subscriber starts a fresh topic
+        subscription = await feed.subscribe("u", refresh)
+        assert subscription.topic.state == {"count": 0}
+        feed.unsubscribe(subscription)
+
+    asyncio.run(scenario())
+
+
+def test_waiters_retry_when_the_starter_is_cancelled():
+    async def scenario():
+        feed = ChangeFeed()
+        calls = 0
+
+        async def refresh(key, state):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await asyncio.sleep(10)
+            return {"count": 1}, []
+
+        first = asyncio.create_task(feed.subscribe("u", refresh))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(feed.subscribe("u", refresh))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        subscription = await waiter
+        assert subscription.topic.state == {"count": 1}
+        assert feed.stats()["connections"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import pytest
+
+from models.valid_transaction import extract_dynamic_features, extract_dynamic_features_batch
+
+ROW = {"amount": -12.5, "category": "Food", "place": "Corner Market", "date": "2026-10-02", "time": "18:30:00"}
+
+
+def _per_row(row):
+    try:
+        return extract_dynamic_features(row)[0]
+    except ValueError:
+        return None
+
+
+def _batch(row, columns):
+    try:
+        return extract_dynamic_features_batch([row], columns)[0].iloc[0].to_dict()
+    except ValueError:
+        return None
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {},
+        {"date": "2026-1-5"},
+        {"date": "2026-01"},
+        {"date": "NaT"},
+        {"date": "0000-01-01"},
+        {"date": "2026-02-30"},
+        {"time": "99:00"},
+        {"time": "7:05:09"},
+        {"time": "23:59:60"},
+    ],
+)
+def test_batch_features_accept_and_reject_like_per_row(change):
+    row = {**ROW, **change}
+    expected = _per_row(row)
+    columns = list(extract_dynamic_features(ROW)[0])
+    assert _batch(row, columns) == (None if expected is None else pytest.approx(expected))
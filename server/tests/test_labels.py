@@ -0,0 +1,42 @@
+import database
+from models.model_registry import registry
+from models.valid_transaction import transaction_content_hash
+from transaction_labels import rescore_all_users, rescore_status
+from transaction_repo import append_transactions_for_user, get_transactions_and_labels, month_key
+from transaction_repo_async import save_transaction_labels
+
+ROWS = [
+    {"amount": -5.0, "category": "Food", "date": "2026-10-02", "place": "Cafe", "time": "10:00:00", "transaction_id": "a"},
+    {"amount": -40.0, "category": "Shopping", "date": "2026-10-03", "place": "Mall", "time": "18:30:00", "transaction_id": "b"},
+]
+
+
+def _plant_old_labels(client, email):
+    """Store labels from another model version for every row."""
+    old = {month_key(t): {} for t in ROWS}
+    for t in ROWS:
+        old[month_key(t)][transaction_content_hash(t)] = {"label": "Bogus", "confidence": 1.0, "model_version": "old"}
+    client.portal.call(save_transaction_labels, database._async_firestore_client, email, old)
+
+
+def test_labels_from_another_model_version_are_not_served(client, sync_db, email):
+    append_transactions_for_user(sync_db, email, ROWS)
+    _plant_old_labels(client, email)
+
+    body = client.get("/transactions_valid", params={"user_email": email}).json()
+    assert {t["category"][0] for t in body} <= {"Important", "Discretionary", "Income & Transfers"}
+    _, labels = get_transactions_and_labels(sync_db, email)
+    assert {entry["model_version"] for entry in labels.values()} == {registry.get().version}
+
+
+def test_rescore_all_users_replaces_old_labels(client, sync_db, email):
+    append_transactions_for_user(sync_db, email, ROWS)
+    _plant_old_labels(client, email)
+    version = registry.get().version
+
+    client.portal.call(rescore_all_users, database._async_firestore_client, version)
+
+    _, labels = get_transactions_and_labels(sync_db, email)
+    assert {entry["model_version"] for entry in labels.values()} == {version}
+    status = rescore_status()
+    assert status["state"] == "done" and status["labels_rescored"] >= len(ROWS)
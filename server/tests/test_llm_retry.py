@@ -0,0 +1,19 @@
+import httpx
+import pytest
+
+from routes.LLMcall import MAX_RETRY_AFTER_SECONDS, RETRY_BACKOFF_SECONDS, _retry_delay
+
+
+def _response(retry_after):
+    return httpx.Response(429, headers={"Retry-After": retry_after})
+
+
+def test_retry_after_is_honoured_up_to_the_cap():
+    assert _retry_delay(0, _response("2")) == 2.0
+    assert _retry_delay(0, _response("3600")) == MAX_RETRY_AFTER_SECONDS
+
+
+@pytest.mark.parametrize("value", ["-5", "soon", "nan", "inf", "Wed, 21 Oct 2015 07:28:00 GMT"])
+def test_unusable_retry_after_falls_back_to_backoff(value):
+    delay = _retry_delay(1, _response(value))
+    assert 2 * RETRY_BACKOFF_SECONDS <= delay <= 4 * RETRY_BACKOFF_SECONDS
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+
+import transaction_repo
+from transaction_repo import (
+    MIGRATION_CLAIM_FIELD,
+    _migrate_legacy,
+    _user_key,
+    _user_ref,
+    append_transactions_for_user,
+    get_transactions_for_user,
+    migrate_user_to_buckets,
+)
+
+LEGACY_ROWS = [
+    {"amount": -5, "category": "Food", "date": "2026-09-02", "time": "10:00:00", "transaction_id": "a"},
+    {"amount": -7, "category": "Fun", "date": "2026-10-03", "time": "11:00:00", "transaction_id": "b"},
+]
+NEW_ROW = {"amount": -9, "category": "Food", "date": "2026-10-04", "time": "12:00:00", "transaction_id": "c"}
+
+
+def _legacy_user(db, email, **fields):
+    ref = _user_ref(db, _user_key(email))
+    ref.set({"transactions": [dict(t) for t in LEGACY_ROWS], **fields})
+    return ref
+
+
+def test_stale_migration_cannot_overwrite_appended_rows(db, email):
+    ref = _legacy_user(db, email)
+    stale = ref.get()  # a second worker read the legacy document before the first migrated
+
+    assert migrate_user_to_buckets(db, email) == 2
+    append_transactions_for_user(db, email, [NEW_ROW])
+    with pytest.raises(FailedPrecondition):
+        _migrate_legacy(db, _user_key(email), stale, "late", None)
+
+    assert sorted(t["transaction_id"] for t in get_transactions_for_user(db, email)) == ["a", "b", "c"]
+    assert ref.get().to_dict()["count"] == 3
+
+
+def test_waits_for_a_migration_in_progress(db, email, monkeypatch):
+    monkeypatch.setattr(transaction_repo, "_MIGRATION_POLL_SECONDS", 0.01)
+    ref = _legacy_user(db, email, **{MIGRATION_CLAIM_FIELD: {"token": "other", "at": time.time()}})
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(migrate_user_to_buckets(db, email)))
+    waiter.start()
+    time.sleep(0.05)
+    assert results == []
+
+    # The claimant finishes; the waiter sees the switched document and does nothing
+    _migrate_legacy(db, _user_key(email), ref.get(), "other", None)
+    waiter.join(5)
+    assert results == [0]
+    data = ref.get().to_dict()
+    assert data["count"] == 2 and MIGRATION_CLAIM_FIELD not in data
+
+
+def test_expired_claim_is_taken_over(db, email):
+    ref = _legacy_user(db, email, **{MIGRATION_CLAIM_FIELD: {"token": "dead", "at": 0}})
+    assert migrate_user_to_buckets(db, email) == 2
+    assert ref.get().to_dict()["layout"] == "monthly"
+
+
+def test_large_migration_spans_batches(db, email):
+    rows = [{"amount": -1, "date": "2026-10-01", "transaction_id": f"t{i}"} for i in range(600)]
+    ref = _user_ref(db, _user_key(email))
+    ref.set({"transactions": rows})
+    assert migrate_user_to_buckets(db, email) == 600
+    assert len(get_transactions_for_user(db, email)) == 600
+    assert MIGRATION_CLAIM_FIELD not in ref.get().to_dict()
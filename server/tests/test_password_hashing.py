@@ -0,0 +1,16 @@
+import asyncio
+
+import password_hashing
+
+
+def test_pool_spawns_workers_and_round_trips():
+    async def round_trip():
+        hashed = await password_hashing.hash_password_async("secret")
+        return await password_hashing.verify_and_update_async("secret", hashed)
+
+    try:
+        assert asyncio.run(round_trip()) == (True, None)
+        if password_hashing.PASSWORD_HASH_WORKERS > 0:
+            assert password_hashing._get_pool()._mp_context.get_start_method() == "spawn"
+    finally:
+        password_hashing.shutdown_pool()
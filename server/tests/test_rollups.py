@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from routes.analysis import summarize_latest_month, summarize_period, summarize_rollup
+from rollups import build_rollups, rollup_document
+from spending_index import SpendingIndex
+from transaction_frame import TransactionFrame
+from transaction_repo import append_transactions_for_user, get_rollups_for_user, get_transactions_for_user, month_key
+
+ROWS = [
+    {"amount": -5.0, "category": "Food", "date": "2026-10-02", "place": "Cafe", "time": "10:00:00", "transaction_id": "a"},
+    {"amount": -12.5, "category": "Transport", "date": "2026-10-03", "place": "Bus", "time": "08:15:00", "transaction_id": "b"},
+    {"amount": 100.0, "category": "Income", "date": "2026-09-30", "place": "Employer", "time": "09:00:00", "transaction_id": "c"},
+]
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            out.update(_flatten(v, f"{prefix}{k}."))
+        return out
+    return {prefix: value}
+
+
+def _assert_rollups_match_rows(db, email):
+    stored = get_rollups_for_user(db, email)
+    rebuilt = {m: rollup_document(r) for m, r in build_rollups(get_transactions_for_user(db, email), month_key).items()}
+    assert stored.keys() == rebuilt.keys()
+    for month in rebuilt:
+        assert _flatten(stored[month]) == pytest.approx(_flatten(rebuilt[month]))
+
+
+def test_rollups_match_rows_after_repeated_appends(db, email):
+    append_transactions_for_user(db, email, ROWS)
+    append_transactions_for_user(db, email, ROWS[:1], skip_existing_ids=False)
+    append_transactions_for_user(db, email, [{k: v for k, v in ROWS[1].items() if k != "transaction_id"}] * 2)
+    assert len(get_transactions_for_user(db, email)) == 4
+    _assert_rollups_match_rows(db, email)
+
+
+def test_spend_endpoints_count_a_repeated_row_once(client, email):
+    params = {"user_email": email}
+    signup = {"email": email, "password": "secret123", "name": "Test", "phone_number": "5551234567"}
+    assert client.post("/auth/signup", json=signup).status_code == 200
+    for _ in range(2):
+        client.post("/transactions/dummy", params=params, json=ROWS[0])
+
+    assert client.get("/analysis", params=params).json()["spending"] == {"Food": 5.0}
+    assert client.get("/generate_budget", params=params).json()["expenses"] == pytest.approx(-5.0)
+    assert client.get("/carbon/footprint", params=params).json()["transaction_count_used"] == 1
+
+
+def test_rollup_and_frame_paths_round_the_same():
+    # Amounts where round(x, 2) and np.rint(x * 100) disagree, plus sums that drift as floats
+    amounts = [-1.115, -0.285, -2.675, -1.005, -0.1, -0.2, -0.7, -33.335]
+    rows = [
+        {"amount": a, "category": "Food" if i % 2 else "Fun", "date": f"2026-10-{i + 1:02d}"}
+        for i, a in enumerate(amounts)
+    ]
+    frame = TransactionFrame.from_transactions(rows)
+    rollups = {m: rollup_document(r) for m, r in build_rollups(rows, month_key).items()}
+
+    from_rollup = summarize_rollup(rollups["2026-10"])
+    assert from_rollup == summarize_latest_month(frame)
+
+    month = summarize_period(SpendingIndex.from_frame(frame), date(2026, 10, 1), date(2026, 10, 31))
+    assert month == summarize_period(SpendingIndex.from_rollups(rollups), date(2026, 10, 1), date(2026, 10, 31))
+    assert month["spending"] == from_rollup["spending"]
+    assert month["total_expenditure"] == from_rollup["monthly_expenditure"]
@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+import database
+import transaction_repo_async
+from snapshot_cache import TransactionSnapshotCache
+from transaction_repo import append_transactions_for_user
+
+ROWS = [{"amount": -5, "category": "Food", "date": "2026-10-02"}]
+
+
+def test_hits_share_rows_without_copying():
+    cache = TransactionSnapshotCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.put("a", 1, ROWS, {})
+    first, _ = cache.get("a", 1)
+    second, _ = cache.get("a", 1)
+    assert first is not second
+    assert first[0] is second[0] is ROWS[0]
+
+
+def test_put_frame_evicts_over_budget():
+    cache = TransactionSnapshotCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.put("a", 1, ROWS, {})
+    cache.put("b", 1, ROWS, {})
+    # Fits on its own, but not next to "a"
+    frame = SimpleNamespace(nbytes=cache.max_bytes - cache.stats()["bytes"] + 1)
+    cache.put_frame("b", 1, frame)
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert stats["evictions"] >= 1
+    assert cache.get("a", 1) is None
+
+
+def test_load_locks_are_dropped_after_loads(client, sync_db, email):
+    append_transactions_for_user(sync_db, email, ROWS)
+
+    async def load_concurrently(db):
+        return await asyncio.gather(*(transaction_repo_async.get_transactions_for_user(db, email) for _ in range(5)))
+
+    results = client.portal.call(load_concurrently, database._async_firestore_client)
+    assert all(len(r) == 1 for r in results)
+    assert len(transaction_repo_async._load_locks) == 0
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+from storage import AsyncSQLiteClient, SQLiteStore
+
+
+class _RecordingStore(SQLiteStore):
+    """Records the thread of every document read."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.read_threads: list[str] = []
+
+    def read(self, path, field_paths=None):
+        self.read_threads.append(threading.current_thread().name)
+        return super().read(path, field_paths)
+
+
+def test_async_client_reads_off_the_event_loop(tmp_path):
+    db = AsyncSQLiteClient(_RecordingStore(str(tmp_path / "db.sqlite")))
+
+    async def write_and_read():
+        ref = db.collection("users").document("a")
+        await ref.set({"name": "A"})
+        snap = await ref.get()
+        docs = [s async for s in db.get_all([ref])]
+        return snap.to_dict(), docs[0].to_dict(), threading.current_thread().name
+
+    doc, same, loop_thread = asyncio.run(write_and_read())
+    assert doc == same == {"name": "A"}
+    assert db.store.read_threads and loop_thread not in db.store.read_threads
@@ -0,0 +1,170 @@
+"""
+Columnar view of a user's transactions for the aggregate endpoints (analysis, budget, carbon).
+
+A TransactionFrame is built once per transaction snapshot (transaction_repo_async caches it next
+to the snapshot) and holds, sorted by date (stable; undated rows first):
+    days            int32 days since 1970-01-01 (UNDATED when missing or unparseable)
+    amounts         float64 (NaN when not a number, so it is neither income nor spend)
+    category_codes  int32 index into categories (raw values; MISSING when the key is absent)
+    place_codes     int32 index into places
+Slices share the arrays: last(n) and between(start, end) are views found with a binary search,
+so "last N by date" and date windows cost O(log n) instead of a sort of the whole list.
+"""
+from datetime import date, datetime
+from typing import Any, Callable
+
+import numpy as np
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+UNDATED = np.iinfo(np.int32).min
+
+
+class _Missing:
+    """Category / place of a transaction without that key (falsy, like None)."""
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def _parse_day(value: Any) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    if not value:
+        return UNDATED
+    text = str(value)[:10]
+    try:
+        return date.fromisoformat(text).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return UNDATED
+
+
+def day_number(d: date) -> int:
+    """Day number (as stored in TransactionFrame.days) of a date."""
+    return d.toordinal() - _EPOCH_ORDINAL
+
+
+def to_date(day: int) -> date:
+    return date.fromordinal(int(day) + _EPOCH_ORDINAL)
+
+
+class _Interner:
+    def __init__(self):
+        self.values: list[Any] = []
+        self._codes: dict[Any, int] = {}
+
+    def code(self, value: Any) -> int:
+        try:
+            code = self._codes.get(value)
+        except TypeError:  # unhashable (e.g. a list): keyed by its repr
+            return self.code(repr(value))
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class TransactionFrame:
+    __slots__ = ("days", "amounts", "category_codes", "place_codes", "categories", "places", "_rows", "_order")
+
+    def __init__(self, days, amounts, category_codes, place_codes, categories, places, rows, order):
+        self.days = days
+        self.amounts = amounts
+        self.category_codes = category_codes
+        self.place_codes = place_codes
+        self.categories = categories
+        self.places = places
+        self._rows = rows
+        self._order = order
+
+    @classmethod
+    def from_transactions(cls, transactions: list[dict[str, Any]]) -> "TransactionFrame":
+        n = len(transactions)
+        days = np.empty(n, dtype=np.int32)
+        amounts = np.empty(n, dtype=np.float64)
+        category_codes = np.empty(n, dtype=np.int32)
+        place_codes = np.empty(n, dtype=np.int32)
+        categories, places = _Interner(), _Interner()
+        parsed: dict[Any, int] = {}
+        for i, t in enumerate(transactions):
+            raw_date = t.get("date") or t.get("transaction_date")
+            day = parsed.get(raw_date) if isinstance(raw_date, str) else None
+            if day is None:
+                day = _parse_day(raw_date)
+                if isinstance(raw_date, str):
+                    parsed[raw_date] = day
+            days[i] = day
+            amount = t.get("amount")
+            amounts[i] = amount if isinstance(amount, (int, float)) else np.nan
+            category_codes[i] = categories.code(t.get("category", MISSING))
+            place_codes[i] = places.code(t.get("place", MISSING))
+
+        order = np.argsort(days, kind="stable")
+        return cls(
+            days[order], amounts[order], category_codes[order], place_codes[order],
+            categories.values, places.values, transactions, order,
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def _slice(self, start: int, stop: int) -> "TransactionFrame":
+        return TransactionFrame(
+            self.days[start:stop], self.amounts[start:stop], self.category_codes[start:stop],
+            self.place_codes[start:stop], self.categories, self.places, self._rows, self._order[start:stop],
+        )
+
+    def last(self, n: int) -> "TransactionFrame":
+        """The last n transactions by date (all of them if n <= 0)."""
+        if n <= 0 or n >= len(self):
+            return self
+        return self._slice(len(self) - n, len(self))
+
+    def between(self, start: date | None = None, end: date | None = None) -> "TransactionFrame":
+        """Transactions dated within [start, end] (inclusive; undated rows are left out)."""
+        lo = UNDATED + 1 if start is None else day_number(start)
+        hi = np.iinfo(np.int32).max if end is None else day_number(end)
+        return self._slice(
+            int(np.searchsorted(self.days, lo, side="left")), int(np.searchsorted(self.days, hi, side="right"))
+        )
+
+    def latest_date(self) -> date | None:
+        if not len(self) or self.days[-1] == UNDATED:
+            return None
+        return to_date(self.days[-1])
+
+    def grouped_categories(self, label: Callable[[Any], Any]) -> tuple[list[Any], np.ndarray]:
+        """
+        (names, codes): the category of each row as an index into names, where names are
+        label(raw category) with duplicates merged (raw values are MISSING for absent keys).
+        """
+        names: list[Any] = []
+        index: dict[Any, int] = {}
+        mapping = np.empty(len(self.categories), dtype=np.int32)
+        for code, raw in enumerate(self.categories):
+            name = label(raw)
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+            mapping[code] = index[name]
+        return names, mapping[self.category_codes]
+
+    def rows(self, mask: np.ndarray | None = None) -> list[dict[str, Any]]:
+        """The original transaction dicts in frame order (only where mask is set). Do not mutate them."""
+        order = self._order if mask is None else self._order[mask]
+        return [self._rows[i] for i in order.tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.days, self.amounts, self.category_codes, self.place_codes, self._order))
@@ -0,0 +1,165 @@
+"""
+Cached Important/Discretionary classification for user transactions.
+Labels are stored next to the transactions (see transaction_repo) keyed by a hash of the
+fields the model reads, so only new or changed transactions are scored on read.
+Labels written by another model version are never served: they are rescored on read like
+missing ones, and a model swap (POST /models/reload) queues rescore_all_users so most users'
+labels are current before their next read.
+Model loading and scoring run in the thread pool so they don't block the event loop.
+
+Config (env): LABEL_RESCORE_CONCURRENCY (users rescored at a time after a swap, default 4).
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from google.cloud.firestore import AsyncClient
+
+from database import get_sync_db
+from models.model_registry import ModelBundle, registry
+from models.valid_transaction import transaction_content_hash, validate_transactions_batch
+from transaction_repo import TRANSACTIONS_COLLECTION, month_key
+from transaction_repo_async import get_transactions_and_labels, save_transaction_labels
+
+logger = logging.getLogger(__name__)
+
+LABEL_RESCORE_CONCURRENCY = int(os.getenv("LABEL_RESCORE_CONCURRENCY", "4"))
+
+# Progress of the rescore queued by the latest model swap (GET /models/status)
+_rescore_status: dict[str, Any] = {"state": "idle"}
+
+LabelsByMonth = dict[str, dict[str, dict[str, Any]]]
+
+
+def _label_entry(label: str, confidence, model_version: str) -> dict[str, Any]:
+    return {"label": label, "confidence": float(confidence), "model_version": model_version}
+
+
+def _classify(
+    transactions: list[dict[str, Any]],
+    labels: dict[str, dict[str, Any]],
+    bundle: ModelBundle,
+    prune: bool = True,
+) -> tuple[list[tuple[str, float]], LabelsByMonth, bool]:
+    """
+    Labels for each transaction plus what to persist: (results, labels_by_month, replace).
+    Stored labels from another model version are rescored like missing ones.
+    With replace, labels_by_month is the full set to keep (some stored labels are orphaned).
+    Without prune (transactions is only part of the history), orphans are never looked for.
+    """
+    hashes = [transaction_content_hash(t) for t in transactions]
+    results: list[tuple[str, float] | None] = [None] * len(transactions)
+    missing: list[int] = []
+    for i, h in enumerate(hashes):
+        entry = labels.get(h)
+        if entry is None or entry.get("model_version") != bundle.version:
+            missing.append(i)
+            continue
+        results[i] = (entry["label"], entry["confidence"])
+
+    new_labels: LabelsByMonth = defaultdict(dict)
+    if missing:
+        scored = validate_transactions_batch([transactions[i] for i in missing], bundle)
+        for i, (label, confidence) in zip(missing, scored):
+            results[i] = (label, confidence)
+            new_labels[month_key(transactions[i])][hashes[i]] = _label_entry(label, confidence, bundle.version)
+
+    orphaned = prune and labels.keys() - set(hashes)
+    if orphaned:
+        kept: LabelsByMonth = defaultdict(dict)
+        for t, h in zip(transactions, hashes):
+            if h in labels:
+                kept[month_key(t)][h] = labels[h]
+        for month, entries in new_labels.items():
+            kept[month].update(entries)
+        return results, kept, True
+    return results, new_labels, False
+
+
+async def classify_transactions(
+    db: AsyncClient,
+    user_email: str,
+    transactions: list[dict[str, Any]],
+    labels: dict[str, dict[str, Any]],
+    prune: bool = True,
+) -> list[tuple[str, float]]:
+    """
+    Return (label, confidence) for each transaction in order, all from the current model.
+    Cache misses and labels from other model versions are scored in one batch and persisted.
+    Pass prune=False when transactions is a subset of the user's history (a filtered page), so
+    the stored labels of the other transactions are not dropped as orphaned.
+    """
+    bundle = await run_in_threadpool(registry.get)
+    results, to_save, replace = await run_in_threadpool(_classify, transactions, labels, bundle, prune)
+    if replace or to_save:
+        await save_transaction_labels(db, user_email, to_save, replace=replace)
+    return results
+
+
+def _rescore(
+    transactions: list[dict[str, Any]], labels: dict[str, dict[str, Any]], bundle: ModelBundle
+) -> LabelsByMonth:
+    stale: dict[str, dict[str, Any]] = {}
+    for t in transactions:
+        h = transaction_content_hash(t)
+        entry = labels.get(h)
+        if entry is not None and entry.get("model_version") != bundle.version and h not in stale:
+            stale[h] = t
+    rescored: LabelsByMonth = defaultdict(dict)
+    if stale:
+        scored = validate_transactions_batch(list(stale.values()), bundle)
+        for (h, t), (label, confidence) in zip(stale.items(), scored):
+            rescored[month_key(t)][h] = _label_entry(label, confidence, bundle.version)
+    return rescored
+
+
+async def rescore_stale_labels(db: AsyncClient, user_email: str) -> int:
+    """Re-run the current model over transactions labelled by another model version. Returns how many were rescored."""
+    bundle = await run_in_threadpool(registry.get)
+    transactions, labels = await get_transactions_and_labels(db, user_email)
+    rescored = await run_in_threadpool(_rescore, transactions, labels, bundle)
+    if rescored:
+        await save_transaction_labels(db, user_email, rescored)
+    return sum(len(entries) for entries in rescored.values())
+
+
+def _user_emails() -> list[str]:
+    return [ref.id for ref in get_sync_db().collection(TRANSACTIONS_COLLECTION).list_documents()]
+
+
+async def rescore_all_users(db: AsyncClient, version: str) -> None:
+    """
+    Rescore every user's labels from other model versions after a swap to `version` (run as a
+    background task). Stops early if another version is swapped in meanwhile.
+    """
+    emails = await asyncio.to_thread(_user_emails)
+    _rescore_status.clear()
+    _rescore_status.update(
+        state="running", version=version, users=len(emails), users_done=0, labels_rescored=0,
+        failed=0, started_at=time.time(),
+    )
+    semaphore = asyncio.Semaphore(LABEL_RESCORE_CONCURRENCY)
+
+    async def rescore(email: str) -> None:
+        async with semaphore:
+            if registry.stats().get("version") != version:
+                return
+            try:
+                _rescore_status["labels_rescored"] += await rescore_stale_labels(db, email)
+            except Exception:
+                _rescore_status["failed"] += 1
+                logger.exception("Label rescore failed for %s", email)
+            _rescore_status["users_done"] += 1
+
+    await asyncio.gather(*(rescore(email) for email in emails))
+    if _rescore_status.get("version") == version:
+        superseded = registry.stats().get("version") != version
+        _rescore_status.update(state="superseded" if superseded else "done", finished_at=time.time())
+
+
+def rescore_status() -> dict[str, Any]:
+    return dict(_rescore_status)
@@ -0,0 +1,189 @@
+"""
+Filtering, keyset pagination, projection and streaming for the transaction list endpoints
+(GET /transactions and GET /transactions_valid).
+
+Pages are ordered by (date, time of day, transaction_id); the cursor is that key of the last
+row served, base64url-encoded, so pages stay stable while new transactions are appended. Date
+filters are passed down to the repo (only the months involved are read); amount and category
+filters run here. Large results are written as a chunked JSON array or NDJSON, serializing
+STREAM_CHUNK_ROWS rows at a time instead of building the whole body first.
+"""
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, Literal
+
+import orjson
+
+from models.valid_transaction import transaction_content_hash
+from transaction_repo import _iso_date
+
+MAX_PAGE_SIZE = 1000
+# Unpaginated results longer than this are streamed
+STREAM_MIN_ROWS = 1000
+STREAM_CHUNK_ROWS = 500
+
+SortKey = tuple[str, int, str]
+
+
+@dataclass
+class TransactionQuery:
+    since: date | None = None
+    until: date | None = None
+    category: str | None = None
+    min_amount: float | None = None
+    max_amount: float | None = None
+    fields: list[str] | None = None
+    limit: int | None = None
+    cursor: str | None = None
+    order: Literal["asc", "desc"] | None = None
+    format: Literal["json", "ndjson"] = "json"
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.cursor is not None
+
+    @property
+    def partial(self) -> bool:
+        """True if the result may leave out some of the user's transactions."""
+        return self.paginated or any(
+            v is not None for v in (self.since, self.until, self.category, self.min_amount, self.max_amount)
+        )
+
+
+def _seconds(time_str: Any) -> int:
+    """Seconds since midnight for 'H:MM[:SS]' (-1 if missing or malformed, so those sort first)."""
+    try:
+        parts = [int(p) for p in str(time_str).split(":")]
+    except ValueError:
+        return -1
+    if not 2 <= len(parts) <= 3:
+        return -1
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) == 3 else 0)
+
+
+def sort_key(t: dict[str, Any]) -> SortKey:
+    """(date, seconds, id) ordering of a transaction; content hash when it has no transaction_id."""
+    tid = t.get("transaction_id")
+    return (
+        _iso_date(t.get("date") or t.get("transaction_date")) or "",
+        _seconds(t.get("time")),
+        str(tid) if tid is not None else transaction_content_hash(t),
+    )
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    """Inverse of encode_cursor. Raises ValueError for anything it did not produce."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if (
+        not isinstance(raw, list) or len(raw) != 3
+        or not isinstance(raw[0], str) or not isinstance(raw[1], int) or not isinstance(raw[2], str)
+    ):
+        raise ValueError("Invalid cursor")
+    return raw[0], raw[1], raw[2]
+
+
+def _amount(t: dict[str, Any]) -> float | None:
+    try:
+        return float(t.get("amount"))
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_transactions(
+    transactions: list[dict[str, Any]],
+    category: str | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+) -> list[dict[str, Any]]:
+    """Transactions in the category and with min_amount <= amount <= max_amount (signed; spend is negative)."""
+    if category is None and min_amount is None and max_amount is None:
+        return transactions
+    out = []
+    for t in transactions:
+        if category is not None and t.get("category") != category:
+            continue
+        if min_amount is not None or max_amount is not None:
+            amount = _amount(t)
+            if amount is None or (min_amount is not None and amount < min_amount) or (
+                max_amount is not None and amount > max_amount
+            ):
+                continue
+        out.append(t)
+    return out
+
+
+def order_transactions(transactions: list[dict[str, Any]], descending: bool = False) -> list[dict[str, Any]]:
+    return sorted(transactions, key=sort_key, reverse=descending)
+
+
+def paginate(
+    transactions: list[dict[str, Any]], limit: int | None, cursor: str | None, descending: bool = False
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    The page after `cursor` (of at most `limit` rows) in sort_key order, and the cursor of the
+    next page (None on the last page). Raises ValueError for a malformed cursor.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    keyed = sorted(((sort_key(t), t) for t in transactions), key=lambda kt: kt[0])
+    keys = [k for k, _ in keyed]
+    if descending:
+        end = bisect_left(keys, after) if after is not None else len(keyed)
+        start = max(0, end - limit) if limit is not None else 0
+        page = keyed[start:end][::-1]
+        more = start > 0
+    else:
+        start = bisect_right(keys, after) if after is not None else 0
+        end = min(len(keyed), start + limit) if limit is not None else len(keyed)
+        page = keyed[start:end]
+        more = end < len(keyed)
+    next_cursor = encode_cursor(page[-1][0]) if page and more else None
+    return [t for _, t in page], next_cursor
+
+
+def project(transactions: list[dict[str, Any]], fields: list[str] | None) -> list[dict[str, Any]]:
+    """Only the given fields of each transaction (all of them if fields is None)."""
+    if not fields:
+        return transactions
+    return [{f: t[f] for f in fields if f in t} for t in transactions]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value: Any) -> bytes:
+    # Same options as the app's default response class (request_metrics.InstrumentedJSONResponse)
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _chunks(items: list[dict[str, Any]]) -> Iterable[list[dict[str, Any]]]:
+    for i in range(0, len(items), STREAM_CHUNK_ROWS):
+        yield items[i:i + STREAM_CHUNK_ROWS]
+
+
+def iter_json_array(items: list[dict[str, Any]]) -> Iterator[bytes]:
+    """A JSON array of items, STREAM_CHUNK_ROWS rows per chunk."""
+    yield b"["
+    for n, chunk in enumerate(_chunks(items)):
+        body = _dumps(chunk)[1:-1]
+        yield b"," + body if n else body
+    yield b"]"
+
+
+def iter_ndjson(items: list[dict[str, Any]]) -> Iterator[bytes]:
+    """One JSON object per line, STREAM_CHUNK_ROWS rows per chunk."""
+    for chunk in _chunks(items):
+        yield b"".join(_dumps(t) + b"\n" for t in chunk)
@@ -1,47 +1,641 @@
 """
 Firestore access for user transactions.
-Collection: transactions. Document ID: user email. Field: "transactions" (array).
+Collection: transactions. Document ID: user email (lowercase).
+
+Monthly layout: the user document holds only metadata ("layout": "monthly", "months": list of
+bucket ids, "count", "month_counts": transactions per bucket), and transactions live in one bucket document per month under
+transactions/{email}/months/{YYYY-MM}: field "transactions" (array) plus field "labels" (map of
+classifier results keyed by transaction content hash). Transactions without a parseable date
+go to the "undated" bucket.
+
+Every stored transaction_id also has an index document under transactions/{email}/ids/, so
+batched ingestion can skip duplicates by reading only the ids in the batch.
+
+Monthly aggregates (see rollups.py) live under transactions/{email}/rollups/{YYYY-MM} and are
+incremented in the same batch that appends the transactions. The user document's "rollups"
+field records the rollup version once they cover the whole history.
+
+Legacy layout (not yet migrated): "transactions" (array) and "labels" (map) directly on the
+user document. Reads support both; the first write to a legacy user migrates it in place.
+
+Full snapshots of migrated users are kept in snapshot_cache, validated against the user
+document's update_time, so repeated reads cost one small document read instead of every bucket.
+
+`db` is any document client with Firestore's API (see storage/); date-range reads use the
+backend's query_transactions when it has one.
 """
-from typing import Any
+import hashlib
+import re
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable
+
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore import ArrayUnion, Client as FirestoreClient, DELETE_FIELD, Increment
+
+from change_feed import change_feed
+from rollups import ROLLUP_VERSION, build_rollups, rollup_document, rollup_increments
+from snapshot_cache import snapshot_cache
+from storage.layout import MONTHS_SUBCOLLECTION, TRANSACTIONS_COLLECTION, UNDATED_BUCKET, DateLike
+from storage.layout import iso_date as _iso_date
+
+IDS_SUBCOLLECTION = "ids"
+ROLLUPS_SUBCOLLECTION = "rollups"
+LAYOUT_MONTHLY = "monthly"
+
+# Firestore allows at most 500 writes per batch; keep one slot for the user document
+MAX_BATCH_WRITES = 499
+# Rows per append batch: one id write per row plus at most one bucket and one rollup write per
+# row fits MAX_BATCH_WRITES
+MAX_APPEND_ROWS = MAX_BATCH_WRITES // 3
+
+# A migration in progress keeps {"token", "at"} in this user document field; other calls wait
+# for it while it is younger than MIGRATION_CLAIM_SECONDS (each migration batch refreshes it)
+MIGRATION_CLAIM_FIELD = "migration"
+MIGRATION_CLAIM_SECONDS = 60
+_MIGRATION_POLL_SECONDS = 0.2
+
+_SAFE_DOC_ID = re.compile(r"[A-Za-z0-9_\-.:@+]{1,200}")
+
+
+def _user_key(user_email: str) -> str:
+    return user_email.strip().lower()
+
+
+def _user_ref(db: FirestoreClient, key: str):
+    return db.collection(TRANSACTIONS_COLLECTION).document(key)
+
+
+def _bucket_ref(db: FirestoreClient, key: str, month: str):
+    return _user_ref(db, key).collection(MONTHS_SUBCOLLECTION).document(month)
+
+
+def _rollup_ref(db: FirestoreClient, key: str, month: str):
+    return _user_ref(db, key).collection(ROLLUPS_SUBCOLLECTION).document(month)
+
+
+def _id_ref(db: FirestoreClient, key: str, transaction_id: str):
+    """Index document for a transaction_id; ids that are not valid document ids are hashed."""
+    doc_id = transaction_id
+    if not _SAFE_DOC_ID.fullmatch(doc_id) or doc_id.startswith("__") or doc_id in (".", ".."):
+        doc_id = "h_" + hashlib.sha256(transaction_id.encode("utf-8")).hexdigest()[:32]
+    return _user_ref(db, key).collection(IDS_SUBCOLLECTION).document(doc_id)
+
+
+class _BatchWriter:
+    """Accumulates writes into WriteBatches, committing every MAX_BATCH_WRITES operations."""
+
+    def __init__(self, db: FirestoreClient):
+        self._db = db
+        self._batch = db.batch()
+        self._writes = 0
+
+    def set(self, ref, data: dict[str, Any], merge: bool = False) -> None:
+        self._batch.set(ref, data, merge=merge)
+        self._written()
+
+    def update(self, ref, data: dict[str, Any]) -> None:
+        self._batch.update(ref, data)
+        self._written()
+
+    def _written(self) -> None:
+        self._writes += 1
+        if self._writes >= MAX_BATCH_WRITES:
+            self.commit()
+
+    def commit(self) -> None:
+        if self._writes:
+            self._batch.commit()
+            self._batch = self._db.batch()
+            self._writes = 0
+
 
-from google.cloud.firestore import Client as FirestoreClient
+def _is_monthly(data: dict[str, Any]) -> bool:
+    return data.get("layout") == LAYOUT_MONTHLY
 
-TRANSACTIONS_COLLECTION = "transactions"
 
+def month_key(transaction: dict[str, Any]) -> str:
+    """Bucket id for a transaction: 'YYYY-MM' of its date (or transaction_date), else 'undated'."""
+    td = transaction.get("date") or transaction.get("transaction_date")
+    iso = _iso_date(td)
+    if not iso or len(iso) < 7 or iso[4] != "-" or not (iso[:4] + iso[5:7]).isdigit():
+        return UNDATED_BUCKET
+    return iso[:7]
 
-def get_transactions_for_user(db: FirestoreClient, user_email: str) -> list[dict[str, Any]]:
+
+def _in_range(transaction: dict[str, Any], start: str | None, end: str | None) -> bool:
+    td = _iso_date(transaction.get("date") or transaction.get("transaction_date"))
+    if not td:
+        return False
+    return (start is None or td >= start) and (end is None or td <= end)
+
+
+def _months_in_range(months: list[str], start: str | None, end: str | None) -> list[str]:
+    """Bucket ids overlapping [start, end]; the undated bucket is only read for unbounded queries."""
+    if start is None and end is None:
+        return list(months)
+    return [
+        m for m in months
+        if m != UNDATED_BUCKET
+        and (start is None or m >= start[:7])
+        and (end is None or m <= end[:7])
+    ]
+
+
+def _read_buckets(
+    db: FirestoreClient, key: str, months: list[str]
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Transactions and labels of the given month buckets, in month order."""
+    if not months:
+        return [], {}
+    refs = [_bucket_ref(db, key, m) for m in months]
+    return _merge_buckets(months, [snap for snap in db.get_all(refs) if snap.exists])
+
+
+def _merge_buckets(
+    months: list[str], snapshots: list
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Concatenate bucket snapshots' transactions in month order and merge their labels."""
+    buckets = {snap.id: (snap.to_dict() or {}) for snap in snapshots}
+    transactions: list[dict[str, Any]] = []
+    labels: dict[str, dict[str, Any]] = {}
+    for m in months:
+        bucket = buckets.get(m)
+        if not bucket:
+            continue
+        transactions.extend(bucket.get("transactions") or [])
+        labels.update(bucket.get("labels") or {})
+    return transactions, labels
+
+
+def _legacy_snapshot(
+    data: dict[str, Any], start_iso: str | None, end_iso: str | None
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Transactions (within [start, end]) and labels stored on a legacy single-document user."""
+    transactions = data.get("transactions")
+    labels = data.get("labels")
+    transactions = list(transactions) if isinstance(transactions, list) else []
+    if start_iso or end_iso:
+        transactions = [t for t in transactions if _in_range(t, start_iso, end_iso)]
+    return transactions, dict(labels) if isinstance(labels, dict) else {}
+
+
+def _load(
+    db: FirestoreClient, user_email: str, start: DateLike, end: DateLike
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
     """
-    Load the transactions array for a user from Firestore.
-    Document ID = user email; field "transactions" = array of transaction objects.
-    Returns empty list if document or field is missing.
+    Read transactions (optionally within [start, end], inclusive) and their stored labels.
+    Migrated users are served from snapshot_cache while the user document is unchanged; an
+    unbounded miss loads and caches the full snapshot, a bounded miss reads only its months.
     """
-    ref = db.collection(TRANSACTIONS_COLLECTION).document(user_email.strip().lower())
-    doc = ref.get()
+    start_iso, end_iso = _iso_date(start), _iso_date(end)
+    key = _user_key(user_email)
+    doc = _user_ref(db, key).get()
     if not doc.exists:
-        return []
-    data = doc.to_dict()
-    transactions = data.get("transactions")
-    if not isinstance(transactions, list):
-        return []
-    return list(transactions)
+        snapshot_cache.invalidate(key)
+        return [], {}
+    data = doc.to_dict() or {}
+
+    if not _is_monthly(data):
+        return _legacy_snapshot(data, start_iso, end_iso)
+
+    all_months = sorted(data.get("months") or [])
+    bounded = bool(start_iso or end_iso)
+    cached = snapshot_cache.get(key, doc.update_time)
+    if cached is None and snapshot_cache.enabled and not bounded:
+        with snapshot_cache.loading(key):
+            # A concurrent request may have loaded this version while we waited
+            cached = snapshot_cache.get(key, doc.update_time, record=False)
+            if cached is None:
+                transactions, labels = _read_buckets(db, key, all_months)
+                snapshot_cache.put(key, doc.update_time, transactions, labels)
+                return transactions, labels
+
+    if cached is None and bounded and hasattr(db, "query_transactions"):
+        # The backend indexes transactions by date (storage.sqlite); let it run the range query
+        return db.query_transactions(key, start_iso, end_iso)
+    if cached is None:
+        transactions, labels = _read_buckets(db, key, _months_in_range(all_months, start_iso, end_iso))
+    else:
+        transactions, labels = cached
+    if bounded:
+        transactions = [t for t in transactions if _in_range(t, start_iso, end_iso)]
+    return transactions, labels
+
+
+def get_transactions_for_user(
+    db: FirestoreClient, user_email: str, start: DateLike = None, end: DateLike = None
+) -> list[dict[str, Any]]:
+    """
+    Load a user's transactions from Firestore, oldest month first.
+    start / end ('YYYY-MM-DD', inclusive) limit the result and, for migrated users, the
+    month buckets that are read. Returns empty list if the user has no transactions.
+    Rows may be shared with snapshot_cache: copy one before changing it.
+    """
+    transactions, _ = _load(db, user_email, start, end)
+    return transactions
+
+
+def get_transactions_and_labels(
+    db: FirestoreClient, user_email: str, start: DateLike = None, end: DateLike = None
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """
+    Load transactions and the stored classifier labels in the same reads.
+    Labels map content hash -> {"label", "confidence", "model_version"}.
+    """
+    return _load(db, user_email, start, end)
 
 
 def add_transaction_for_user(
     db: FirestoreClient, user_email: str, transaction: dict[str, Any]
 ) -> int:
     """
-    Append one transaction to the user's transactions array in Firestore.
-    Document ID = user email (lowercase); field "transactions" = array.
-    Returns the new length of the transactions array.
+    Append one transaction to its month bucket without reading the user's history.
+    Legacy single-document users are migrated first. An exact copy of a stored row is not
+    stored again (buckets are array unions) and is not counted.
+    Returns the user's new transaction count.
     """
-    key = user_email.strip().lower()
-    ref = db.collection(TRANSACTIONS_COLLECTION).document(key)
-    doc = ref.get()
-    if doc.exists:
-        data = doc.to_dict() or {}
-        current = list(data.get("transactions") or [])
+    append_transactions_for_user(db, user_email, [transaction], skip_existing_ids=False)
+    return int((_user_ref(db, _user_key(user_email)).get().to_dict() or {}).get("count") or 0)
+
+
+def append_transactions_for_user(
+    db: FirestoreClient,
+    user_email: str,
+    transactions: list[dict[str, Any]],
+    skip_existing_ids: bool = True,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    Append transactions in batched commits of at most MAX_APPEND_ROWS rows; each commit also
+    increments the monthly rollups. Each batch reads only the id index documents of its own
+    rows, so cost does not depend on history size. With skip_existing_ids, rows whose
+    transaction_id is already stored (or repeated within the call) are skipped. Rows that are
+    exact copies of a stored row (or of an earlier row in the call) are skipped too, since the
+    bucket's array union would drop them; the month buckets are read only for rows that can be
+    copies (see _copy_months).
+    Returns (added, skipped_duplicates).
+    """
+    key = _user_key(user_email)
+    user_ref = _user_ref(db, key)
+    doc = user_ref.get()
+    if doc.exists and not _is_monthly(doc.to_dict() or {}):
+        migrate_user_to_buckets(db, key)
+    # A brand-new user's rollups are complete from the first append
+    user_fields: dict[str, Any] = {} if doc.exists else {"rollups": ROLLUP_VERSION}
+
+    added: list[dict[str, Any]] = []
+    duplicates: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    stored: dict[str, list[dict[str, Any]]] = {}
+    for offset in range(0, len(transactions), MAX_APPEND_ROWS):
+        chunk = transactions[offset:offset + MAX_APPEND_ROWS]
+        id_refs = [_id_ref(db, key, str(t["transaction_id"])) for t in chunk if t.get("transaction_id") is not None]
+        existing = {snap.id for snap in db.get_all(id_refs) if snap.exists}
+        months = _copy_months(db, key, chunk, existing, seen, skip_existing_ids) - stored.keys()
+        if months:
+            snaps = {snap.id: snap for snap in db.get_all([_bucket_ref(db, key, m) for m in months]) if snap.exists}
+            for m in months:
+                stored[m] = _bucket_rows(snaps.get(m))
+
+        batch = db.batch()
+        if _stage_append(db, batch, key, chunk, existing, seen, stored, skip_existing_ids, user_fields, added, duplicates):
+            batch.commit()
+            snapshot_cache.invalidate(key)
+    if added:
+        change_feed.notify(key)
+    return added, duplicates
+
+
+def _copy_months(
+    db, key: str, chunk: list[dict[str, Any]], existing: set[str], seen: set[str], skip_existing_ids: bool
+) -> set[str]:
+    """
+    Months of the chunk's rows that can be exact copies of a stored or earlier row: rows
+    without a transaction_id, and (without skip_existing_ids) rows whose id is already stored
+    or repeated. A row with a new id cannot equal any stored row.
+    """
+    months = set()
+    ids = set(seen)
+    for t in chunk:
+        tid = t.get("transaction_id")
+        if tid is None:
+            months.add(month_key(t))
+            continue
+        doc_id = _id_ref(db, key, str(tid)).id
+        if not skip_existing_ids and (doc_id in existing or doc_id in ids):
+            months.add(month_key(t))
+        ids.add(doc_id)
+    return months
+
+
+def _bucket_rows(snapshot) -> list[dict[str, Any]]:
+    if snapshot is None:
+        return []
+    return list((snapshot.to_dict() or {}).get("transactions") or [])
+
+
+def _stage_append(
+    db,
+    batch,
+    key: str,
+    chunk: list[dict[str, Any]],
+    existing: set[str],
+    seen: set[str],
+    stored: dict[str, list[dict[str, Any]]],
+    skip_existing_ids: bool,
+    user_fields: dict[str, Any],
+    added: list[dict[str, Any]],
+    duplicates: list[dict[str, Any]],
+) -> bool:
+    """
+    Queue one chunk's id index, bucket, rollup and user document writes on batch (sync or
+    async). stored holds the rows of the buckets read by the caller (see _copy_months) and is
+    extended with the rows added to them. Fills added / duplicates and returns False if
+    nothing was queued. Counts and rollups cover the added rows only.
+    """
+    by_month: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for t in chunk:
+        tid = t.get("transaction_id")
+        id_ref = _id_ref(db, key, str(tid)) if tid is not None else None
+        if id_ref is not None and skip_existing_ids and (id_ref.id in existing or id_ref.id in seen):
+            duplicates.append(t)
+            continue
+        month = month_key(t)
+        rows = stored.get(month)
+        if rows is not None:
+            if t in rows:
+                # The bucket's array union would not store an exact copy
+                duplicates.append(t)
+                continue
+            rows.append(t)
+        if id_ref is not None:
+            seen.add(id_ref.id)
+            batch.set(id_ref, {"month": month})
+        by_month[month].append(t)
+        added.append(t)
+    if not by_month:
+        return False
+    for month, items in by_month.items():
+        batch.set(
+            _bucket_ref(db, key, month),
+            {"month": month, "transactions": ArrayUnion(items)},
+            merge=True,
+        )
+    for month, rollup in build_rollups([t for items in by_month.values() for t in items], month_key).items():
+        batch.set(_rollup_ref(db, key, month), rollup_increments(rollup), merge=True)
+    batch.set(
+        _user_ref(db, key),
+        {
+            **user_fields,
+            "layout": LAYOUT_MONTHLY,
+            "months": ArrayUnion(list(by_month)),
+            "count": Increment(sum(len(items) for items in by_month.values())),
+            "month_counts": {month: Increment(len(items)) for month, items in by_month.items()},
+        },
+        merge=True,
+    )
+    return True
+
+
+def get_rollups_for_user(
+    db: FirestoreClient, user_email: str, latest: bool = False
+) -> dict[str, dict[str, Any]] | None:
+    """
+    Monthly rollups keyed by month (only the latest dated month if latest=True).
+    Returns {} for users without transactions and None when the user's rollups are missing or
+    outdated (legacy layout, or not yet rebuilt), in which case callers fall back to transactions.
+    """
+    key = _user_key(user_email)
+    doc = _user_ref(db, key).get()
+    if not doc.exists:
+        return {}
+    data = doc.to_dict() or {}
+    months = _rollup_months(data, latest)
+    if months is None:
+        return None
+    if not months:
+        return {}
+    refs = [_rollup_ref(db, key, m) for m in months]
+    return {snap.id: snap.to_dict() or {} for snap in db.get_all(refs) if snap.exists}
+
+
+def _rollup_months(data: dict[str, Any], latest: bool) -> list[str] | None:
+    """Rollup ids to read for a user document, or None if its rollups are missing or outdated."""
+    if not _is_monthly(data) or data.get("rollups") != ROLLUP_VERSION:
+        return None
+    months = sorted(data.get("months") or [])
+    if latest:
+        dated = [m for m in months if m != UNDATED_BUCKET]
+        months = dated[-1:]
+    return months
+
+
+def rebuild_rollups_for_user(db: FirestoreClient, user_email: str) -> int:
+    """
+    Recompute every monthly rollup (and the per-bucket month_counts) from the stored
+    transactions and mark them current. Returns months written.
+    """
+    key = _user_key(user_email)
+    doc = _user_ref(db, key).get()
+    if not doc.exists:
+        return 0
+    if not _is_monthly(doc.to_dict() or {}):
+        migrate_user_to_buckets(db, key)
+        return len(_user_ref(db, key).get().to_dict().get("months") or [])
+    writer = _BatchWriter(db)
+    rollups = build_rollups(get_transactions_for_user(db, key), month_key)
+    for month, rollup in rollups.items():
+        writer.set(_rollup_ref(db, key, month), rollup_document(rollup))
+    writer.update(
+        _user_ref(db, key),
+        {"rollups": ROLLUP_VERSION, "month_counts": {month: r["count"] for month, r in rollups.items()}},
+    )
+    writer.commit()
+    return len(rollups)
+
+
+def save_transaction_labels(
+    db: FirestoreClient,
+    user_email: str,
+    labels_by_month: dict[str, dict[str, dict[str, Any]]],
+    replace: bool = False,
+) -> None:
+    """
+    Store classifier labels next to the transactions they belong to.
+    labels_by_month maps bucket id (see month_key) -> {content hash: label entry}. Merges into
+    the existing labels, or, with replace=True, overwrites the labels of each given month
+    (used to drop labels of transactions that no longer exist).
+    """
+    if not any(labels_by_month.values()) and not replace:
+        return
+    key = _user_key(user_email)
+    user_ref = _user_ref(db, key)
+    doc = user_ref.get()
+    if not doc.exists:
+        return
+
+    if not _is_monthly(doc.to_dict() or {}):
+        flat = _flatten_labels(labels_by_month)
+        if replace:
+            user_ref.update({"labels": flat})
+        else:
+            user_ref.set({"labels": flat}, merge=True)
+        return
+
+    writer = _BatchWriter(db)
+    _stage_labels(db, writer, key, labels_by_month, replace)
+    writer.commit()
+    # Bucket writes leave the user document (the cache version) untouched
+    if replace:
+        snapshot_cache.invalidate(key)
     else:
-        current = []
-    current.append(transaction)
-    ref.set({"transactions": current})
-    return len(current)
+        snapshot_cache.merge_labels(key, _flatten_labels(labels_by_month))
+
+
+def _stage_labels(
+    db, writer, key: str, labels_by_month: dict[str, dict[str, dict[str, Any]]], replace: bool
+) -> None:
+    """Queue the bucket label writes of save_transaction_labels on a (sync or async) batch writer."""
+    for month, entries in labels_by_month.items():
+        if not entries and not replace:
+            continue
+        ref = _bucket_ref(db, key, month)
+        if replace:
+            writer.update(ref, {"labels": entries})
+        else:
+            writer.set(ref, {"labels": entries}, merge=True)
+
+
+def _flatten_labels(labels_by_month: dict[str, dict[str, dict[str, Any]]]) -> dict[str, dict[str, Any]]:
+    return {h: entry for entries in labels_by_month.values() for h, entry in entries.items()}
+
+
+def migrate_user_to_buckets(
+    db: FirestoreClient,
+    user_email: str,
+    label_key: Callable[[dict[str, Any]], str] | None = None,
+) -> int:
+    """
+    Convert a legacy single-document user to the monthly layout in place.
+    Bucket documents are written first and the user document is switched last, so readers
+    see the legacy layout until the migration is complete. With label_key (the content hash
+    used for labels) existing labels are carried into the buckets; otherwise they are dropped
+    and recomputed on the next read. Returns the number of transactions migrated (0 if the
+    user is missing or was migrated by another call).
+
+    Safe to run concurrently (appends in every worker trigger it): a migration stamps a claim
+    on the user document and other calls wait for it, and every batch it commits carries a
+    precondition on the user document's update_time, so a migration that lost the race never
+    overwrites buckets (and rows appended to them) after the switch.
+    """
+    key = _user_key(user_email)
+    user_ref = _user_ref(db, key)
+    token = uuid.uuid4().hex
+    while True:
+        doc = user_ref.get()
+        if not doc.exists:
+            return 0
+        data = doc.to_dict() or {}
+        if _is_monthly(data):
+            return 0
+        claim = data.get(MIGRATION_CLAIM_FIELD) or {}
+        if claim.get("token") not in (None, token) and time.time() - claim.get("at", 0) < MIGRATION_CLAIM_SECONDS:
+            time.sleep(_MIGRATION_POLL_SECONDS)
+            continue
+        try:
+            return _migrate_legacy(db, key, doc, token, label_key)
+        except FailedPrecondition:
+            # The user document changed under us (another migration or a label save): look again
+            continue
+
+
+def _migrate_legacy(
+    db: FirestoreClient,
+    key: str,
+    doc,
+    token: str,
+    label_key: Callable[[dict[str, Any]], str] | None,
+) -> int:
+    """Write the buckets of the legacy user document doc and switch it; raises FailedPrecondition if it changes."""
+    data = doc.to_dict() or {}
+    transactions = data.get("transactions")
+    transactions = list(transactions) if isinstance(transactions, list) else []
+    legacy_labels = data.get("labels") if isinstance(data.get("labels"), dict) else {}
+
+    by_month: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    labels_by_month: dict[str, dict[str, dict[str, Any]]] = defaultdict(dict)
+    for t in transactions:
+        month = month_key(t)
+        by_month[month].append(t)
+        if label_key is not None:
+            h = label_key(t)
+            if h in legacy_labels:
+                labels_by_month[month][h] = legacy_labels[h]
+
+    writes: list[tuple[Any, dict[str, Any]]] = [
+        (_bucket_ref(db, key, month), {"month": month, "transactions": items, "labels": labels_by_month.get(month, {})})
+        for month, items in by_month.items()
+    ]
+    writes += [
+        (_id_ref(db, key, str(t["transaction_id"])), {"month": month})
+        for month, items in by_month.items()
+        for t in items
+        if t.get("transaction_id") is not None
+    ]
+    writes += [
+        (_rollup_ref(db, key, month), rollup_document(rollup))
+        for month, rollup in build_rollups(transactions, month_key).items()
+    ]
+    switch = {
+        "layout": LAYOUT_MONTHLY,
+        "months": sorted(by_month),
+        "count": len(transactions),
+        "month_counts": {month: len(items) for month, items in by_month.items()},
+        "rollups": ROLLUP_VERSION,
+        "transactions": DELETE_FIELD,
+        "labels": DELETE_FIELD,
+        MIGRATION_CLAIM_FIELD: DELETE_FIELD,
+    }
+
+    # Each batch also updates the user document (refreshing the claim, then switching it) on
+    # condition that nothing else wrote it since our last batch
+    user_ref = _user_ref(db, key)
+    update_time = doc.update_time
+    chunks = [writes[i:i + MAX_BATCH_WRITES] for i in range(0, len(writes), MAX_BATCH_WRITES)] or [[]]
+    for i, chunk in enumerate(chunks):
+        batch = db.batch()
+        for ref, fields in chunk:
+            batch.set(ref, fields)
+        user_fields = switch if i == len(chunks) - 1 else {MIGRATION_CLAIM_FIELD: {"token": token, "at": time.time()}}
+        batch.update(user_ref, user_fields, option=db.write_option(last_update_time=update_time))
+        update_time = batch.commit()[-1].update_time
+    snapshot_cache.invalidate(key)
+    return len(transactions)
+
+
+def _write_id_index(
+    db: FirestoreClient, key: str, by_month: dict[str, list[dict[str, Any]]], writer: _BatchWriter
+) -> int:
+    """Queue id index documents for every transaction in by_month. Returns how many were queued."""
+    count = 0
+    for month, items in by_month.items():
+        for t in items:
+            tid = t.get("transaction_id")
+            if tid is None:
+                continue
+            writer.set(_id_ref(db, key, str(tid)), {"month": month})
+            count += 1
+    return count
+
+
+def rebuild_transaction_id_index(db: FirestoreClient, user_email: str) -> int:
+    """Write id index documents for every stored transaction of a user. Returns ids indexed."""
+    key = _user_key(user_email)
+    by_month: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for t in get_transactions_for_user(db, key):
+        by_month[month_key(t)].append(t)
+    writer = _BatchWriter(db)
+    count = _write_id_index(db, key, by_month, writer)
+    writer.commit()
+    return count
@@ -0,0 +1,339 @@
+"""
+Async counterpart of transaction_repo for route handlers, built on Firestore's AsyncClient.
+Same storage layout, snapshot cache and semantics: document references, write staging and the
+pure helpers are shared with transaction_repo, only the I/O is awaited. Legacy single-document
+users are migrated by the sync implementation in a worker thread (a one-time step per user).
+"""
+import asyncio
+import weakref
+from typing import Any
+
+from google.cloud.firestore import AsyncClient
+
+from change_feed import change_feed
+from database import get_sync_db
+from request_metrics import db_call
+from rollups import ROLLUP_VERSION
+from snapshot_cache import snapshot_cache
+from spending_index import SpendingIndex, index_cache
+from transaction_frame import TransactionFrame
+from transaction_repo import (
+    MAX_APPEND_ROWS,
+    MAX_BATCH_WRITES,
+    DateLike,
+    _bucket_ref,
+    _bucket_rows,
+    _copy_months,
+    _flatten_labels,
+    _id_ref,
+    _in_range,
+    _is_monthly,
+    _iso_date,
+    _legacy_snapshot,
+    _merge_buckets,
+    _months_in_range,
+    _rollup_months,
+    _rollup_ref,
+    _stage_append,
+    _stage_labels,
+    _user_key,
+    _user_ref,
+    migrate_user_to_buckets,
+)
+
+# One lock per user so concurrent cache misses share a single bucket read; an entry lives only
+# while a load holds or waits on it
+_load_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+class _AsyncBatchWriter:
+    """Queues writes into AsyncWriteBatches of at most MAX_BATCH_WRITES operations; commit() sends them in order."""
+
+    def __init__(self, db: AsyncClient):
+        self._db = db
+        self._batches = []
+        self._writes = MAX_BATCH_WRITES
+
+    def _batch(self):
+        if self._writes >= MAX_BATCH_WRITES:
+            self._batches.append(self._db.batch())
+            self._writes = 0
+        self._writes += 1
+        return self._batches[-1]
+
+    def set(self, ref, data: dict[str, Any], merge: bool = False) -> None:
+        self._batch().set(ref, data, merge=merge)
+
+    def update(self, ref, data: dict[str, Any]) -> None:
+        self._batch().update(ref, data)
+
+    async def commit(self) -> None:
+        for batch in self._batches:
+            await _commit(batch)
+        self._batches = []
+        self._writes = MAX_BATCH_WRITES
+
+
+async def _get(ref):
+    """One document read (counted and timed in request_metrics)."""
+    with db_call(reads=1):
+        return await ref.get()
+
+
+async def _get_all(db: AsyncClient, refs: list) -> list:
+    """Existing snapshots among refs (one batched read)."""
+    if not refs:
+        return []
+    with db_call(reads=len(refs)):
+        return [snap async for snap in db.get_all(refs) if snap.exists]
+
+
+async def _commit(batch) -> None:
+    """Commit a write batch, counting one write per operation."""
+    with db_call(writes=len(batch)):
+        await batch.commit()
+
+
+async def _read_buckets(
+    db: AsyncClient, key: str, months: list[str]
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    if not months:
+        return [], {}
+    return _merge_buckets(months, await _get_all(db, [_bucket_ref(db, key, m) for m in months]))
+
+
+async def _load(
+    db: AsyncClient, user_email: str, start: DateLike, end: DateLike
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """See transaction_repo._load."""
+    key = _user_key(user_email)
+    doc = await _get(_user_ref(db, key))
+    return await _load_snapshot(db, key, doc, _iso_date(start), _iso_date(end))
+
+
+async def _load_snapshot(
+    db: AsyncClient, key: str, doc, start_iso: str | None, end_iso: str | None
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """Transactions and labels for the user document snapshot doc, within [start_iso, end_iso]."""
+    if not doc.exists:
+        snapshot_cache.invalidate(key)
+        return [], {}
+    data = doc.to_dict() or {}
+
+    if not _is_monthly(data):
+        return _legacy_snapshot(data, start_iso, end_iso)
+
+    all_months = sorted(data.get("months") or [])
+    bounded = bool(start_iso or end_iso)
+    cached = snapshot_cache.get(key, doc.update_time)
+    if cached is None and snapshot_cache.enabled and not bounded:
+        lock = _load_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = snapshot_cache.get(key, doc.update_time, record=False)
+            if cached is None:
+                transactions, labels = await _read_buckets(db, key, all_months)
+                snapshot_cache.put(key, doc.update_time, transactions, labels)
+                return transactions, labels
+
+    if cached is None and bounded and hasattr(db, "query_transactions"):
+        # The backend indexes transactions by date (storage.sqlite); let it run the range query
+        with db_call(reads=1):
+            return await db.query_transactions(key, start_iso, end_iso)
+    if cached is None:
+        transactions, labels = await _read_buckets(db, key, _months_in_range(all_months, start_iso, end_iso))
+    else:
+        transactions, labels = cached
+    if bounded:
+        transactions = [t for t in transactions if _in_range(t, start_iso, end_iso)]
+    return transactions, labels
+
+
+async def get_transactions_for_user(
+    db: AsyncClient, user_email: str, start: DateLike = None, end: DateLike = None
+) -> list[dict[str, Any]]:
+    """See transaction_repo.get_transactions_for_user."""
+    transactions, _ = await _load(db, user_email, start, end)
+    return transactions
+
+
+async def get_transactions_and_labels(
+    db: AsyncClient, user_email: str, start: DateLike = None, end: DateLike = None
+) -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """See transaction_repo.get_transactions_and_labels."""
+    return await _load(db, user_email, start, end)
+
+
+async def get_data_version(db: AsyncClient, user_email: str) -> str:
+    """
+    Version of everything stored for the user's transactions ("" if there is nothing): the user
+    document's update_time, which every append and rollup change bumps. For ETags (see conditional).
+    """
+    doc = await _get(_user_ref(db, _user_key(user_email)))
+    return str(doc.update_time) if doc.exists else ""
+
+
+async def get_appended_since(
+    db: AsyncClient, user_email: str, since: dict[str, Any] | None
+) -> tuple[dict[str, Any], list[dict[str, Any]] | None]:
+    """
+    (version, added): the user's current transaction version and the transactions appended
+    since the version `since` returned by an earlier call (None to only get the version).
+    added is [] when nothing was appended and None when the change is not a plain append
+    (legacy layout or migration, a rewrite, or month_counts missing for older data), so the
+    caller must reload. Reads the user document plus the buckets that grew.
+    """
+    key = _user_key(user_email)
+    doc = await _get(_user_ref(db, key))
+    data = (doc.to_dict() or {}) if doc.exists else {}
+    version = {
+        "monthly": _is_monthly(data),
+        "count": int(data.get("count") or 0),
+        "months": {m: int(n) for m, n in (data.get("month_counts") or {}).items()},
+    }
+    if since is None or version == since:
+        return version, []
+    grown = {m: n - since["months"].get(m, 0) for m, n in version["months"].items() if n > since["months"].get(m, 0)}
+    if not (version["monthly"] and since["monthly"]) or sum(grown.values()) != version["count"] - since["count"]:
+        return version, None
+    added: list[dict[str, Any]] = []
+    snaps = await _get_all(db, [_bucket_ref(db, key, m) for m in grown])
+    for snap in snaps:
+        items = (snap.to_dict() or {}).get("transactions") or []
+        n = grown[snap.id]
+        if len(items) < n:
+            return version, None
+        added.extend(items[-n:])
+    if len(snaps) != len(grown):
+        return version, None
+    return version, added
+
+
+async def get_transaction_frame(db: AsyncClient, user_email: str) -> TransactionFrame:
+    """
+    All of the user's transactions as a TransactionFrame. The frame is cached with the user's
+    snapshot, so it is built once per snapshot version rather than on every request.
+    """
+    key = _user_key(user_email)
+    doc = await _get(_user_ref(db, key))
+    if doc.exists:
+        frame = snapshot_cache.get_frame(key, doc.update_time)
+        if frame is not None:
+            return frame
+    transactions, _ = await _load_snapshot(db, key, doc, None, None)
+    frame = await asyncio.to_thread(TransactionFrame.from_transactions, transactions)
+    if doc.exists:
+        snapshot_cache.put_frame(key, doc.update_time, frame)
+    return frame
+
+
+async def get_spending_index(db: AsyncClient, user_email: str) -> SpendingIndex:
+    """
+    The user's daily spending index (see spending_index), from the rollups' daily totals when
+    they are current, else from the TransactionFrame. Cached per user document version.
+    """
+    key = _user_key(user_email)
+    doc = await _get(_user_ref(db, key))
+    if not doc.exists:
+        return SpendingIndex.from_rollups({})
+    cached = index_cache.get(key)
+    if cached is not None and cached[0] == doc.update_time:
+        return cached[1]
+    months = _rollup_months(doc.to_dict() or {}, latest=False)
+    if months is not None:
+        snaps = await _get_all(db, [_rollup_ref(db, key, m) for m in months])
+        rollups = {snap.id: snap.to_dict() or {} for snap in snaps}
+        index = await asyncio.to_thread(SpendingIndex.from_rollups, rollups)
+    else:
+        index = await asyncio.to_thread(SpendingIndex.from_frame, await get_transaction_frame(db, user_email))
+    index_cache.put(key, (doc.update_time, index))
+    return index
+
+
+async def add_transaction_for_user(db: AsyncClient, user_email: str, transaction: dict[str, Any]) -> int:
+    """See transaction_repo.add_transaction_for_user."""
+    await append_transactions_for_user(db, user_email, [transaction], skip_existing_ids=False)
+    doc = await _get(_user_ref(db, _user_key(user_email)))
+    return int((doc.to_dict() or {}).get("count") or 0)
+
+
+async def append_transactions_for_user(
+    db: AsyncClient,
+    user_email: str,
+    transactions: list[dict[str, Any]],
+    skip_existing_ids: bool = True,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """See transaction_repo.append_transactions_for_user."""
+    key = _user_key(user_email)
+    doc = await _get(_user_ref(db, key))
+    if doc.exists and not _is_monthly(doc.to_dict() or {}):
+        await asyncio.to_thread(migrate_user_to_buckets, get_sync_db(), key)
+    user_fields: dict[str, Any] = {} if doc.exists else {"rollups": ROLLUP_VERSION}
+
+    added: list[dict[str, Any]] = []
+    duplicates: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    stored: dict[str, list[dict[str, Any]]] = {}
+    for offset in range(0, len(transactions), MAX_APPEND_ROWS):
+        chunk = transactions[offset:offset + MAX_APPEND_ROWS]
+        id_refs = [_id_ref(db, key, str(t["transaction_id"])) for t in chunk if t.get("transaction_id") is not None]
+        existing = {snap.id for snap in await _get_all(db, id_refs)}
+        months = _copy_months(db, key, chunk, existing, seen, skip_existing_ids) - stored.keys()
+        if months:
+            snaps = {snap.id: snap for snap in await _get_all(db, [_bucket_ref(db, key, m) for m in months])}
+            for m in months:
+                stored[m] = _bucket_rows(snaps.get(m))
+        batch = db.batch()
+        if _stage_append(db, batch, key, chunk, existing, seen, stored, skip_existing_ids, user_fields, added, duplicates):
+            await _commit(batch)
+            snapshot_cache.invalidate(key)
+    if added:
+        change_feed.notify(key)
+    return added, duplicates
+
+
+async def get_rollups_for_user(
+    db: AsyncClient, user_email: str, latest: bool = False
+) -> dict[str, dict[str, Any]] | None:
+    """See transaction_repo.get_rollups_for_user."""
+    key = _user_key(user_email)
+    doc = await _get(_user_ref(db, key))
+    if not doc.exists:
+        return {}
+    months = _rollup_months(doc.to_dict() or {}, latest)
+    if months is None:
+        return None
+    snaps = await _get_all(db, [_rollup_ref(db, key, m) for m in months])
+    return {snap.id: snap.to_dict() or {} for snap in snaps}
+
+
+async def save_transaction_labels(
+    db: AsyncClient,
+    user_email: str,
+    labels_by_month: dict[str, dict[str, dict[str, Any]]],
+    replace: bool = False,
+) -> None:
+    """See transaction_repo.save_transaction_labels."""
+    if not any(labels_by_month.values()) and not replace:
+        return
+    key = _user_key(user_email)
+    user_ref = _user_ref(db, key)
+    doc = await _get(user_ref)
+    if not doc.exists:
+        return
+
+    if not _is_monthly(doc.to_dict() or {}):
+        flat = _flatten_labels(labels_by_month)
+        with db_call(writes=1):
+            if replace:
+                await user_ref.update({"labels": flat})
+            else:
+                await user_ref.set({"labels": flat}, merge=True)
+        return
+
+    writer = _AsyncBatchWriter(db)
+    _stage_labels(db, writer, key, labels_by_month, replace)
+    await writer.commit()
+    if replace:
+        snapshot_cache.invalidate(key)
+    else:
+        snapshot_cache.merge_labels(key, _flatten_labels(labels_by_month))
@@ -1,13 +1,60 @@
 """
 Firestore operations for users. Use these instead of direct DB access.
+
+Emails resolve to users through users_by_email/{email} -> {"user_id": ...}, written in the same
+batch as the user at signup (a create, so a second signup with the email fails), and cached in
+email_id_cache: an email lookup is a cache hit or two document gets, not a query. Users created
+before the index existed are found by the old email query and backfilled on first lookup, or all
+at once with temp_scripts/migrate_email_index.py.
+
+Savings goals and hourly wages (models.goal_state) are read through goal_state_cache, keyed by
+email. Writes in this worker refresh the entry; other workers see them once theirs expires.
+
+Config (env): USER_EMAIL_INDEX_FALLBACK (default 1; set 0 once the migration has run to skip the
+query for unknown emails), USER_EMAIL_CACHE_SIZE (default 10000), USER_EMAIL_CACHE_TTL_SECONDS (default 3600),
+GOAL_STATE_CACHE_SIZE (default 10000), GOAL_STATE_CACHE_TTL_SECONDS (default 5, 0 disables).
 """
+import os
 from datetime import datetime
 
 from google.cloud.firestore import Client as FirestoreClient
 
+from auth_cache import TTLCache
 from models.user import User
 
 USERS_COLLECTION = "users"
+USERS_BY_EMAIL_COLLECTION = "users_by_email"
+
+EMAIL_INDEX_FALLBACK = os.getenv("USER_EMAIL_INDEX_FALLBACK", "1") != "0"
+# email -> user id; the mapping never changes for a user, so entries can live long
+email_id_cache = TTLCache(
+    int(os.getenv("USER_EMAIL_CACHE_SIZE", "10000")),
+    float(os.getenv("USER_EMAIL_CACHE_TTL_SECONDS", "3600")),
+)
+# email -> GoalState; short-lived, since other workers may change it
+goal_state_cache = TTLCache(
+    int(os.getenv("GOAL_STATE_CACHE_SIZE", "10000")),
+    float(os.getenv("GOAL_STATE_CACHE_TTL_SECONDS", "5")),
+)
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def _email_index_ref(db, email_lower: str):
+    return db.collection(USERS_BY_EMAIL_COLLECTION).document(email_lower)
+
+
+def _new_user_data(email_lower: str, hashed_password: str, full_name, name, phone_number, now: datetime) -> dict:
+    return {
+        "email": email_lower,
+        "hashed_password": hashed_password,
+        "full_name": full_name,
+        "name": name,
+        "phone_number": phone_number,
+        "created_at": now,
+    }
 
 
 def _doc_to_user(doc) -> User:
@@ -33,18 +80,42 @@ def get_user_by_id(db: FirestoreClient, user_id: str) -> User | None:
     return _doc_to_user(doc)
 
 
-def get_user_by_email(db: FirestoreClient, email: str) -> User | None:
-    """Return the user with the given email, or None. Email comparison is case-insensitive."""
-    email_lower = email.strip().lower()
-    query = (
-        db.collection(USERS_COLLECTION)
-        .where("email", "==", email_lower)
-        .limit(1)
-    )
+def _lookup_user_id(db: FirestoreClient, email_lower: str) -> str | None:
+    """User id for the email from the cache or the users_by_email index."""
+    user_id = email_id_cache.get(email_lower)
+    if user_id is None:
+        index = _email_index_ref(db, email_lower).get()
+        if index.exists:
+            user_id = index.get("user_id")
+    return user_id
+
+
+def get_user_doc_by_email(db: FirestoreClient, email: str):
+    """Return the document snapshot of the user with the given email (case-insensitive), or None."""
+    email_lower = normalize_email(email)
+    user_id = _lookup_user_id(db, email_lower)
+    if user_id is not None:
+        doc = db.collection(USERS_COLLECTION).document(user_id).get()
+        if doc.exists:
+            email_id_cache.put(email_lower, user_id)
+            return doc
+        email_id_cache.pop(email_lower)
+    if not EMAIL_INDEX_FALLBACK:
+        return None
+    # Not indexed yet (user created before the index): query once, then backfill
+    query = db.collection(USERS_COLLECTION).where("email", "==", email_lower).limit(1)
     docs = list(query.stream())
     if not docs:
         return None
-    return _doc_to_user(docs[0])
+    _email_index_ref(db, email_lower).set({"user_id": docs[0].id})
+    email_id_cache.put(email_lower, docs[0].id)
+    return docs[0]
+
+
+def get_user_by_email(db: FirestoreClient, email: str) -> User | None:
+    """Return the user with the given email, or None. Email comparison is case-insensitive."""
+    doc = get_user_doc_by_email(db, email)
+    return _doc_to_user(doc) if doc is not None else None
 
 
 def create_user(
@@ -55,19 +126,16 @@ def create_user(
     name: str | None = None,
     phone_number: str | None = None,
 ) -> User:
-    """Create a new user in Firestore and return the User with id and created_at."""
-    email_lower = email.strip().lower()
+    """Create a new user in Firestore and return the User with id and created_at.
+    Raises google.api_core.exceptions.AlreadyExists if the email is already registered."""
+    email_lower = normalize_email(email)
     now = datetime.utcnow()
-    data = {
-        "email": email_lower,
-        "hashed_password": hashed_password,
-        "full_name": full_name,
-        "name": name,
-        "phone_number": phone_number,
-        "created_at": now,
-    }
     ref = db.collection(USERS_COLLECTION).document()
-    ref.set(data)
+    batch = db.batch()
+    batch.create(_email_index_ref(db, email_lower), {"user_id": ref.id})
+    batch.set(ref, _new_user_data(email_lower, hashed_password, full_name, name, phone_number, now))
+    batch.commit()
+    email_id_cache.put(email_lower, ref.id)
     return User(
         id=ref.id,
         email=email_lower,
@@ -77,3 +145,19 @@ def create_user(
         phone_number=phone_number,
         created_at=now,
     )
+
+
+def backfill_email_index(db: FirestoreClient) -> tuple[int, int]:
+    """Write users_by_email entries for every user missing one. Returns (indexed, already indexed)."""
+    indexed = existing = 0
+    for doc in db.collection(USERS_COLLECTION).stream():
+        email = (doc.to_dict() or {}).get("email")
+        if not email:
+            continue
+        ref = _email_index_ref(db, normalize_email(email))
+        if ref.get().exists:
+            existing += 1
+            continue
+        ref.set({"user_id": doc.id})
+        indexed += 1
+    return indexed, existing
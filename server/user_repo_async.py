@@ -0,0 +1,185 @@
+"""
+Async counterpart of user_repo, on Firestore's AsyncClient. Use these from async route handlers.
+"""
+from datetime import datetime
+from typing import Any
+
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore import AsyncClient, Increment
+
+from auth_cache import invalidate_user
+from models.goal_state import GOAL_STATE_FIELDS, GoalState, goal_state_from_user
+from models.user import User
+from request_metrics import db_call
+from user_repo import (
+    EMAIL_INDEX_FALLBACK,
+    USERS_COLLECTION,
+    _doc_to_user,
+    _email_index_ref,
+    _new_user_data,
+    email_id_cache,
+    goal_state_cache,
+    normalize_email,
+)
+
+
+async def get_user_by_id(db: AsyncClient, user_id: str) -> User | None:
+    """Return the user with the given id, or None."""
+    with db_call(reads=1):
+        doc = await db.collection(USERS_COLLECTION).document(user_id).get()
+    if not doc.exists:
+        return None
+    return _doc_to_user(doc)
+
+
+async def _lookup_user_id(db: AsyncClient, email_lower: str) -> str | None:
+    """User id for the email from the cache or the users_by_email index."""
+    user_id = email_id_cache.get(email_lower)
+    if user_id is None:
+        with db_call(reads=1):
+            index = await _email_index_ref(db, email_lower).get()
+        if index.exists:
+            user_id = index.get("user_id")
+    return user_id
+
+
+async def get_user_doc_by_email(db: AsyncClient, email: str, field_paths: list[str] | None = None):
+    """Return the document snapshot of the user with the given email (case-insensitive), or None.
+    field_paths projects the indexed lookup to those fields (unindexed users come back whole)."""
+    email_lower = normalize_email(email)
+    user_id = await _lookup_user_id(db, email_lower)
+    if user_id is not None:
+        with db_call(reads=1):
+            doc = await db.collection(USERS_COLLECTION).document(user_id).get(field_paths=field_paths)
+        if doc.exists:
+            email_id_cache.put(email_lower, user_id)
+            return doc
+        email_id_cache.pop(email_lower)
+    if not EMAIL_INDEX_FALLBACK:
+        return None
+    # Not indexed yet (user created before the index): query once, then backfill
+    query = db.collection(USERS_COLLECTION).where("email", "==", email_lower).limit(1)
+    with db_call(reads=1):
+        docs = [doc async for doc in query.stream()]
+    if not docs:
+        return None
+    doc = docs[0]
+    with db_call(writes=1):
+        await _email_index_ref(db, email_lower).set({"user_id": doc.id})
+    email_id_cache.put(email_lower, doc.id)
+    return doc
+
+
+async def get_user_by_email(db: AsyncClient, email: str) -> User | None:
+    """Return the user with the given email, or None. Email comparison is case-insensitive."""
+    doc = await get_user_doc_by_email(db, email)
+    return _doc_to_user(doc) if doc is not None else None
+
+
+async def create_user(
+    db: AsyncClient,
+    email: str,
+    hashed_password: str,
+    full_name: str | None = None,
+    name: str | None = None,
+    phone_number: str | None = None,
+) -> User:
+    """Create a new user in Firestore and return the User with id and created_at.
+    Raises google.api_core.exceptions.AlreadyExists if the email is already registered."""
+    email_lower = normalize_email(email)
+    now = datetime.utcnow()
+    ref = db.collection(USERS_COLLECTION).document()
+    batch = db.batch()
+    batch.create(_email_index_ref(db, email_lower), {"user_id": ref.id})
+    batch.set(ref, _new_user_data(email_lower, hashed_password, full_name, name, phone_number, now))
+    with db_call(writes=2):
+        await batch.commit()
+    email_id_cache.put(email_lower, ref.id)
+    return User(
+        id=ref.id,
+        email=email_lower,
+        hashed_password=hashed_password,
+        full_name=full_name,
+        name=name,
+        phone_number=phone_number,
+        created_at=now,
+    )
+
+
+async def update_user_profile(db: AsyncClient, user_id: str, fields: dict) -> User | None:
+    """Update profile fields of a user and return the updated User (None if missing). Drops cached auth state."""
+    ref = db.collection(USERS_COLLECTION).document(user_id)
+    if fields:
+        with db_call(writes=1):
+            await ref.update(fields)
+        invalidate_user(user_id)
+    with db_call(reads=1):
+        doc = await ref.get()
+    if not doc.exists:
+        return None
+    return _doc_to_user(doc)
+
+
+async def update_user_fields(ref, fields: dict) -> None:
+    """Update fields of a user document through its reference (e.g. a snapshot's .reference)."""
+    with db_call(writes=1):
+        await ref.update(fields)
+
+
+async def update_user_password(db: AsyncClient, user_id: str, hashed_password: str) -> None:
+    """Replace the stored password hash (e.g. rehash with new cost settings). Drops cached auth state."""
+    with db_call(writes=1):
+        await db.collection(USERS_COLLECTION).document(user_id).update({"hashed_password": hashed_password})
+    invalidate_user(user_id)
+
+
+async def get_goal_state(db: AsyncClient, email: str) -> GoalState | None:
+    """The user's savings goal and hourly wage (read through goal_state_cache), or None if no such user."""
+    email_lower = normalize_email(email)
+    state = goal_state_cache.get(email_lower)
+    if state is None:
+        doc = await get_user_doc_by_email(db, email_lower, field_paths=GOAL_STATE_FIELDS)
+        if doc is None:
+            return None
+        state = goal_state_from_user(doc.to_dict() or {})
+        goal_state_cache.put(email_lower, state)
+    return state
+
+
+async def _update_goal_state(db: AsyncClient, email: str, fields: dict[str, Any]) -> GoalState | None:
+    """Apply fields (dotted paths, Increments allowed) to the user document and return the fresh GoalState."""
+    email_lower = normalize_email(email)
+    user_id = await _lookup_user_id(db, email_lower)
+    if user_id is None:
+        doc = await get_user_doc_by_email(db, email_lower, field_paths=GOAL_STATE_FIELDS)
+        if doc is None:
+            return None
+        ref = doc.reference
+    else:
+        ref = db.collection(USERS_COLLECTION).document(user_id)
+    try:
+        with db_call(writes=1):
+            await ref.update(fields)
+    except NotFound:
+        email_id_cache.pop(email_lower)
+        goal_state_cache.pop(email_lower)
+        return None
+    with db_call(reads=1):
+        doc = await ref.get(field_paths=GOAL_STATE_FIELDS)
+    state = goal_state_from_user(doc.to_dict() or {})
+    goal_state_cache.put(email_lower, state)
+    return state
+
+
+async def add_goal_savings(db: AsyncClient, email: str, amount: float) -> GoalState | None:
+    """Atomically add amount to the user's goal savings; returns the state after the increment (None if no such user)."""
+    return await _update_goal_state(db, email, {"goal.current_savings": Increment(amount)})
+
+
+async def set_goal(db: AsyncClient, email: str, goal: dict[str, Any]) -> GoalState | None:
+    """Replace the goal fields given (name, target_amount, target_date, current_savings)."""
+    return await _update_goal_state(db, email, {f"goal.{k}": v for k, v in goal.items()})
+
+
+async def set_hourly_wage(db: AsyncClient, email: str, hourly_wage: float) -> GoalState | None:
+    return await _update_goal_state(db, email, {"hourly_wage": hourly_wage})